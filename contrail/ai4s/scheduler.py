@@ -2,19 +2,17 @@
 
 from __future__ import annotations
 
-import time
-
-import schedule
 from loguru import logger
 
 from contrail.ai4s.config import Ai4sConfig
 from contrail.ai4s.tasks import NotebookListTask, QuotaStatusTask
+from contrail.utils.scheduler import FixedRateScheduler
 
 
 class Ai4sScheduler:
     def __init__(self, config: Ai4sConfig):
         self.config = config
-        self.scheduler = schedule.Scheduler()
+        self.scheduler = FixedRateScheduler("ai4s")
         self.list_task = NotebookListTask(config=self.config, via_scheduler=True)
         self.status_task = QuotaStatusTask(config=self.config, via_scheduler=True)
         self.config.ensure_directories()
@@ -42,16 +40,15 @@ class Ai4sScheduler:
 
         if list_cfg.scheduled:
             self._run_task(self.list_task)
-            self.scheduler.every(list_cfg.interval).minutes.do(self._run_task, self.list_task)
+            self.scheduler.every(list_cfg.interval * 60, self._run_task, self.list_task, name="ai4s:list")
 
         if status_cfg.scheduled:
             self._run_task(self.status_task)
-            self.scheduler.every(status_cfg.interval).minutes.do(self._run_task, self.status_task)
+            self.scheduler.every(status_cfg.interval * 60, self._run_task, self.status_task, name="ai4s:status")
 
         try:
             while True:
-                self.scheduler.run_pending()
-                time.sleep(10)
+                self.scheduler.wait(max_wait=10)
         except KeyboardInterrupt:
             logger.info("Scheduler stopped by user")
 
@@ -16,7 +16,10 @@ def run_gpu_logger():
 def run_gpu_sender():
     """执行 GPU 数据发送模块"""
     import json
+    import getpass
     from contrail.gpu.GPU_data_sender import GpuSenderConfig, send_gpu_info
+    from contrail.gpu.GPU_fault_detector import get_fault_detection_worker
+    from contrail.utils.email_sender import EmailSender
 
     # 读取 config/sender_config.json
     with open("config/sender_config.json", "r") as f:
@@ -24,9 +27,18 @@ def run_gpu_sender():
 
         sender_config = GpuSenderConfig(**config)
 
+    fault_detector = None
+    sender = None
+    if sender_config.fault_detection:
+        sender = EmailSender(sender_config.email_config)
+        if not sender.password:
+            sender.password = getpass.getpass("Please input your email passport: ")
+        fault_detector = get_fault_detection_worker(
+            sender_config.fault_rules, sender_config.email_config, sender.password, sender_config.alert_db_path
+        )
+
     # 发送 GPU 信息
-    # TODO: 这里需要传入 fault_detector 和 sender
-    send_gpu_info(sender_config)
+    send_gpu_info(sender_config, fault_detector, sender)
 
 
 def run_monitor():
@@ -0,0 +1,246 @@
+import os
+import json
+import sqlite3
+import datetime as dt
+import pandas as pd
+from loguru import logger
+
+from dataclasses import dataclass
+from typing import Optional, List
+
+from contrail.utils.sqlite_pool import read_connection
+
+NOTIFICATION_STATUS = ("pending", "sent", "failed", "suppressed")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _utcnow() -> str:
+    return dt.datetime.now(dt.timezone.utc).strftime(TIME_FORMAT)
+
+
+@dataclass
+class AlertRecord:
+    id: int
+    event_key: str  # 同一设备上同一事件的标识，例如 rule:overload 或 anomaly:idle:user:alice@gpu:0
+    device: str
+    kind: str  # rule / anomaly
+    name: str
+    gpus: List[int]
+    users: List[str]
+    message: str
+    start_time: dt.datetime  # UTC
+    end_time: Optional[dt.datetime]
+    notification: str
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "AlertRecord":
+        id, event_key, device, kind, name, gpus, users, message, start_time, end_time, notification = row
+        return cls(
+            id=id,
+            event_key=event_key,
+            device=device,
+            kind=kind,
+            name=name,
+            gpus=json.loads(gpus or "[]"),
+            users=json.loads(users or "[]"),
+            message=message or "",
+            start_time=dt.datetime.strptime(start_time, TIME_FORMAT).replace(tzinfo=dt.timezone.utc),
+            end_time=dt.datetime.strptime(end_time, TIME_FORMAT).replace(tzinfo=dt.timezone.utc) if end_time else None,
+            notification=notification,
+        )
+
+
+COLUMNS = "id, event_key, device, kind, name, gpus, users, message, start_time, end_time, notification"
+
+
+class AlertStore:
+    """
+    告警记录（SQLite）
+
+    每次事件激活时插入一条记录，结束时写入 end_time；未结束（end_time 为 NULL）的记录即为当前活跃的告警，
+    进程重启后据此恢复事件状态，避免重复发送告警
+    """
+
+    def __init__(self, db_path: str = "data/alerts.db"):
+        self.db_path = db_path
+        initialize_alert_database(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def open(
+        self,
+        device: str,
+        event_key: str,
+        kind: str,
+        name: str,
+        gpus: Optional[List[int]] = None,
+        users: Optional[List[str]] = None,
+        message: str = "",
+        start_time: Optional[str] = None,
+    ) -> int:
+        """记录新的告警，返回告警 id"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO alerts (event_key, device, kind, name, gpus, users, message, start_time, notification)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+                """,
+                (
+                    event_key,
+                    device,
+                    kind,
+                    name,
+                    json.dumps([int(i) for i in gpus or []]),
+                    json.dumps(list(users or [])),
+                    message,
+                    start_time or _utcnow(),
+                ),
+            )
+        return int(cursor.lastrowid)  # type: ignore[arg-type]
+
+    def update_targets(self, alert_id: int, gpus: List[int], users: List[str]) -> None:
+        """告警持续期间涉及的 GPU / 用户发生变化时更新"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE alerts SET gpus = ?, users = ? WHERE id = ?",
+                (json.dumps([int(i) for i in gpus]), json.dumps(list(users)), alert_id),
+            )
+
+    def close(self, alert_id: int, end_time: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE alerts SET end_time = ? WHERE id = ? AND end_time IS NULL", (end_time or _utcnow(), alert_id)
+            )
+
+    def close_device(self, device: str, end_time: Optional[str] = None) -> int:
+        """结束设备上所有活跃的告警，返回结束的条数"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE alerts SET end_time = ? WHERE device = ? AND end_time IS NULL", (end_time or _utcnow(), device)
+            )
+        return cursor.rowcount
+
+    def set_notification(self, alert_id: int, status: str) -> None:
+        if status not in NOTIFICATION_STATUS:
+            raise ValueError(f"Invalid notification status: {status}")
+        with self._connect() as conn:
+            conn.execute("UPDATE alerts SET notification = ? WHERE id = ?", (status, alert_id))
+
+    def notification_callback(self, alert_id: int):
+        """供 NotificationDispatcher 在发送完成后回写通知状态"""
+
+        def callback(success: bool):
+            try:
+                self.set_notification(alert_id, "sent" if success else "failed")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to update notification status of alert {alert_id}: {e}")
+
+        return callback
+
+    def find_active(self, device: str, event_key: str) -> Optional[AlertRecord]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"""
+                SELECT {COLUMNS} FROM alerts
+                WHERE device = ? AND event_key = ? AND end_time IS NULL
+                ORDER BY start_time DESC LIMIT 1
+                """,
+                (device, event_key),
+            ).fetchone()
+        return AlertRecord.from_row(row) if row else None
+
+    def active(self, device: Optional[str] = None) -> List[AlertRecord]:
+        with self._connect() as conn:
+            if device is None:
+                rows = conn.execute(
+                    f"SELECT {COLUMNS} FROM alerts WHERE end_time IS NULL ORDER BY start_time DESC"
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {COLUMNS} FROM alerts WHERE device = ? AND end_time IS NULL ORDER BY start_time DESC",
+                    (device,),
+                ).fetchall()
+        return [AlertRecord.from_row(row) for row in rows]
+
+
+def initialize_alert_database(db_path: str) -> None:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_key TEXT NOT NULL,
+                device TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                gpus TEXT,
+                users TEXT,
+                message TEXT,
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP,
+                notification TEXT NOT NULL DEFAULT 'pending'
+            )
+            """)
+        # 活跃告警只占很小一部分，使用部分索引
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_alerts_active ON alerts (device, event_key) WHERE end_time IS NULL"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_start ON alerts (start_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_device_start ON alerts (device, start_time)")
+
+
+def _alerts_frame(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=[c.strip() for c in COLUMNS.split(",")])
+    for col in ("start_time", "end_time"):
+        df[col] = pd.to_datetime(df[col]).dt.tz_localize("UTC").dt.tz_convert("Asia/Shanghai")
+    for col in ("gpus", "users"):
+        df[col] = df[col].map(lambda s: ", ".join(str(x) for x in json.loads(s or "[]")))
+    return df
+
+
+def query_active_alerts(db_path: str, device: Optional[str] = None) -> pd.DataFrame:
+    """查询活跃的告警（使用部分索引 idx_alerts_active）"""
+    if not os.path.exists(db_path):
+        return _alerts_frame([])
+    with read_connection(db_path) as conn:
+        query = f"SELECT {COLUMNS} FROM alerts WHERE end_time IS NULL"
+        params: tuple = ()
+        if device is not None:
+            query += " AND device = ?"
+            params = (device,)
+        rows = conn.execute(query + " ORDER BY start_time DESC", params).fetchall()
+    return _alerts_frame(rows)
+
+
+def query_alert_history(
+    db_path: str,
+    start_time: str,
+    end_time: str,
+    device: Optional[str] = None,
+    limit: int = 1000,
+) -> pd.DataFrame:
+    """
+    查询在 [start_time, end_time) 内开始的告警（UTC 时间字符串，使用 start_time 上的索引）
+    """
+    if not os.path.exists(db_path):
+        return _alerts_frame([])
+    with read_connection(db_path) as conn:
+        query = f"SELECT {COLUMNS} FROM alerts WHERE start_time >= ? AND start_time < ?"
+        params: tuple = (start_time, end_time)
+        if device is not None:
+            query += " AND device = ?"
+            params += (device,)
+        rows = conn.execute(query + " ORDER BY start_time DESC LIMIT ?", params + (limit,)).fetchall()
+    return _alerts_frame(rows)
+
+
+__all__ = [
+    "AlertRecord",
+    "AlertStore",
+    "initialize_alert_database",
+    "query_active_alerts",
+    "query_alert_history",
+]
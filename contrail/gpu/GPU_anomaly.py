@@ -0,0 +1,474 @@
+import os
+import math
+import json
+import time
+import sqlite3
+import datetime as dt
+import pandas as pd
+from loguru import logger
+
+from dataclasses import dataclass, replace
+from typing import Optional, List, Dict, Tuple
+
+GB = 0x40000000
+
+
+@dataclass
+class AnomalyConfig:
+    enabled: bool = False  # 规则文件中配置了 anomaly 字段时默认启用
+    state_path: Optional[str] = None  # 检测器状态，重启后继续使用；None 表示数据目录下的 anomaly_state.db
+    save_interval: float = 60.0
+    series_ttl: float = 86400.0  # 超过该时间没有数据的序列将被移除
+    max_gap: float = 600.0  # 相邻两次数据间隔超过该值时视为中断
+    # EWMA + z-score：利用率 / 显存的突变（例如任务中途利用率掉到 0）
+    ewma_alpha: float = 0.05
+    ewma_z: float = 4.0
+    ewma_warmup: int = 20
+    ewma_min_std: float = 2.0  # 利用率（%）标准差下限，显存使用 cusum_min_std
+    ewma_consecutive: int = 3  # 连续超出阈值的次数，单次的跳变（任务开始 / 结束）不报警
+    ewma_min_mem_gb: float = 1.0  # 利用率下降只在仍占用显存（任务未结束）时计入
+    # CUSUM：显存的持续上涨（泄漏）
+    cusum_k: float = 0.5  # 以标准差为单位的容许偏移
+    cusum_h: float = 10.0  # 以标准差为单位的报警阈值
+    cusum_warmup: int = 20
+    cusum_min_std: float = 0.5  # 显存（GB）标准差下限
+    # 长时间占用显存但不使用
+    idle_mem_gb: float = 20.0
+    idle_util: float = 1.0
+    idle_duration: float = 4 * 3600.0
+
+    @classmethod
+    def from_dict(cls, conf: Optional[dict]) -> "AnomalyConfig":
+        return cls(**(conf or {}))
+
+
+@dataclass
+class Anomaly:
+    device: str
+    series: str  # 例如 gpu:0 或 user:alice@gpu:1
+    kind: str  # ewma / cusum / idle
+    metric: str
+    value: float
+    score: float
+    timestamp: str
+    message: str
+    active: bool = True  # False 表示异常已结束
+
+    @property
+    def key(self) -> str:
+        """同一序列上同一检测器的异常标识"""
+        return f"anomaly:{self.kind}:{self.metric}:{self.series}"
+
+    @property
+    def gpu_index(self) -> int:
+        return int(self.series.rsplit("gpu:", 1)[1])
+
+    @property
+    def user(self) -> Optional[str]:
+        return self.series[len("user:") :].rsplit("@gpu:", 1)[0] if self.series.startswith("user:") else None
+
+
+class EwmaDetector:
+    """指数加权的均值与方差，z 连续 ewma_consecutive 次超出阈值时报警（常数内存）"""
+
+    __slots__ = ("mean", "var", "n", "streak", "active")
+
+    def __init__(self, mean: float = 0.0, var: float = 0.0, n: int = 0, streak: int = 0, active: bool = False):
+        self.mean = mean
+        self.var = var
+        self.n = n
+        self.streak = streak
+        self.active = active
+
+    def update(
+        self, x: float, config: AnomalyConfig, min_std: float, low_only: bool = False, eligible: bool = True
+    ) -> Tuple[bool, float]:
+        """
+        Args:
+            low_only (bool): 只检测低于基线的偏离；此时越界期间不更新基线，持续的下降会一直报警
+            eligible (bool): False 时本次不计入越界（例如显存已释放，下降来自任务结束）
+        """
+        if self.n == 0:
+            self.mean, self.var = x, 0.0
+            self.n = 1
+            return False, 0.0
+
+        std = max(math.sqrt(self.var), min_std)
+        z = (x - self.mean) / std
+        out = self.n >= config.ewma_warmup and eligible and (z < -config.ewma_z if low_only else abs(z) > config.ewma_z)
+        self.streak = self.streak + 1 if out else 0
+        alarm = self.streak >= config.ewma_consecutive
+        if out and low_only:
+            return alarm, z
+
+        # 双侧检测时异常值同样更新基线，持续的水平变化会逐渐成为新的基线
+        diff = x - self.mean
+        incr = config.ewma_alpha * diff
+        self.mean += incr
+        self.var = (1 - config.ewma_alpha) * (self.var + diff * incr)
+        self.n += 1
+        return alarm, z
+
+    def to_dict(self) -> dict:
+        return {"mean": self.mean, "var": self.var, "n": self.n, "streak": self.streak, "active": self.active}
+
+
+class CusumDetector:
+    """
+    单侧（上升）CUSUM 变点检测
+
+    前 cusum_warmup 个样本估计基线（Welford），之后累计超出 基线 + k·σ 的部分，超过 h·σ 时报警；
+    显存释放（任务结束）后重新估计基线
+    """
+
+    __slots__ = ("mean", "m2", "n", "s", "active")
+
+    def __init__(self, mean: float = 0.0, m2: float = 0.0, n: int = 0, s: float = 0.0, active: bool = False):
+        self.mean = mean
+        self.m2 = m2
+        self.n = n
+        self.s = s
+        self.active = active
+
+    def reset(self):
+        self.mean = self.m2 = self.s = 0.0
+        self.n = 0
+
+    def update(self, x: float, config: AnomalyConfig) -> Tuple[bool, float]:
+        if self.n < config.cusum_warmup:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+            return False, 0.0
+
+        std = max(math.sqrt(self.m2 / max(1, self.n - 1)), config.cusum_min_std)
+        self.s = max(0.0, self.s + (x - self.mean) / std - config.cusum_k)
+        return self.s > config.cusum_h, self.s
+
+    def to_dict(self) -> dict:
+        return {"mean": self.mean, "m2": self.m2, "n": self.n, "s": self.s, "active": self.active}
+
+
+class IdleHogDetector:
+    """持续占用至少 idle_mem_gb 显存且利用率不超过 idle_util 的时间超过 idle_duration 时报警"""
+
+    __slots__ = ("idle_since", "active")
+
+    def __init__(self, idle_since: Optional[float] = None, active: bool = False):
+        self.idle_since = idle_since
+        self.active = active
+
+    def update(self, mem_gb: float, util: float, ts: float, config: AnomalyConfig) -> Tuple[bool, float]:
+        if mem_gb >= config.idle_mem_gb and util <= config.idle_util:
+            if self.idle_since is None:
+                self.idle_since = ts
+            idle = ts - self.idle_since
+            return idle >= config.idle_duration, idle
+        self.idle_since = None
+        return False, 0.0
+
+    def to_dict(self) -> dict:
+        return {"idle_since": self.idle_since, "active": self.active}
+
+
+class SeriesState:
+    """单条序列（一块 GPU 或一个用户在一块 GPU 上）的所有检测器状态"""
+
+    __slots__ = ("util", "mem", "leak", "idle", "last_ts", "dirty")
+
+    def __init__(self, state: Optional[dict] = None):
+        state = state or {}
+        self.util = EwmaDetector(**state.get("util", {}))
+        self.mem = EwmaDetector(**state.get("mem", {}))
+        self.leak = CusumDetector(**state.get("leak", {}))
+        self.idle = IdleHogDetector(**state.get("idle", {}))
+        self.last_ts: Optional[float] = state.get("last_ts")
+        self.dirty = False
+
+    def reset(self):
+        self.util = EwmaDetector()
+        self.mem = EwmaDetector()
+        self.leak = CusumDetector()
+        self.idle = IdleHogDetector()
+
+    def active_kinds(self) -> List[Tuple[str, str]]:
+        """正在报警的 (检测器, 指标)"""
+        detectors = [
+            ("ewma", "util", self.util),
+            ("ewma", "mem", self.mem),
+            ("cusum", "mem", self.leak),
+            ("idle", "mem", self.idle),
+        ]
+        return [(kind, metric) for kind, metric, detector in detectors if detector.active]
+
+    def to_dict(self) -> dict:
+        return {
+            "util": self.util.to_dict(),
+            "mem": self.mem.to_dict(),
+            "leak": self.leak.to_dict(),
+            "idle": self.idle.to_dict(),
+            "last_ts": self.last_ts,
+        }
+
+
+class AnomalyMonitor:
+    """
+    基于聚合数据流的在线异常检测
+
+    每块 GPU 与每个 (用户, GPU) 维护一组常数大小的检测器状态，逐条增量更新，
+    状态定期保存到 SQLite，重启后从中恢复，无需重新扫描历史数据
+    """
+
+    def __init__(self, config: Optional[AnomalyConfig] = None):
+        self.config = config or AnomalyConfig()
+        if self.config.state_path is None:
+            self.config = replace(self.config, state_path=os.path.join("data", "anomaly_state.db"))
+        self.series: Dict[Tuple[str, str], SeriesState] = {}
+        self._loaded = set()
+        self._latest = 0.0  # 最近一次数据的时间戳，用于判断序列是否过期
+        self._last_save = time.monotonic()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.config.state_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.config.state_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS anomaly_state (
+                    device TEXT,
+                    series TEXT,
+                    state TEXT,
+                    updated REAL,
+                    PRIMARY KEY (device, series)
+                )
+                """)
+
+    def load(self, device: str):
+        """恢复设备的检测器状态（同一状态文件可能被多个进程共用，因此按设备加载）"""
+        self._loaded.add(device)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT series, state FROM anomaly_state WHERE device = ?", (device,)).fetchall()
+        for series, state in rows:
+            try:
+                self.series[(device, series)] = SeriesState(json.loads(state))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"[{device}] Ignoring corrupted anomaly state for {series}: {e}")
+        if rows:
+            logger.info(f"[{device}] Restored {len(rows)} anomaly detector states from {self.config.state_path}")
+
+    def save(self, force: bool = False) -> List[Tuple[str, str, str, str]]:
+        """
+        保存有变化的序列状态并移除过期的序列
+
+        Returns:
+            List[Tuple[str, str, str, str]]: 过期时仍在报警的 (设备, 序列, 检测器, 指标)
+        """
+        now = time.monotonic()
+        if not force and now - self._last_save < self.config.save_interval:
+            return []
+        self._last_save = now
+
+        expire = self._latest - self.config.series_ttl
+        expired = [key for key, state in self.series.items() if state.last_ts is not None and state.last_ts < expire]
+        cleared = []
+        for key in expired:
+            cleared += [(*key, kind, metric) for kind, metric in self.series.pop(key).active_kinds()]
+
+        rows = [
+            (device, series, json.dumps(state.to_dict()), state.last_ts)
+            for (device, series), state in self.series.items()
+            if state.dirty
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO anomaly_state VALUES (?, ?, ?, ?)", rows)
+            conn.executemany("DELETE FROM anomaly_state WHERE device = ? AND series = ?", expired)
+        for (device, series), state in self.series.items():
+            state.dirty = False
+        return cleared
+
+    @staticmethod
+    def _edge(detector, alarm: bool) -> int:
+        """报警开始时返回 1，结束时返回 -1"""
+        edge = int(alarm) - int(detector.active)
+        detector.active = alarm
+        return edge
+
+    def _update_series(
+        self,
+        device: str,
+        series: str,
+        util: float,
+        mem_gb: float,
+        ts: float,
+        timestamp: str,
+        check_idle: bool,
+    ) -> List[Anomaly]:
+        config = self.config
+        anomalies = []
+
+        def report(kind: str, metric: str, value: float, score: float, message: str, edge: int = 1):
+            if edge < 0:
+                message = f"back to normal ({metric} = {value:.1f})"
+            if edge:
+                anomalies.append(Anomaly(device, series, kind, metric, value, score, timestamp, message, edge > 0))
+
+        state = self.series.get((device, series))
+        if state is None:
+            state = self.series[(device, series)] = SeriesState()
+        elif state.last_ts is not None and ts - state.last_ts > config.max_gap:
+            # 数据中断（例如设备离线）后重新学习基线
+            for kind, metric in state.active_kinds():
+                anomalies.append(Anomaly(device, series, kind, metric, 0.0, 0.0, timestamp, "data interrupted", False))
+            state.reset()
+        state.last_ts = ts
+        state.dirty = True
+        self._latest = max(self._latest, ts)
+
+        # 利用率只检测任务进行中（仍占用显存）的下降，任务开始 / 结束的跳变不报警
+        baseline = state.util.mean
+        alarm, z = state.util.update(
+            util, config, config.ewma_min_std, low_only=True, eligible=mem_gb >= config.ewma_min_mem_gb
+        )
+        report(
+            "ewma",
+            "util",
+            util,
+            z,
+            f"utilization {util:.0f}% dropped below baseline {baseline:.0f}% while holding {mem_gb:.1f} GB (z={z:.1f})",
+            self._edge(state.util, alarm),
+        )
+
+        baseline = state.mem.mean
+        alarm, z = state.mem.update(mem_gb, config, config.cusum_min_std)
+        report(
+            "ewma",
+            "mem",
+            mem_gb,
+            z,
+            f"memory {mem_gb:.1f} GB deviates from baseline {baseline:.1f} GB (z={z:.1f})",
+            self._edge(state.mem, alarm),
+        )
+
+        if mem_gb > 0:
+            alarm, s = state.leak.update(mem_gb, config)
+        else:
+            # 任务结束，重新估计下一个任务的基线
+            state.leak.reset()
+            alarm, s = False, 0.0
+        report(
+            "cusum",
+            "mem",
+            mem_gb,
+            s,
+            f"memory keeps rising: {mem_gb:.1f} GB vs baseline {state.leak.mean:.1f} GB",
+            self._edge(state.leak, alarm),
+        )
+
+        if check_idle:
+            alarm, idle = state.idle.update(mem_gb, util, ts, config)
+            report(
+                "idle",
+                "mem",
+                mem_gb,
+                idle,
+                f"holding {mem_gb:.1f} GB at {util:.0f}% utilization for {idle / 3600:.1f} h",
+                self._edge(state.idle, alarm),
+            )
+
+        return anomalies
+
+    def update(
+        self, gpu_df: pd.DataFrame, device: str = "default", user_df: Optional[pd.DataFrame] = None
+    ) -> List[Anomaly]:
+        """
+        输入一次聚合结果，返回新出现（active 为 True）与已结束（active 为 False）的异常
+
+        Args:
+            gpu_df (pd.DataFrame): 聚合后的 GPU 数据（gpu_index, gpu_utilization, used_memory, timestamp）
+            device (str, optional): 设备名称. Defaults to "default".
+            user_df (Optional[pd.DataFrame], optional): 聚合后的用户数据（gpu_index, user, gpu_utilization, used_memory）
+        """
+        if not self.config.enabled or gpu_df.empty:
+            return []
+        if device not in self._loaded:
+            self.load(device)
+
+        timestamp = str(gpu_df["timestamp"].iloc[0]) if "timestamp" in gpu_df.columns else None
+        if timestamp:
+            ts = dt.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=dt.timezone.utc).timestamp()
+        else:
+            ts = time.time()
+            timestamp = dt.datetime.fromtimestamp(ts, tz=dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+        anomalies = []
+        for gpu_index, util, mem in gpu_df[["gpu_index", "gpu_utilization", "used_memory"]].itertuples(index=False):
+            anomalies += self._update_series(device, f"gpu:{gpu_index}", float(util), mem / GB, ts, timestamp, False)
+
+        if user_df is not None and not user_df.empty:
+            seen = set()
+            for gpu_index, user, util, mem in user_df[
+                ["gpu_index", "user", "gpu_utilization", "used_memory"]
+            ].itertuples(index=False):
+                series = f"user:{user}@gpu:{gpu_index}"
+                seen.add(series)
+                anomalies += self._update_series(device, series, float(util), mem / GB, ts, timestamp, True)
+            # 本次未出现的用户视为已释放显存
+            for (dev, series), state in self.series.items():
+                if (
+                    dev == device
+                    and series.startswith("user:")
+                    and series not in seen
+                    and state.idle.idle_since is not None
+                ):
+                    if state.idle.active:
+                        anomalies.append(
+                            Anomaly(device, series, "idle", "mem", 0.0, 0.0, timestamp, "memory released", False)
+                        )
+                    state.idle = IdleHogDetector()
+                    state.dirty = True
+
+        for dev, series, kind, metric in self.save():
+            anomalies.append(Anomaly(dev, series, kind, metric, 0.0, 0.0, timestamp, "series expired", False))
+
+        for anomaly in anomalies:
+            if anomaly.active:
+                logger.warning(f"[{device}] Anomaly on {anomaly.series}: {anomaly.message}")
+            else:
+                logger.info(
+                    f"[{anomaly.device}] Anomaly on {anomaly.series} cleared ({anomaly.kind}): {anomaly.message}"
+                )
+
+        return anomalies
+
+    def remove_device(self, device: str):
+        self.save(force=True)
+        self._loaded.discard(device)
+        for key in [k for k in self.series if k[0] == device]:
+            del self.series[key]
+
+
+def load_anomaly_config(path: Optional[str] = None, data_dir: str = "data") -> AnomalyConfig:
+    """
+    从故障规则文件的 anomaly 字段读取异常检测配置，未配置时不启用；
+    未指定 state_path 时状态保存在 data_dir 下的 anomaly_state.db
+    """
+    conf = None
+    if path is not None:
+        with open(path, "r") as f:
+            config = json.load(f)
+        conf = config.get("anomaly") if isinstance(config, dict) else None
+    if not isinstance(conf, dict):
+        return AnomalyConfig()
+
+    config = AnomalyConfig.from_dict({"enabled": True, **conf})
+    if config.state_path is None:
+        config.state_path = os.path.join(data_dir, "anomaly_state.db")
+    return config
+
+
+__all__ = ["AnomalyConfig", "Anomaly", "AnomalyMonitor", "load_anomaly_config"]
@@ -7,6 +7,9 @@ from datetime import datetime
 from loguru import logger
 
 from contrail.gpu.GPU_logger import *
+from contrail.gpu.GPU_fault_rules import load_fault_rules
+from contrail.gpu.GPU_anomaly import load_anomaly_config
+from contrail.utils.scheduler import FixedRateScheduler, Ticker
 
 
 SENDER_ERR_TEMPLATE = EmailTemplate(
@@ -27,6 +30,10 @@ class GpuSenderConfig:
     server_ip: str
     server_port: int
     aggr_period: int = 30
+    fault_detection: bool = False
+    fault_rules: Optional[str] = None
+    email_config: str = "config/email_config.json"
+    alert_db_path: Optional[str] = None  # 告警记录，避免重启后重复告警
 
 
 def build_header(data_len):
@@ -37,7 +44,7 @@ def build_header(data_len):
 # 发送 GPU 信息的函数
 def send_gpu_info(
     args,
-    fault_detector: GpuFaultDetector = None,
+    fault_detector: Optional[Union[GpuFaultDetector, FaultDetectionWorker]] = None,
     sender: EmailSender = None,
 ):
     # 初始化 Socket
@@ -56,15 +63,15 @@ def send_gpu_info(
     logger.info("Database initialized.")
     AGGR_PERIOD = args.aggr_period
 
-    def job_aggregate():
+    def job_aggregate(timestamp: dt.datetime):
         logger.trace("Running aggregation job...")
-        timestamp = dt.datetime.now(tz=dt.timezone.utc)
         aggregate_data(
             timestamp,
             period_s=AGGR_PERIOD,
             db_path=DB_PATH,
             db_realtime_path=DB_REALTIME_PATH,
             fault_detector=fault_detector,
+            device_name=args.name,
         )
 
     def job_clean():
@@ -72,8 +79,11 @@ def send_gpu_info(
         timestamp = dt.datetime.now(tz=dt.timezone.utc)
         remove_old_data(timestamp, period_s=3600, db_path=DB_REALTIME_PATH)
 
-    schedule.every(AGGR_PERIOD).seconds.do(job_aggregate)
-    schedule.every(3600).seconds.do(job_clean)
+    scheduler = FixedRateScheduler(args.name)
+    # 聚合窗口对齐到 AGGR_PERIOD 的整数倍，延迟 2 秒执行以等待窗口末尾的采样写入
+    scheduler.every(AGGR_PERIOD, job_aggregate, offset=2.0, pass_boundary=True, catch_up=10)
+    scheduler.every(3600, job_clean)
+    ticker = Ticker(1.0, name=f"{args.name}:send")
 
     try:
         while True:
@@ -93,7 +103,7 @@ def send_gpu_info(
             gpu_dfs = process_gpu_info(gpu_info)
 
             update_database(gpu_dfs, curr_time, DB_REALTIME_PATH)
-            schedule.run_pending()
+            scheduler.run_pending()
 
             # 发送数据
             data_len = len(message)
@@ -104,8 +114,8 @@ def send_gpu_info(
             client_socket.sendall(header)
             client_socket.sendall(message.encode("utf-8"))
 
-            # 间隔 1 秒发送一次
-            time.sleep(1)
+            # 每秒整点发送一次
+            ticker.wait()
     except KeyboardInterrupt:
         logger.info("Stopping GPU data sender...")
     except Exception as e:
@@ -126,10 +136,11 @@ if __name__ == "__main__":
     parser.add_argument("--name", type=str, help="The name of the server.", default="virgo_local")
     parser.add_argument("--server_ip", type=str, required=True, help="The IP address of the server.")
     parser.add_argument("--server_port", type=int, required=True, help="The port of the server.")
-    parser.add_argument("--ngpus", type=int, help="The number of GPUs to monitor.", default=8)
-    parser.add_argument("--gmem", type=int, help="The total memory of the GPU in GB.", default=48)
+    parser.add_argument("--ngpus", type=int, help="Deprecated: the number of GPUs is detected automatically.", default=None)
+    parser.add_argument("--gmem", type=int, help="Fallback total memory of the GPU in GB.", default=48)
     parser.add_argument("--aggr_period", type=int, help="The aggregation period in seconds.", default=30)
     parser.add_argument("--fault_detection", type=bool, help="Whether to enable fault detection.", default=False)
+    parser.add_argument("--fault_rules", type=str, help="Fault rules config file (default rules if omitted).", default=None)
 
     args = parser.parse_args()
 
@@ -138,7 +149,11 @@ if __name__ == "__main__":
     if args.fault_detection:
         SERVER_PASSPORT = getpass.getpass("Please input your email passport: ")
         sender = EmailSender(password=SERVER_PASSPORT)
-        fault_detector = GpuFaultDetector(password=SERVER_PASSPORT, NGPU=args.ngpus, GMEM=args.gmem)
+        rules = load_fault_rules(args.fault_rules)
+        anomaly = load_anomaly_config(args.fault_rules)
+        fault_detector = FaultDetectionWorker(
+            GpuFaultDetector(password=SERVER_PASSPORT, GMEM=args.gmem, rules=rules, anomaly=anomaly)
+        )
 
     sender_config = GpuSenderConfig(
         name=args.name,
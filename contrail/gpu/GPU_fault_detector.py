@@ -1,189 +1,560 @@
+import os
+import queue
+import threading
 import pandas as pd
 import numpy as np
 from loguru import logger
 
-from abc import abstractmethod
-from typing import Optional, List, Tuple
+from string import Template
+from typing import Callable, Optional, List, Tuple, Dict, Union
 
 from contrail.utils.email_sender import EmailSender, EmailTemplate, BasicEvent
+from contrail.utils.notification import NotificationDispatcher
+from contrail.gpu.GPU_fault_rules import FaultRule, FaultRuleEngine, load_fault_rules
+from contrail.gpu.GPU_anomaly import Anomaly, AnomalyConfig, AnomalyMonitor, load_anomaly_config
+from contrail.gpu.GPU_alert_store import AlertStore
+
+
+class GpuUsageBuffer:
+    """
+    单个设备的 GPU 使用历史（环形缓冲区）
+
+    预分配 history_length x NGPU 的数组，并维护每列的累加和，
+    每次更新只替换最旧的一行，均值的计算为 O(NGPU)
+    """
+
+    def __init__(self, ngpu: int, gmem: np.ndarray, history_length: int = 20):
+        self.NGPU = ngpu
+        self.GMEM = gmem  # 每块 GPU 的显存总量（bytes）
+        self.HISTORY_LENGTH = history_length
+        self.util_history = np.zeros((history_length, ngpu))
+        self.mem_history = np.zeros((history_length, ngpu))
+        self.util_sum = np.zeros(ngpu)
+        self.mem_sum = np.zeros(ngpu)
+        self.pos = 0
+
+    def push(self, gpu_utils: np.ndarray, gpu_mems: np.ndarray) -> None:
+        self.util_sum += gpu_utils - self.util_history[self.pos]
+        self.mem_sum += gpu_mems - self.mem_history[self.pos]
+        self.util_history[self.pos] = gpu_utils
+        self.mem_history[self.pos] = gpu_mems
+        self.pos = (self.pos + 1) % self.HISTORY_LENGTH
+
+        if self.pos == 0:
+            # 每轮重新求和，避免浮点误差累积
+            self.util_sum = self.util_history.sum(axis=0)
+            self.mem_sum = self.mem_history.sum(axis=0)
+
+    @property
+    def gpu_utils(self) -> np.ndarray:
+        # 与原实现一致：未填满的历史按 0 计入平均值
+        return self.util_sum / self.HISTORY_LENGTH
+
+    @property
+    def gpu_mems(self) -> np.ndarray:
+        return self.mem_sum / self.HISTORY_LENGTH
+
+    def history(self, metric: str) -> np.ndarray:
+        return self.util_history if metric == "util" else self.mem_history
+
+    def sums(self, metric: str) -> np.ndarray:
+        return self.util_sum if metric == "util" else self.mem_sum
+
+
+class UserUsageBuffer(GpuUsageBuffer):
+    """
+    单个设备上各用户在每块 GPU 上的使用历史，数组形状为 history_length x 用户数 x NGPU
+
+    新用户追加在末尾；整个窗口内都未出现的用户在每轮结束时移除（generation 随之增加）
+    """
+
+    def __init__(self, ngpu: int, history_length: int = 20):
+        super().__init__(0, np.zeros(0), history_length)
+        self.NGPU = ngpu
+        self.users: List[str] = []
+        self.generation = 0
+        self._allocate(0)
+
+    def _allocate(self, n_users: int):
+        shape = (self.HISTORY_LENGTH, n_users, self.NGPU)
+        util_history, mem_history = np.zeros(shape), np.zeros(shape)
+        n = min(n_users, self.util_history.shape[1]) if self.util_history.ndim == 3 else 0
+        if n:
+            util_history[:, :n] = self.util_history[:, :n]
+            mem_history[:, :n] = self.mem_history[:, :n]
+        self.util_history, self.mem_history = util_history, mem_history
+        self.util_sum = util_history.sum(axis=0)
+        self.mem_sum = mem_history.sum(axis=0)
+
+    def push_users(self, user_idx: Dict[str, int], user_df: pd.DataFrame, gmem: np.ndarray) -> None:
+        new_users = [u for u in user_df["user"].unique() if u not in user_idx]
+        if new_users:
+            self.users.extend(new_users)
+            user_idx.update({u: i for i, u in enumerate(self.users)})
+            self._allocate(len(self.users))
+
+        utils = np.zeros((len(self.users), self.NGPU))
+        mems = np.zeros((len(self.users), self.NGPU))
+        if not user_df.empty:
+            rows = user_df["user"].map(user_idx).to_numpy()
+            cols = user_df["gpu_index"].to_numpy(dtype=int)
+            valid = cols < self.NGPU
+            rows, cols = rows[valid], cols[valid]
+            utils[rows, cols] = user_df["gpu_utilization"].to_numpy(dtype=float)[valid]
+            mems[rows, cols] = user_df["used_memory"].to_numpy(dtype=float)[valid] / gmem[cols]
+        self.push(utils, mems)
+
+        if self.pos == 0:
+            self._compact(user_idx)
+
+    def _compact(self, user_idx: Dict[str, int]):
+        active = (self.util_history.any(axis=(0, 2))) | (self.mem_history.any(axis=(0, 2)))
+        if active.all():
+            return
+        self.users = [u for u, keep in zip(self.users, active) if keep]
+        self.util_history = self.util_history[:, active]
+        self.mem_history = self.mem_history[:, active]
+        self.util_sum = self.util_history.sum(axis=0)
+        self.mem_sum = self.mem_history.sum(axis=0)
+        user_idx.clear()
+        user_idx.update({u: i for i, u in enumerate(self.users)})
+        self.generation += 1
 
 
 class GpuUsageManager:
+    """
+    管理多个设备的 GPU 使用历史
+
+    GPU 数量与每块 GPU 的显存由上报的数据确定（total_memory 列），
+    缺少该列时使用 GMEM（GB）作为默认值；GPU 数量变化时重置该设备的历史
+    """
+
     def __init__(
         self,
-        NGPU: int = 8,
         GMEM: int = 48,
         history_length: int = 20,
     ):
-        self.NGPU = NGPU
         self.GMEM = GMEM
         self.HISTORY_LENGTH = history_length  # 10 minutes history length
-        self.util_history = np.zeros((NGPU, self.HISTORY_LENGTH))
-        self.mem_history = np.zeros((NGPU, self.HISTORY_LENGTH))
-        self.gpu_utils = np.zeros(NGPU)
-        self.gpu_mems = np.zeros(NGPU)
+        self.buffers: Dict[str, GpuUsageBuffer] = {}
+        self.user_buffers: Dict[str, UserUsageBuffer] = {}
+        self._user_idx: Dict[str, Dict[str, int]] = {}
+
+    def devices(self) -> List[str]:
+        return list(self.buffers.keys())
+
+    def buffer(self, device: str = "default") -> Optional[GpuUsageBuffer]:
+        return self.buffers.get(device)
+
+    def user_buffer(self, device: str = "default") -> Optional[UserUsageBuffer]:
+        return self.user_buffers.get(device)
 
-    def update_usage(self, gpu_df: pd.DataFrame) -> None:
+    def update_usage(self, gpu_df: pd.DataFrame, device: str = "default") -> None:
         """
-        更新 GPU 使用情况数据并计算平均值
+        更新设备的 GPU 使用情况数据并计算平均值
         """
-        if len(gpu_df) != self.NGPU:
-            logger.warning(f"Expected {self.NGPU} GPUs, but got {len(gpu_df)}")
+        if gpu_df.empty:
             return
+        if "gpu_index" in gpu_df.columns:
+            gpu_df = gpu_df.sort_values("gpu_index")
+
+        gpu_utils = gpu_df["gpu_utilization"].to_numpy(dtype=float)
+        used_memory = gpu_df["used_memory"].to_numpy(dtype=float)
+        if "total_memory" in gpu_df.columns:
+            total_memory = gpu_df["total_memory"].to_numpy(dtype=float)
+            total_memory = np.where(total_memory > 0, total_memory, self.GMEM * 0x40000000)
+        else:
+            total_memory = np.full(len(gpu_df), self.GMEM * 0x40000000, dtype=float)
+
+        buffer = self.buffers.get(device)
+        if buffer is None or buffer.NGPU != len(gpu_df):
+            if buffer is not None:
+                logger.warning(f"[{device}] GPU count changed from {buffer.NGPU} to {len(gpu_df)}, resetting history")
+            buffer = self.buffers[device] = GpuUsageBuffer(len(gpu_df), total_memory, self.HISTORY_LENGTH)
+            self.user_buffers.pop(device, None)
+        else:
+            buffer.GMEM = total_memory
+
+        buffer.push(gpu_utils, used_memory / total_memory)
+
+    def update_user_usage(self, user_df: pd.DataFrame, device: str = "default") -> None:
+        """
+        更新设备上各用户的使用情况，需在 update_usage() 之后调用
+        """
+        buffer = self.buffers.get(device)
+        if buffer is None:
+            return
+        user_buffer = self.user_buffers.get(device)
+        if user_buffer is None:
+            user_buffer = self.user_buffers[device] = UserUsageBuffer(buffer.NGPU, self.HISTORY_LENGTH)
+            self._user_idx[device] = {}
+        user_buffer.push_users(self._user_idx[device], user_df, buffer.GMEM)
 
-        gpu_utils = gpu_df["gpu_utilization"].values
-        gpu_mems = gpu_df["used_memory"].values / 0x40000000 / self.GMEM
+    def query_usage(self, gpu_idx: List[int], device: str = "default") -> Tuple[List[float], List[float]]:
+        """
+        查询出现问题的 GPU 使用情况
+        """
+        buffer = self.buffers[device]
+        return buffer.gpu_utils[gpu_idx], buffer.gpu_mems[gpu_idx]
 
-        # 更新历史记录
-        self.util_history = np.roll(self.util_history, shift=1, axis=1)
-        self.mem_history = np.roll(self.mem_history, shift=1, axis=1)
+    def remove_device(self, device: str) -> None:
+        self.buffers.pop(device, None)
+        self.user_buffers.pop(device, None)
+        self._user_idx.pop(device, None)
 
-        self.util_history[:, 0] = gpu_utils
-        self.mem_history[:, 0] = gpu_mems
 
-        # 计算 GPU 使用情况的平均值
-        self.gpu_utils = np.mean(self.util_history, axis=1)
-        self.gpu_mems = np.mean(self.mem_history, axis=1)
+FAULT_MAIL_CONTENT = """
+        [Fault Detection Alert]
+        Rule: ${rule}
+        Time: ${time}
+        Device: ${device}
+        GPU Utilization: ${util}%
+        Memory Usage: ${mem}%
+        Users: ${users}
 
-    def query_usage(self, gpu_idx: List[int]) -> Tuple[List[float], List[float]]:
+        ${description}
+        Please check the GPU ${gpu_index} immediately.
         """
-        查询出现问题的 GPU 使用情况
+
+
+ANOMALY_MAIL_SUBJECT = "GPU Anomaly Detection: ${kind} on ${device}"
+
+ANOMALY_MAIL_CONTENT = """
+        [Anomaly Detection Alert]
+        Detector: ${kind}
+        Time: ${time}
+        Device: ${device}
+        Series: ${series}
+        Metric: ${metric} = ${value}
+        Score: ${score}
+
+        ${message}
         """
-        return self.gpu_utils[gpu_idx], self.gpu_mems[gpu_idx]
+
+ANOMALY_KINDS = {
+    "ewma": "Sudden Change",
+    "cusum": "Memory Creeping Up",
+    "idle": "Idle Memory Hog",
+}
 
 
 class GpuFaultEvent(BasicEvent):
+    """
+    单个设备上一条故障规则的事件状态
+
+    由 GpuFaultDetector 在每次更新后设置规则的触发掩码，任意 GPU（或用户）触发时事件激活；
+    提供 store 时事件记录到告警库，并在创建时恢复仍处于活跃状态的事件（不重复发送告警）
+    """
+
     def __init__(
         self,
-        mail_subject: str,
-        mail_content: str,
+        rule: FaultRule,
         gpu_usage_manager: GpuUsageManager,
         config_file: str = "email_config.json",
         password: Optional[str] = None,
+        device: str = "default",
+        sender: Optional[Union[EmailSender, NotificationDispatcher]] = None,
+        store: Optional[AlertStore] = None,
     ):
+        self.rule = rule
         self.gpu_usage_manager = gpu_usage_manager
+        self.device = device
+        self.store = store
+        self.event_key = f"rule:{rule.name}"
+        self.alert_id: Optional[int] = None
+        self._grace = 0
+        self.mask: Optional[np.ndarray] = None
         self.fault_idxs = []
+        self.fault_users = []
         self.fault_utils = []
         self.fault_mems = []
 
-        self.mail_subject = mail_subject
-        self.mail_content = mail_content
+        self.mail_subject = rule.subject or f"GPU Fault Detection: {rule.name}"
+        self.mail_content = FAULT_MAIL_CONTENT
 
-        self.sender = EmailSender(config_file, password)
+        self.sender = sender or EmailSender(config_file, password)
         self.template = EmailTemplate(subject=self.mail_subject, content=self.mail_content)
 
         get_dyn_content = lambda: {
+            "rule": self.rule.name,
+            "description": self.rule.description,
             "time": self.event_start.strftime("%Y-%m-%d %H:%M:%S"),
             "util": self.fault_utils,
             "mem": self.fault_mems,
             "gpu_index": self.fault_idxs,
+            "users": self.fault_users or "-",
+            "device": self.device,
         }
 
-        self.active_action = lambda: self.template(
-            self.sender,
-            **get_dyn_content(),
-        )
+        self.active_action = lambda: self._notify(self.template.render(**get_dyn_content()))
 
-        super().__init__(init_status=False, active_action=self.active_action)
+        super().__init__(init_status=False, active_action=self.active_action, deactive_action=self._close_alert)
+        self._rehydrate()
 
-    def update(self) -> None:
+    def _rehydrate(self) -> None:
+        if self.store is None:
+            return
+        record = self.store.find_active(self.device, self.event_key)
+        if record is None:
+            return
+        self.status = True
+        self.event_start = record.start_time.astimezone().replace(tzinfo=None)
+        self.alert_id = record.id
+        self.fault_idxs, self.fault_users = record.gpus, record.users
+        # 重启后使用历史需要重新积累，期间不结束已恢复的事件
+        self._grace = self.gpu_usage_manager.HISTORY_LENGTH
+        logger.info(f"[{self.device}] Restored active alert {self.rule.name} (id {record.id}) since {record.start_time}")
+
+    def _notify(self, content: str) -> None:
+        if self.store is None:
+            self.sender.send_email(self.mail_subject, content)
+            return
+
+        self.alert_id = self.store.open(
+            self.device, self.event_key, "rule", self.rule.name, self.fault_idxs, self.fault_users, self.rule.description
+        )
+        if isinstance(self.sender, NotificationDispatcher):
+            self.sender.submit(self.mail_subject, content, callback=self.store.notification_callback(self.alert_id))
+            return
+        try:
+            self.sender.deliver(self.mail_subject, content)
+            self.store.set_notification(self.alert_id, "sent")
+        except Exception as e:
+            logger.error(f"Failed to send email: {e}")
+            self.store.set_notification(self.alert_id, "failed")
+
+    def _close_alert(self) -> None:
+        if self.store is not None and self.alert_id is not None:
+            self.store.close(self.alert_id)
+        self.alert_id = None
+
+    def update(self, mask: Optional[np.ndarray] = None) -> None:
         # 判断是否触发事件
+        self.mask = mask
+        prev_idxs, prev_users = self.fault_idxs, self.fault_users
         self.fault_idxs = self._check_fault_gpus()
-        self.fault_utils, self.fault_mems = self.gpu_usage_manager.query_usage(self.fault_idxs)
+        self.fault_utils, self.fault_mems = self.gpu_usage_manager.query_usage(self.fault_idxs, self.device)
 
         is_fault = len(self.fault_idxs) > 0
+        if self._grace > 0:
+            self._grace -= 1
+            if not is_fault:
+                self.fault_idxs, self.fault_users = prev_idxs, prev_users
+                return
+            self._grace = 0
+
+        if is_fault and self.status and self.alert_id is not None and self.store is not None:
+            if (self.fault_idxs, self.fault_users) != (prev_idxs, prev_users):
+                self.store.update_targets(self.alert_id, self.fault_idxs, self.fault_users)
         super().update(is_fault)
 
-    @abstractmethod
     def _check_fault_gpus(self) -> List[int]:
-        return []
-
-
-class GpuOverloadFaultEvent(GpuFaultEvent):
-    def __init__(
-        self,
-        gpu_usage_manager: GpuUsageManager,
-        config_file: str = "email_config.json",
-        password: Optional[str] = None,
-    ):
-        mail_subject = "GPU Fault Detection: High Utilization and Low Memory Usage"
-        mail_content = """
-        [Fault Detection Alert]
-        Time: ${time}
-        GPU Utilization: ${util}%
-        Memory Usage: ${mem}%
-
-        Please check the GPU ${gpu_index} immediately.
-        """
-
-        super().__init__(mail_subject, mail_content, gpu_usage_manager, config_file, password)
-
-    def _check_fault_gpus(self) -> List[int]:
-        """检测 GPU 是否过载"""
-
-        falut_gpus = []
-
-        for i in range(self.gpu_usage_manager.NGPU):
-            if self.gpu_usage_manager.gpu_utils[i] > 90 and self.gpu_usage_manager.gpu_mems[i] < 0.2:
-                falut_gpus.append(i)
-
-        if len(falut_gpus) > 0:
-            logger.warning(f"Detected GPU overload faults: {falut_gpus}")
-
+        if self.mask is None or not self.mask.any():
+            self.fault_users = []
+            return []
+
+        if self.rule.scope == "user":
+            user_rows, gpu_idxs = np.nonzero(self.mask)
+            users = self.gpu_usage_manager.user_buffer(self.device).users  # type: ignore[union-attr]
+            self.fault_users = sorted({users[i] for i in user_rows})
+            falut_gpus = sorted(set(gpu_idxs.tolist()))
+        else:
+            self.fault_users = []
+            falut_gpus = np.flatnonzero(self.mask).tolist()
+
+        logger.warning(f"[{self.device}] Fault rule {self.rule.name} triggered on GPU {falut_gpus} {self.fault_users or ''}")
         return falut_gpus
 
 
-class GpuUnderutilizedFaultEvent(GpuFaultEvent):
-    def __init__(
-        self,
-        gpu_usage_manager: GpuUsageManager,
-        config_file: str = "email_config.json",
-        password: Optional[str] = None,
-    ):
-        mail_subject = "GPU Fault Detection: Low Utilization and High Memory Usage"
-        mail_content = """
-        [Fault Detection Alert]
-        Time: ${time}
-        GPU Utilization: ${util}%
-        Memory Usage: ${mem}%
-
-        Please check the GPU ${gpu_index} immediately.
-        """
-
-        super().__init__(mail_subject, mail_content, gpu_usage_manager, config_file, password)
-
-    def _check_fault_gpus(self) -> List[int]:
-        """检测 GPU 是否异常低负载"""
-
-        falut_gpus = []
-
-        for i in range(self.gpu_usage_manager.NGPU):
-            if self.gpu_usage_manager.gpu_utils[i] < 10 and self.gpu_usage_manager.gpu_mems[i] > 0.9:
-                falut_gpus.append(i)
-
-        if len(falut_gpus) > 0:
-            logger.warning(f"Detected GPU underutilized faults: {falut_gpus}")
-
-        return falut_gpus
+class GpuFaultDetector:
+    """
+    GPU 故障检测，单个实例可同时检测多个设备
 
+    规则由 rules 声明（默认见 DEFAULT_FAULT_RULES），每次更新时由 FaultRuleEngine 一次评估所有规则；
+    每个设备维护独立的使用历史与事件状态，首次收到该设备的数据时创建。
+    提供 alert_db_path 时告警记录到 AlertStore，重启后恢复活跃的告警
+    """
 
-class GpuFaultDetector:
     def __init__(
         self,
         config_file: str = "email_config.json",
         password: Optional[str] = None,
-        NGPU: int = 8,
         GMEM: int = 48,
+        rules: Optional[List[Union[FaultRule, dict]]] = None,
+        anomaly: Optional[AnomalyConfig] = None,
+        alert_db_path: Optional[str] = None,
     ):
-        self.gpu_usage_manager = GpuUsageManager(NGPU, GMEM)
+        self.config_file = config_file
+        self.password = password
+        self.gpu_usage_manager = GpuUsageManager(GMEM)
+        # 告警通过后台队列发送，不阻塞检测
+        self.sender = NotificationDispatcher(EmailSender(config_file, password))
+        self.store = AlertStore(alert_db_path) if alert_db_path else None
+
+        if rules is None:
+            rules = load_fault_rules()  # type: ignore[assignment]
+        self.engine = FaultRuleEngine([r if isinstance(r, FaultRule) else FaultRule.from_dict(r) for r in rules])
+        self.events: Dict[str, List[GpuFaultEvent]] = {}
+        # 统计异常检测，anomaly 为 None 时不启用
+        self.anomaly = AnomalyMonitor(anomaly) if anomaly is not None and anomaly.enabled else None
+
+    def _device_events(self, device: str) -> List[GpuFaultEvent]:
+        if device not in self.events:
+            self.events[device] = [
+                GpuFaultEvent(
+                    rule, self.gpu_usage_manager, self.config_file, self.password, device, self.sender, self.store
+                )
+                for rule in self.engine.rules
+            ]
+        return self.events[device]
+
+    def update(self, gpu_df: pd.DataFrame, device: str = "default", user_df: Optional[pd.DataFrame] = None) -> None:
+        self.gpu_usage_manager.update_usage(gpu_df, device)
+        if user_df is not None:
+            self.gpu_usage_manager.update_user_usage(user_df, device)
+        buffer = self.gpu_usage_manager.buffer(device)
+        if buffer is None:
+            return
+
+        masks = self.engine.evaluate(buffer, self.gpu_usage_manager.user_buffer(device), device)
+        for event in self._device_events(device):
+            event.update(masks[event.rule.name])
 
-        self.events = [
-            GpuOverloadFaultEvent(self.gpu_usage_manager, config_file, password),
-            GpuUnderutilizedFaultEvent(self.gpu_usage_manager, config_file, password),
-        ]
+        if self.anomaly is not None:
+            for anomaly in self.anomaly.update(gpu_df, device, user_df):
+                self._handle_anomaly(anomaly)
 
-    def update(self, gpu_df: pd.DataFrame) -> None:
-        self.gpu_usage_manager.update_usage(gpu_df)
+    def _handle_anomaly(self, anomaly: Anomaly) -> None:
+        if self.store is None:
+            if anomaly.active:
+                self._notify_anomaly(anomaly)
+            return
 
-        for event in self.events:
-            event.update()
+        record = self.store.find_active(anomaly.device, anomaly.key)
+        if not anomaly.active:
+            if record is not None:
+                self.store.close(record.id, anomaly.timestamp)
+            return
+        if record is not None:
+            # 已记录且未结束（例如检测器状态丢失后重新触发），不重复告警
+            return
+        user = anomaly.user
+        alert_id = self.store.open(
+            anomaly.device,
+            anomaly.key,
+            "anomaly",
+            anomaly.kind,
+            [anomaly.gpu_index],
+            [user] if user else [],
+            anomaly.message,
+            anomaly.timestamp,
+        )
+        self._notify_anomaly(anomaly, self.store.notification_callback(alert_id))
+
+    def _notify_anomaly(self, anomaly: Anomaly, callback: Optional[Callable[[bool], None]] = None) -> None:
+        kind = ANOMALY_KINDS.get(anomaly.kind, anomaly.kind)
+        subject = Template(ANOMALY_MAIL_SUBJECT).safe_substitute(kind=kind, device=anomaly.device)
+        content = EmailTemplate(subject=subject, content=ANOMALY_MAIL_CONTENT).render(
+            kind=kind,
+            time=anomaly.timestamp,
+            device=anomaly.device,
+            series=anomaly.series,
+            metric=anomaly.metric,
+            value=f"{anomaly.value:.2f}",
+            score=f"{anomaly.score:.2f}",
+            message=anomaly.message,
+        )
+        self.sender.submit(subject, content, callback=callback)
+
+    def remove_device(self, device: str) -> None:
+        self.gpu_usage_manager.remove_device(device)
+        self.engine.forget(device)
+        self.events.pop(device, None)
+        if self.anomaly is not None:
+            self.anomaly.remove_device(device)
+        if self.store is not None:
+            self.store.close_device(device)
+
+    def close(self) -> None:
+        """保存异常检测状态并发送剩余的通知"""
+        if self.anomaly is not None:
+            self.anomaly.save(force=True)
+        self.sender.close()
+
+
+class FaultDetectionWorker:
+    """
+    在后台线程中执行故障检测
+
+    聚合任务只负责投递聚合后的数据（非阻塞），规则评估与邮件发送不会占用采集与写入的时间；
+    积压超过 max_pending 时丢弃新数据
+    """
+
+    def __init__(self, detector: GpuFaultDetector, max_pending: int = 64):
+        self.detector = detector
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="fault-detector", daemon=True)
+        self._thread.start()
+
+    def update(self, gpu_df: pd.DataFrame, device: str = "default", user_df: Optional[pd.DataFrame] = None) -> None:
+        try:
+            self.queue.put_nowait(("update", device, (gpu_df, user_df)))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"[{device}] Fault detection is falling behind, dropped {self.dropped} update(s)")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            action, device, args = item
+            try:
+                if action == "remove":
+                    self.detector.remove_device(device)
+                else:
+                    gpu_df, user_df = args
+                    self.detector.update(gpu_df, device, user_df)
+            except Exception as e:
+                logger.error(f"[{device}] Fault detection failed: {e}")
+        self.detector.close()
+
+    def remove_device(self, device: str) -> None:
+        """结束设备的活跃告警并清除其检测状态；与检测在同一线程中按顺序执行，积压时也不会被丢弃"""
+        self.queue.put(("remove", device, None))
+
+    def stop(self, timeout: float = 5.0):
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+
+_workers: Dict[Tuple[Optional[str], str, Optional[str]], FaultDetectionWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_fault_detection_worker(
+    rules_path: Optional[str] = None,
+    config_file: str = "config/email_config.json",
+    password: Optional[str] = None,
+    alert_db_path: Optional[str] = None,
+) -> FaultDetectionWorker:
+    """获取当前进程内共享的故障检测线程，同一进程内的所有设备共用一个检测器"""
+    key = (rules_path, config_file, alert_db_path)
+    with _workers_lock:
+        if key not in _workers:
+            # 异常检测的状态与告警记录保存在同一数据目录
+            data_dir = os.path.dirname(alert_db_path) if alert_db_path else "data"
+            detector = GpuFaultDetector(
+                config_file,
+                password,
+                rules=load_fault_rules(rules_path),
+                anomaly=load_anomaly_config(rules_path, data_dir),
+                alert_db_path=alert_db_path,
+            )
+            _workers[key] = FaultDetectionWorker(detector)
+            logger.info(
+                f"Fault detection started with {len(detector.engine.rules)} rules"
+                + (", anomaly detection enabled" if detector.anomaly is not None else "")
+            )
+        return _workers[key]
@@ -0,0 +1,221 @@
+import json
+import numpy as np
+from loguru import logger
+
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Tuple
+
+
+METRICS = ("util", "mem")
+AGGREGATIONS = ("mean", "max", "min", "last")
+COMPARISONS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+SCOPES = ("gpu", "user")
+
+
+@dataclass(frozen=True)
+class RuleCondition:
+    """
+    单个条件：对最近 window 次更新的 metric 做 agg 聚合后与 threshold 比较
+
+    metric: util 为利用率（%），mem 为显存占用比例（0~1，user 范围下为该用户占该 GPU 显存的比例）
+    window: None 表示使用全部历史（未填满的部分按 0 计）
+    """
+
+    metric: str
+    op: str
+    threshold: float
+    agg: str = "mean"
+    window: Optional[int] = None
+
+    def __post_init__(self):
+        if self.metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {self.metric}")
+        if self.op not in COMPARISONS:
+            raise ValueError(f"Unsupported comparison: {self.op}")
+        if self.agg not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation: {self.agg}")
+        if self.window is not None and self.window <= 0:
+            raise ValueError(f"Invalid window: {self.window}")
+
+    @property
+    def feature(self) -> Tuple[str, str, Optional[int]]:
+        """条件依赖的聚合特征，相同特征在一次评估中只计算一次"""
+        return self.metric, self.agg, self.window
+
+
+@dataclass
+class FaultRule:
+    """
+    故障规则：所有条件同时满足且连续 duration 次更新后触发
+
+    scope 为 gpu 时按 GPU 评估，为 user 时按 (用户, GPU) 评估
+    """
+
+    name: str
+    conditions: List[RuleCondition]
+    scope: str = "gpu"
+    duration: int = 1
+    subject: Optional[str] = None
+    description: str = ""
+
+    def __post_init__(self):
+        if self.scope not in SCOPES:
+            raise ValueError(f"Unsupported scope for rule {self.name}: {self.scope}")
+        if not self.conditions:
+            raise ValueError(f"Rule {self.name} has no conditions")
+
+    @classmethod
+    def from_dict(cls, conf: dict) -> "FaultRule":
+        conf = dict(conf)
+        conf["conditions"] = [RuleCondition(**c) for c in conf.get("conditions", [])]
+        return cls(**conf)
+
+
+# 默认规则，与原有的两类故障检测一致
+DEFAULT_FAULT_RULES: List[dict] = [
+    {
+        "name": "overload",
+        "subject": "GPU Fault Detection: High Utilization and Low Memory Usage",
+        "conditions": [
+            {"metric": "util", "op": ">", "threshold": 90},
+            {"metric": "mem", "op": "<", "threshold": 0.2},
+        ],
+    },
+    {
+        "name": "underutilized",
+        "subject": "GPU Fault Detection: Low Utilization and High Memory Usage",
+        "conditions": [
+            {"metric": "util", "op": "<", "threshold": 10},
+            {"metric": "mem", "op": ">", "threshold": 0.9},
+        ],
+    },
+]
+
+
+def load_fault_rules(path: Optional[str] = None) -> List[FaultRule]:
+    """从 JSON 文件（{"rules": [...]} 或规则列表）读取规则，path 为 None 时返回默认规则"""
+    if path is None:
+        rules = DEFAULT_FAULT_RULES
+    else:
+        with open(path, "r") as f:
+            config = json.load(f)
+        rules = config["rules"] if isinstance(config, dict) else config
+        logger.info(f"Loaded {len(rules)} fault rules from {path}")
+    return [FaultRule.from_dict(rule) for rule in rules]
+
+
+def _window_aggregate(buffer, metric: str, agg: str, window: Optional[int]) -> np.ndarray:
+    """在环形缓冲区的最近 window 行上做聚合，结果去掉时间维"""
+    history = buffer.history(metric)
+    length = buffer.HISTORY_LENGTH
+    if agg == "last":
+        return history[(buffer.pos - 1) % length]
+
+    if window is None or window >= length:
+        if agg == "mean":
+            return buffer.sums(metric) / length  # 维护的累加和，O(1)
+        rows = history
+    else:
+        rows = history[(buffer.pos - 1 - np.arange(window)) % length]
+
+    if agg == "mean":
+        return rows.mean(axis=0)
+    if agg == "max":
+        return rows.max(axis=0)
+    return rows.min(axis=0)
+
+
+class FaultRuleEngine:
+    """
+    将规则编译为对使用历史的 NumPy 掩码运算
+
+    各设备的数据独立到达，因此按设备评估：每次更新时先计算该设备所有规则用到的聚合特征（每个特征只算一次），
+    再对每条规则做逐元素比较与 AND，并以计数器实现 duration
+    """
+
+    def __init__(self, rules: List[FaultRule]):
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicated fault rule names: {names}")
+        self.rules = rules
+        self._features = {
+            scope: sorted({c.feature for rule in rules if rule.scope == scope for c in rule.conditions}, key=str)
+            for scope in SCOPES
+        }
+        # (rule, device) -> 连续满足条件的次数，以及 user 范围的计数每行对应的用户
+        self._streaks: Dict[Tuple[str, str], np.ndarray] = {}
+        self._users: Dict[Tuple[str, str], Optional[List[str]]] = {}
+
+    def _compute_features(self, buffer, scope: str) -> Dict[tuple, np.ndarray]:
+        return {feature: _window_aggregate(buffer, *feature) for feature in self._features[scope]}
+
+    def _streak(self, key: Tuple[str, str], mask: np.ndarray, users: Optional[List[str]]) -> np.ndarray:
+        streak = self._streaks.get(key)
+        old_users = self._users.get(key)
+        if streak is None or streak.shape != mask.shape or old_users != users:
+            resized = np.zeros(mask.shape, dtype=int)
+            if streak is not None and streak.ndim == mask.ndim:
+                if users is None or old_users is None:
+                    overlap = tuple(slice(0, min(a, b)) for a, b in zip(streak.shape, mask.shape))
+                    resized[overlap] = streak[overlap]
+                else:
+                    # 用户增减（移除不活跃的用户）后按用户名保留仍存在的用户的计数
+                    old_rows = {user: i for i, user in enumerate(old_users)}
+                    pairs = [(i, old_rows[user]) for i, user in enumerate(users) if user in old_rows]
+                    if pairs:
+                        new_idx, old_idx = map(list, zip(*pairs))
+                        n_gpu = min(streak.shape[1], mask.shape[1])
+                        resized[new_idx, :n_gpu] = streak[old_idx, :n_gpu]
+            streak = resized
+        streak = (streak + 1) * mask
+        self._streaks[key] = streak
+        self._users[key] = list(users) if users is not None else None
+        return streak
+
+    def evaluate(self, gpu_buffer, user_buffer=None, device: str = "default") -> Dict[str, Optional[np.ndarray]]:
+        """
+        评估一个设备上的所有规则
+
+        Returns:
+            Dict[str, Optional[np.ndarray]]: 规则名 -> 触发掩码（gpu 范围为 [NGPU]，user 范围为 [用户数, NGPU]），
+            缺少数据时为 None
+        """
+        buffers = {"gpu": gpu_buffer, "user": user_buffer}
+        features = {
+            scope: self._compute_features(buffer, scope)
+            for scope, buffer in buffers.items()
+            if buffer is not None and self._features[scope]
+        }
+
+        results: Dict[str, Optional[np.ndarray]] = {}
+        for rule in self.rules:
+            if rule.scope not in features:
+                results[rule.name] = None
+                continue
+            scope_features = features[rule.scope]
+            mask = np.logical_and.reduce(
+                [COMPARISONS[c.op](scope_features[c.feature], c.threshold) for c in rule.conditions]
+            )
+            users = getattr(buffers[rule.scope], "users", None) if rule.scope == "user" else None
+            streak = self._streak((rule.name, device), mask, users)
+            results[rule.name] = streak >= rule.duration
+        return results
+
+    def forget(self, device: str):
+        for key in [k for k in self._streaks if k[1] == device]:
+            self._streaks.pop(key, None)
+            self._users.pop(key, None)
+
+
+__all__ = [
+    "RuleCondition",
+    "FaultRule",
+    "FaultRuleEngine",
+    "DEFAULT_FAULT_RULES",
+    "load_fault_rules",
+]
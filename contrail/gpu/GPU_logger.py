@@ -6,7 +6,7 @@ import pandas as pd
 import datetime as dt
 from loguru import logger
 
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 
 from pynvml import (
     nvmlInit,
@@ -23,7 +23,7 @@ from pynvml import (
 import psutil
 
 from contrail.utils.email_sender import EmailSender, EmailTemplate
-from contrail.gpu.GPU_fault_detector import GpuFaultDetector
+from contrail.gpu.GPU_fault_detector import GpuFaultDetector, FaultDetectionWorker
 
 
 def get_gpu_info() -> List[Dict]:
@@ -190,6 +190,37 @@ def initialize_database(db_path="gpu_history.db", is_history=False) -> None:
             """
         )
 
+        # 最新一次采样的 GPU 状态，每块 GPU 一行，由写入端覆盖
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gpu_latest (
+                gpu_index INTEGER PRIMARY KEY,
+                gpu_utilization INTEGER,
+                memory_utilization INTEGER,
+                total_memory INTEGER,
+                used_memory INTEGER,
+                free_memory INTEGER,
+                timestamp TIMESTAMP
+            )
+            """
+        )
+
+        # 设备状态，仅一行：最近采样时间、GPU 与用户数量，以及按分钟统计的采样速率
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS device_status (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                last_seen TIMESTAMP,
+                n_gpu INTEGER,
+                n_users INTEGER,
+                samples INTEGER,
+                rate_start TIMESTAMP,
+                rate_samples INTEGER,
+                sample_rate REAL
+            )
+            """
+        )
+
     else:
         # 创建 GPU 历史记录 以更长间隔记录历史数据
         cursor.execute(
@@ -226,6 +257,50 @@ def initialize_database(db_path="gpu_history.db", is_history=False) -> None:
             """
         )
 
+        # 按小时与按天预先汇总的使用量，查询任意时间段的总量时只需读取少量汇总行
+        # bucket 为区间起点（UTC），*_sum 为区间内各采样点平均值之和，samples 为采样点数
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gpu_history_rollup (
+                period TEXT,
+                bucket TIMESTAMP,
+                gpu_index INTEGER,
+                samples INTEGER,
+                gpu_utilization_sum REAL,
+                used_memory_sum REAL,
+                PRIMARY KEY (period, bucket, gpu_index)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gpu_user_history_rollup (
+                period TEXT,
+                bucket TIMESTAMP,
+                user TEXT,
+                gpu_index INTEGER,
+                samples INTEGER,
+                gpu_utilization_sum REAL,
+                used_memory_sum REAL,
+                PRIMARY KEY (period, bucket, user, gpu_index)
+            )
+            """
+        )
+
+        # 元数据，仅一行：表结构版本、最早 / 最晚的历史记录时间与记录数，由写入端维护
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                schema_version INTEGER,
+                min_timestamp TIMESTAMP,
+                max_timestamp TIMESTAMP,
+                gpu_rows INTEGER,
+                user_rows INTEGER
+            )
+            """
+        )
+
     # 添加索引
     if not is_history:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_gpu_timestamp ON gpu_info (timestamp)")
@@ -241,11 +316,226 @@ def initialize_database(db_path="gpu_history.db", is_history=False) -> None:
     # 使用 WAL 模式
     cursor.execute("PRAGMA journal_mode=WAL")
 
+    if is_history:
+        # 旧版本创建的数据库没有汇总数据，从已有的历史记录回填
+        rollup_empty = cursor.execute("SELECT 1 FROM gpu_history_rollup LIMIT 1").fetchone() is None
+        if rollup_empty and cursor.execute("SELECT 1 FROM gpu_history LIMIT 1").fetchone() is not None:
+            rebuild_usage_rollup(conn)
+
+        # 元数据缺失或表结构版本变化时重新统计
+        meta = cursor.execute("SELECT schema_version FROM meta WHERE id = 0").fetchone()
+        if meta is None or meta[0] != HISTORY_SCHEMA_VERSION:
+            refresh_history_meta(conn)
+
     conn.commit()
     conn.close()
     logger.trace("Initialize database completed")
 
 
+GPU_INFO_COLUMNS = ("gpu_index", "gpu_utilization", "memory_utilization", "total_memory", "used_memory", "free_memory")
+GPU_USER_INFO_COLUMNS = ("gpu_index", "user", "used_memory", "gpu_utilization")
+
+
+def gpu_dfs_to_records(gpu_dfs: Tuple[pd.DataFrame, pd.DataFrame]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    将 GPU 和进程的 dataframes 转换为可直接插入数据库的记录
+
+    Args:
+        gpu_dfs (Tuple[pd.DataFrame, pd.DataFrame]): GPU 和进程数据
+
+    Returns:
+        Tuple[List[tuple], List[tuple]]: gpu_info 与 gpu_user_info 的记录，列顺序见 GPU_INFO_COLUMNS / GPU_USER_INFO_COLUMNS
+    """
+    gpu_df, proc_df = gpu_dfs
+    # astype(object) 将 numpy 标量转换为 sqlite3 可直接绑定的 Python 类型
+    gpu_df = gpu_df.reset_index()[list(GPU_INFO_COLUMNS)].astype(object)
+    proc_df = proc_df.reset_index()[list(GPU_USER_INFO_COLUMNS)].astype(object)
+    return list(gpu_df.itertuples(index=False, name=None)), list(proc_df.itertuples(index=False, name=None))
+
+
+# 采样速率的统计周期（秒）
+SAMPLE_RATE_PERIOD = 60
+
+
+def insert_records(conn: sqlite3.Connection, gpu_rows: List[tuple], user_rows: List[tuple], timestamp: str) -> None:
+    """
+    在当前事务中插入一次采样的记录（不提交），并更新 gpu_latest 与 device_status
+    """
+    conn.executemany(
+        f"INSERT INTO gpu_info ({', '.join(GPU_INFO_COLUMNS)}, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(*row, timestamp) for row in gpu_rows],
+    )
+    conn.executemany(
+        f"INSERT INTO gpu_user_info ({', '.join(GPU_USER_INFO_COLUMNS)}, timestamp) VALUES (?, ?, ?, ?, ?)",
+        [(*row, timestamp) for row in user_rows],
+    )
+    update_latest(conn, gpu_rows, user_rows, timestamp)
+
+
+def update_latest(conn: sqlite3.Connection, gpu_rows: List[tuple], user_rows: List[tuple], timestamp: str) -> None:
+    """
+    覆盖最新的 GPU 状态并更新设备状态，读取最新状态时只需访问至多 N_GPU 行
+    """
+    if gpu_rows:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO gpu_latest ({', '.join(GPU_INFO_COLUMNS)}, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*row, timestamp) for row in gpu_rows],
+        )
+        # GPU 数量减少时删除不再出现的 GPU
+        conn.execute("DELETE FROM gpu_latest WHERE timestamp <> ?", (timestamp,))
+
+    # UPDATE 中的表达式均使用更新前的值
+    conn.execute(
+        f"""
+        INSERT INTO device_status (id, last_seen, n_gpu, n_users, samples, rate_start, rate_samples, sample_rate)
+        VALUES (0, :ts, :n_gpu, :n_users, 1, :ts, 1, NULL)
+        ON CONFLICT(id) DO UPDATE SET
+            last_seen = :ts,
+            n_gpu = :n_gpu,
+            n_users = :n_users,
+            samples = samples + 1,
+            rate_start = CASE WHEN UNIXEPOCH(:ts) - UNIXEPOCH(rate_start) >= {SAMPLE_RATE_PERIOD}
+                THEN :ts ELSE rate_start END,
+            rate_samples = CASE WHEN UNIXEPOCH(:ts) - UNIXEPOCH(rate_start) >= {SAMPLE_RATE_PERIOD}
+                THEN 1 ELSE rate_samples + 1 END,
+            sample_rate = CASE WHEN UNIXEPOCH(:ts) - UNIXEPOCH(rate_start) >= {SAMPLE_RATE_PERIOD}
+                THEN CAST(rate_samples AS REAL) / (UNIXEPOCH(:ts) - UNIXEPOCH(rate_start)) ELSE sample_rate END
+        """,
+        {"ts": timestamp, "n_gpu": len(gpu_rows), "n_users": len({row[1] for row in user_rows})},
+    )
+
+
+# 汇总区间及其起点的格式（SQLite STRFTIME 与 Python strftime 通用）
+ROLLUP_PERIODS = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+ROLLUP_QUERIES = {
+    "gpu_history_rollup": """
+        INSERT INTO gpu_history_rollup (period, bucket, gpu_index, samples, gpu_utilization_sum, used_memory_sum)
+        SELECT :period, STRFTIME(:format, timestamp) AS bucket, gpu_index,
+            COUNT(*), SUM(gpu_utilization), SUM(used_memory)
+        FROM gpu_history
+        WHERE {where}
+        GROUP BY bucket, gpu_index
+        ON CONFLICT (period, bucket, gpu_index) DO UPDATE SET
+            samples = samples + excluded.samples,
+            gpu_utilization_sum = gpu_utilization_sum + excluded.gpu_utilization_sum,
+            used_memory_sum = used_memory_sum + excluded.used_memory_sum
+    """,
+    "gpu_user_history_rollup": """
+        INSERT INTO gpu_user_history_rollup
+            (period, bucket, user, gpu_index, samples, gpu_utilization_sum, used_memory_sum)
+        SELECT :period, STRFTIME(:format, timestamp) AS bucket, user, gpu_index,
+            COUNT(*), SUM(gpu_utilization), SUM(used_memory)
+        FROM gpu_user_history
+        WHERE {where}
+        GROUP BY bucket, user, gpu_index
+        ON CONFLICT (period, bucket, user, gpu_index) DO UPDATE SET
+            samples = samples + excluded.samples,
+            gpu_utilization_sum = gpu_utilization_sum + excluded.gpu_utilization_sum,
+            used_memory_sum = used_memory_sum + excluded.used_memory_sum
+    """,
+}
+
+
+# 一次聚合写入的每一行即为一个采样，直接累加到汇总
+ROLLUP_UPSERTS = {
+    "gpu_history_rollup": """
+        INSERT INTO gpu_history_rollup (period, bucket, gpu_index, samples, gpu_utilization_sum, used_memory_sum)
+        VALUES (?, ?, ?, 1, ?, ?)
+        ON CONFLICT (period, bucket, gpu_index) DO UPDATE SET
+            samples = samples + 1,
+            gpu_utilization_sum = gpu_utilization_sum + excluded.gpu_utilization_sum,
+            used_memory_sum = used_memory_sum + excluded.used_memory_sum
+    """,
+    "gpu_user_history_rollup": """
+        INSERT INTO gpu_user_history_rollup
+            (period, bucket, user, gpu_index, samples, gpu_utilization_sum, used_memory_sum)
+        VALUES (?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT (period, bucket, user, gpu_index) DO UPDATE SET
+            samples = samples + 1,
+            gpu_utilization_sum = gpu_utilization_sum + excluded.gpu_utilization_sum,
+            used_memory_sum = used_memory_sum + excluded.used_memory_sum
+    """,
+}
+
+
+def update_usage_rollup(
+    conn: sqlite3.Connection, timestamp: str, gpu_rows: pd.DataFrame, user_rows: pd.DataFrame
+) -> None:
+    """
+    将一次聚合写入的历史记录（gpu_rows / user_rows，时间戳均为 timestamp）累加到按小时与按天的汇总中
+
+    只累加本次写入的行而不按时间戳重新读取历史表，同一窗口被重复聚合时汇总与历史表仍保持一致
+    """
+    # SUM 忽略 NULL，与 rebuild_usage_rollup() 的结果相同
+    gpu_values = gpu_rows[["gpu_index", "gpu_utilization", "used_memory"]].fillna(0)
+    user_values = user_rows[["user", "gpu_index", "gpu_utilization", "used_memory"]].fillna(0)
+    aggregated_at = dt.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    for period, fmt in ROLLUP_PERIODS.items():
+        bucket = aggregated_at.strftime(fmt)
+        conn.executemany(
+            ROLLUP_UPSERTS["gpu_history_rollup"],
+            [(period, bucket, int(gpu), float(util), float(mem)) for gpu, util, mem in gpu_values.itertuples(False)],
+        )
+        conn.executemany(
+            ROLLUP_UPSERTS["gpu_user_history_rollup"],
+            [
+                (period, bucket, user, int(gpu), float(util), float(mem))
+                for user, gpu, util, mem in user_values.itertuples(False)
+            ],
+        )
+
+
+def rebuild_usage_rollup(conn: sqlite3.Connection) -> None:
+    """
+    根据全部历史记录重新生成汇总数据，用于回填旧数据库或修复汇总
+    """
+    logger.info("Rebuilding usage rollup from history")
+    for table, query in ROLLUP_QUERIES.items():
+        conn.execute(f"DELETE FROM {table}")
+        for period, fmt in ROLLUP_PERIODS.items():
+            conn.execute(query.format(where="TRUE"), {"period": period, "format": fmt})
+    logger.trace("Rebuild usage rollup completed")
+
+
+# 历史数据库的表结构版本，记录在 meta 表中
+HISTORY_SCHEMA_VERSION = 1
+
+
+def update_history_meta(conn: sqlite3.Connection, timestamp: str, gpu_rows: int, user_rows: int) -> None:
+    """
+    写入一次聚合结果后更新元数据，读取最早 / 最晚时间时只需读取一行
+    """
+    conn.execute(
+        """
+        INSERT INTO meta (id, schema_version, min_timestamp, max_timestamp, gpu_rows, user_rows)
+        VALUES (0, :version, :ts, :ts, :gpu_rows, :user_rows)
+        ON CONFLICT(id) DO UPDATE SET
+            min_timestamp = MIN(COALESCE(min_timestamp, :ts), :ts),
+            max_timestamp = MAX(COALESCE(max_timestamp, :ts), :ts),
+            gpu_rows = gpu_rows + :gpu_rows,
+            user_rows = user_rows + :user_rows
+        """,
+        {"version": HISTORY_SCHEMA_VERSION, "ts": timestamp, "gpu_rows": gpu_rows, "user_rows": user_rows},
+    )
+
+
+def refresh_history_meta(conn: sqlite3.Connection) -> None:
+    """
+    根据全部历史记录重新统计元数据，用于旧数据库或删除历史记录之后
+    """
+    logger.trace("Refreshing history meta")
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO meta (id, schema_version, min_timestamp, max_timestamp, gpu_rows, user_rows)
+        SELECT 0, ?, MIN(timestamp), MAX(timestamp), COUNT(*), (SELECT COUNT(*) FROM gpu_user_history)
+        FROM gpu_history
+        """,
+        (HISTORY_SCHEMA_VERSION,),
+    )
+
+
 def update_database(
     gpu_dfs: Tuple[pd.DataFrame, pd.DataFrame],
     timestamp: str,
@@ -266,19 +556,15 @@ def update_database(
     logger.trace(f"Updating database at {db_path} with timestamp {timestamp}")
     conn = sqlite3.connect(db_path)
 
-    gpu_df, proc_df = gpu_dfs
-
     try:
         # 启动事务
         conn.execute("BEGIN TRANSACTION")
 
-        # 插入 GPU 信息
-        gpu_df["timestamp"] = timestamp
-        gpu_df.to_sql("gpu_info", conn, if_exists="append", index=True)
-
-        # 插入 GPU 用户使用信息
-        proc_df["timestamp"] = timestamp
-        proc_df.to_sql("gpu_user_info", conn, if_exists="append", index=True)
+        # 插入 GPU 信息 与 GPU 用户使用信息
+        gpu_rows, user_rows = gpu_dfs_to_records(gpu_dfs)
+        if isinstance(timestamp, dt.datetime):
+            timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        insert_records(conn, gpu_rows, user_rows, timestamp)
 
         # 提交事务
         conn.commit()
@@ -298,17 +584,21 @@ def aggregate_data(
     period_s: int = 30,
     db_path: str = "gpu_history.db",
     db_realtime_path: str = "gpu_info.db",
-    fault_detector: Optional[GpuFaultDetector] = None,
+    fault_detector: Optional[Union[GpuFaultDetector, FaultDetectionWorker]] = None,
+    device_name: str = "default",
 ) -> None:
     """
-    合并timestamp前period秒内的数据，提取平均值、最大值和最小值，并将其插入到历史记录中
+    合并timestamp前period秒内（左闭右开区间 [timestamp - period, timestamp)）的数据，
+    提取平均值、最大值和最小值，并将其插入到历史记录中；相邻窗口之间不会重复或遗漏采样
 
     Args:
         timestamp (dt.datetime): 时间戳
         period_s (int, optional): 聚合周期. Defaults to 30.
         db_path (str, optional): 数据库路径. Defaults to "gpu_history.db".
         db_realtime_path (str, optional): 实时数据数据库路径. Defaults to "gpu_info.db".
-        fault_detector (Optional[GpuFaultDetector], optional): GPU 事件检测器. Defaults to None.
+        fault_detector (Optional[Union[GpuFaultDetector, FaultDetectionWorker]], optional): GPU 事件检测器，
+            使用 FaultDetectionWorker 时在后台线程中检测. Defaults to None.
+        device_name (str, optional): 设备名称，用于区分检测器中的设备. Defaults to "default".
 
     Returns:
         None
@@ -321,16 +611,16 @@ def aggregate_data(
     end_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
     query = """
-        SELECT gpu_index, gpu_utilization, used_memory
+        SELECT gpu_index, gpu_utilization, used_memory, total_memory
         FROM gpu_info
-        WHERE timestamp BETWEEN ? AND ?
+        WHERE timestamp >= ? AND timestamp < ?
     """
     result = pd.read_sql_query(query, conn, params=(start_time, end_time))
 
     query_user = """
         SELECT gpu_index, user, used_memory, gpu_utilization
         FROM gpu_user_info
-        WHERE timestamp BETWEEN ? AND ?
+        WHERE timestamp >= ? AND timestamp < ?
     """
     result_user = pd.read_sql_query(query_user, conn, params=(start_time, end_time))
 
@@ -346,6 +636,7 @@ def aggregate_data(
             used_memory_avg=("used_memory", "mean"),
             used_memory_min=("used_memory", lambda x: x.quantile(0.25)),
             used_memory_max=("used_memory", lambda x: x.quantile(0.75)),
+            total_memory=("total_memory", "max"),
         )
         .reset_index()
     )
@@ -384,7 +675,9 @@ def aggregate_data(
 
     # 检测 GPU 故障
     if fault_detector:
-        fault_detector.update(result)
+        fault_detector.update(result, device_name, result_user)
+    # 显存总量仅用于故障检测，不写入历史记录
+    result = result.drop(columns=["total_memory"])
 
     conn = sqlite3.connect(db_path)
 
@@ -394,6 +687,13 @@ def aggregate_data(
     # 插入 GPU 用户使用历史记录
     result_user.to_sql("gpu_user_history", conn, if_exists="append", index=False)
 
+    # 累加到按小时与按天的汇总
+    update_usage_rollup(conn, end_time, result, result_user)
+
+    # 更新最早 / 最晚时间与记录数
+    if not result.empty:
+        update_history_meta(conn, end_time, len(result), len(result_user))
+
     conn.commit()
     conn.close()
 
@@ -1,17 +1,41 @@
 from loguru import logger
-import os
-import sqlite3
+import numpy as np
 import pandas as pd
 import datetime as dt
 import streamlit as st
-import json
 
-from typing import Optional, Tuple, Dict
-
-MIN_TIMESTAMP_CACHE = "data/min_timestamp_cache.json"
-
-
-@st.cache_data
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Dict, List
+
+from contrail.utils.sqlite_pool import read_connection
+from contrail.utils.query_cache import CachePolicy, QueryCache
+from contrail.utils.downsample import lttb, envelope
+from contrail.utils.config import webapp_config
+from contrail.gpu.GPU_realtime_feed import RealtimeFeed, RealtimeSnapshot, read_latest_gpu_info, read_device_status
+
+# 各查询函数的缓存策略：实时查询以秒级 token 为键，有效期短；历史查询以分钟级 token 为键
+CACHE_POLICIES = {
+    "query_latest_gpu_info": CachePolicy(ttl=5, max_entries=32),
+    "query_device_status": CachePolicy(ttl=5, max_entries=32),
+    "query_min_max_timestamp": CachePolicy(ttl=300, max_entries=32),
+    "query_gpu_realtime_usage": CachePolicy(ttl=5, max_entries=16),
+    "query_gpu_memory_realtime_usage": CachePolicy(ttl=5, max_entries=16),
+    "query_user_gpu_realtime_usage": CachePolicy(ttl=5, max_entries=16),
+    "query_user_gpu_memory_realtime_usage": CachePolicy(ttl=5, max_entries=16),
+    "query_history_tile": CachePolicy(ttl=6 * 3600, max_entries=2048),
+    "query_gpu_history_usage": CachePolicy(ttl=900, max_entries=64),
+    "query_gpu_history_average_usage": CachePolicy(ttl=900, max_entries=64),
+    "query_gpu_user_history_usage": CachePolicy(ttl=900, max_entries=32),
+    "query_gpu_user_history_total_usage": CachePolicy(ttl=900, max_entries=64),
+}
+
+# 所有查询共享的内存预算（MB），可在 webapp.cache_memory_mb 中修改
+CACHE_MEMORY_MB = webapp_config.get("cache_memory_mb", 256)
+
+query_cache = QueryCache(max_bytes=CACHE_MEMORY_MB * 1024 * 1024, policies=CACHE_POLICIES)
+
+
+@query_cache.cached
 def query_latest_gpu_info(db_path: str, query_tm: Optional[str] = None) -> pd.DataFrame:
     """
     查询最新的 GPU 状态信息（包括 GPU 使用率、内存使用情况等）。
@@ -24,19 +48,9 @@ def query_latest_gpu_info(db_path: str, query_tm: Optional[str] = None) -> pd.Da
         pd.DataFrame: 最新的 GPU 状态信息。
     """
     logger.trace(f"Querying latest GPU info from {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询最新的 GPU 信息
-    query = """
-        SELECT *
-        FROM gpu_info
-        WHERE timestamp = (
-            SELECT MAX(timestamp)
-            FROM gpu_info
-        )
-    """
-    data = pd.read_sql_query(query, conn)
-    conn.close()
+    with read_connection(db_path) as conn:
+        # 查询最新的 GPU 信息（gpu_latest 表由写入端维护）
+        data = read_latest_gpu_info(conn)
     logger.trace("Query latest GPU info completed")
 
     # 将时间戳转换为 datetime 类型
@@ -50,85 +64,72 @@ def query_latest_gpu_info(db_path: str, query_tm: Optional[str] = None) -> pd.Da
     return data
 
 
-def load_min_timestamp(db_path: str) -> Optional[dt.datetime]:
-    if os.path.exists(MIN_TIMESTAMP_CACHE):
-        try:
-            with open(MIN_TIMESTAMP_CACHE, "r") as f:
-                cache = json.load(f)
-            min_ts = cache.get(db_path)
-            if min_ts:
-                return pd.to_datetime(min_ts).tz_localize("UTC").tz_convert("Asia/Shanghai")
-        except Exception as e:
-            logger.warning(f"Failed to read min timestamp cache: {e}")
-    return None
-
-
-def refresh_min_timestamp(db_path: str) -> Optional[dt.datetime]:
-    conn = sqlite3.connect(db_path)
-    query = "SELECT MIN(timestamp) AS min_timestamp FROM gpu_history"
-    data = pd.read_sql_query(query, conn)
-    conn.close()
-    min_timestamp = None
-    if not data.empty and data["min_timestamp"].iloc[0]:
-        min_timestamp = data["min_timestamp"].iloc[0]
-    # 更新缓存文件
-    cache = {}
-    if os.path.exists(MIN_TIMESTAMP_CACHE):
-        try:
-            with open(MIN_TIMESTAMP_CACHE, "r") as f:
-                cache = json.load(f)
-        except Exception as e:
-            logger.warning(f"Failed to read min timestamp cache: {e}")
-    else:
-        logger.info("Min timestamp cache file does not exist, creating a new one.")
-    if min_timestamp:
-        cache[db_path] = min_timestamp
-        with open(MIN_TIMESTAMP_CACHE, "w") as f:
-            json.dump(cache, f, indent=4)
-        return pd.to_datetime(min_timestamp).tz_localize("UTC").tz_convert("Asia/Shanghai")
-    return None
+@query_cache.cached
+def query_device_status(db_path: str, query_tm: Optional[str] = None) -> Optional[dict]:
+    """
+    查询设备状态（最近采样时间、GPU 与用户数量、采样速率）。
+
+    Args:
+        db_path (str): SQLite 数据库路径。
+        query_tm (Optional[str]): 查询时间 token
+
+    Returns:
+        Optional[dict]: 设备状态，last_seen 为本地时间；没有记录时返回 None。
+    """
+    with read_connection(db_path) as conn:
+        status = read_device_status(conn)
+    if status is not None and status["last_seen"]:
+        status["last_seen"] = pd.to_datetime(status["last_seen"]).tz_localize("UTC").tz_convert("Asia/Shanghai")
+    return status
+
+
+def read_history_meta(conn) -> Optional[dict]:
+    """
+    读取历史数据库的元数据（表结构版本、最早 / 最晚时间、记录数），旧版本创建的数据库中没有该表时返回 None
+    """
+    try:
+        data = pd.read_sql_query("SELECT * FROM meta WHERE id = 0", conn)
+    except pd.errors.DatabaseError as e:
+        if "no such table" not in str(e):
+            raise
+        return None
+    if data.empty:
+        return None
+    return data.iloc[0].drop("id").to_dict()
 
 
-@st.cache_data
+@query_cache.cached
 def query_min_max_timestamp(
-    db_path: str, query_tm: Optional[str] = None, refresh_cache: bool = False
+    db_path: str, query_tm: Optional[str] = None
 ) -> Tuple[Optional[dt.datetime], Optional[dt.datetime]]:
     """
-    查询最早和最晚的 GPU 数据记录时间（最早时间缓存，最新时间实时查询）。
+    查询最早和最晚的 GPU 数据记录时间（读取写入端维护的 meta 表）。
 
     Args:
         db_path (str): SQLite 数据库路径。
         query_tm (Optional[str]): 查询时间 token
-        refresh_cache (bool): 是否强制刷新最早时间缓存
 
     Returns:
         min_timestamp (Optional[datetime]): 最早的 GPU 数据记录时间。
         max_timestamp (Optional[datetime]): 最晚的 GPU 数据记录时间。
     """
     logger.trace(f"Querying min and max timestamp from {db_path}")
-
-    # 读取或刷新最早时间缓存
-    min_timestamp = None
-    if refresh_cache:
-        min_timestamp = refresh_min_timestamp(db_path)
-    else:
-        min_timestamp = load_min_timestamp(db_path)
-        if min_timestamp is None:
-            min_timestamp = refresh_min_timestamp(db_path)
-
-    # 查询最新时间
-    conn = sqlite3.connect(db_path)
-    query = "SELECT MAX(timestamp) AS max_timestamp FROM gpu_history"
-    data = pd.read_sql_query(query, conn)
-    conn.close()
-    if data.empty or not data["max_timestamp"].iloc[0]:
+    with read_connection(db_path) as conn:
+        meta = read_history_meta(conn)
+        if meta is None:
+            # 写入端尚未创建 meta 表时直接查询
+            query = "SELECT MIN(timestamp) AS min_timestamp, MAX(timestamp) AS max_timestamp FROM gpu_history"
+            meta = pd.read_sql_query(query, conn).iloc[0].to_dict()
+
+    if not meta["min_timestamp"] or not meta["max_timestamp"]:
         return None, None
 
-    max_timestamp = pd.to_datetime(data["max_timestamp"].iloc[0]).tz_localize("UTC").tz_convert("Asia/Shanghai")
+    min_timestamp = pd.to_datetime(meta["min_timestamp"]).tz_localize("UTC").tz_convert("Asia/Shanghai")
+    max_timestamp = pd.to_datetime(meta["max_timestamp"]).tz_localize("UTC").tz_convert("Asia/Shanghai")
     return min_timestamp, max_timestamp
 
 
-@st.cache_data
+@query_cache.cached
 def query_gpu_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd.DataFrame:
     """
     查询指定时间范围内的 GPU 使用情况。
@@ -142,17 +143,15 @@ def query_gpu_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd
         gpu_utilization_df: 每台 GPU 在每个时刻的使用率变化。
     """
     logger.trace(f"Querying GPU realtime usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询 GPU 信息
-    query = """
-        SELECT gpu_index, gpu_utilization, timestamp
-        FROM gpu_info
-        WHERE timestamp BETWEEN ? AND ?
-        ORDER BY timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        # 查询 GPU 信息
+        query = """
+            SELECT gpu_index, gpu_utilization, timestamp
+            FROM gpu_info
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp
+        """
+        data = pd.read_sql_query(query, conn, params=(start_time, end_time))
     logger.trace("Query GPU realtime usage completed")
 
     # 将时间戳转换为 datetime 类型
@@ -161,7 +160,7 @@ def query_gpu_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd
     return data
 
 
-@st.cache_data
+@query_cache.cached
 def query_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd.DataFrame:
     """
     查询指定时间范围内的 GPU 内存使用情况。
@@ -175,17 +174,15 @@ def query_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path: str
         pd.DataFrame: GPU 内存使用情况。
     """
     logger.trace(f"Querying GPU memory realtime usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询 GPU 信息
-    query = """
-        SELECT gpu_index, used_memory, timestamp
-        FROM gpu_info
-        WHERE timestamp BETWEEN ? AND ?
-        ORDER BY timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        # 查询 GPU 信息
+        query = """
+            SELECT gpu_index, used_memory, timestamp
+            FROM gpu_info
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp
+        """
+        data = pd.read_sql_query(query, conn, params=(start_time, end_time))
     logger.trace("Query GPU memory realtime usage completed")
 
     # 将时间戳转换为 datetime 类型
@@ -194,7 +191,7 @@ def query_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path: str
     return data
 
 
-@st.cache_data
+@query_cache.cached
 def query_user_gpu_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd.DataFrame:
     """
     查询指定时间范围内的用户 GPU 使用情况。
@@ -208,17 +205,15 @@ def query_user_gpu_realtime_usage(start_time: str, end_time: str, db_path: str)
         pd.DataFrame: 用户 GPU 使用情况。
     """
     logger.trace(f"Querying user GPU realtime usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询用户 GPU 使用情况
-    query = """
-        SELECT gpu_index, user, gpu_utilization, timestamp
-        FROM gpu_user_info
-        WHERE timestamp BETWEEN ? AND ?
-        ORDER BY timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        # 查询用户 GPU 使用情况
+        query = """
+            SELECT gpu_index, user, gpu_utilization, timestamp
+            FROM gpu_user_info
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp
+        """
+        data = pd.read_sql_query(query, conn, params=(start_time, end_time))
     logger.trace("Query user GPU realtime usage completed")
 
     # 将时间戳转换为 datetime 类型
@@ -227,7 +222,7 @@ def query_user_gpu_realtime_usage(start_time: str, end_time: str, db_path: str)
     return data
 
 
-@st.cache_data
+@query_cache.cached
 def query_user_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path: str) -> pd.DataFrame:
     """
     查询指定时间范围内的用户 GPU 内存使用情况。
@@ -241,17 +236,15 @@ def query_user_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path
         pd.DataFrame: 用户 GPU 内存使用情况。
     """
     logger.trace(f"Querying user GPU memory realtime usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询用户 GPU 使用情况
-    query = """
-        SELECT gpu_index, user, used_memory, timestamp
-        FROM gpu_user_info
-        WHERE timestamp BETWEEN ? AND ?
-        ORDER BY timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        # 查询用户 GPU 使用情况
+        query = """
+            SELECT gpu_index, user, used_memory, timestamp
+            FROM gpu_user_info
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp
+        """
+        data = pd.read_sql_query(query, conn, params=(start_time, end_time))
     logger.trace("Query user GPU memory realtime usage completed")
 
     # 将时间戳转换为 datetime 类型
@@ -260,81 +253,227 @@ def query_user_gpu_memory_realtime_usage(start_time: str, end_time: str, db_path
     return data
 
 
-def get_period_sample_interval(start_time: dt.datetime, end_time: dt.datetime) -> int:
+@st.cache_resource
+def get_realtime_feed(db_path: str, window: float = 60.0) -> RealtimeFeed:
+    """
+    获取进程内共享的实时数据源，同一设备的所有会话读取同一个后台线程维护的快照。
+
+    Args:
+        db_path (str): SQLite 数据库路径。
+        window (float): 保留的时间窗口长度（秒）。
+
+    Returns:
+        RealtimeFeed: 实时数据源。
+    """
+    logger.info(f"Creating realtime feed for {db_path} (window {window}s)")
+    return RealtimeFeed(db_path, window=window)
+
+
+# 历史数据的最小聚合周期（秒）
+MIN_SAMPLE_INTERVAL = 30
+# 图表的默认目标点数（约为图表宽度的像素数）
+DEFAULT_MAX_POINTS = 1000
+# LTTB 降采样前 SQL 聚合保留的点数倍数
+LTTB_OVERSAMPLE = 4
+
+# 86400 的约数，采样间隔取其中不小于目标值的最小者，使采样点与日界对齐
+_DAY_DIVISORS = [d for d in range(MIN_SAMPLE_INTERVAL, 86401) if 86400 % d == 0]
+
+
+def snap_interval(seconds: float) -> int:
+    """将采样间隔向上取整到 86400 的约数（超过一天时取整天）"""
+    if seconds > 86400:
+        return int(np.ceil(seconds / 86400)) * 86400
+    for d in _DAY_DIVISORS:
+        if d >= seconds:
+            return d
+    return 86400
+
+
+def get_period_sample_interval(
+    start_time: dt.datetime, end_time: dt.datetime, max_points: int = DEFAULT_MAX_POINTS
+) -> int:
     """
-    获取指定时间段的采样间隔。
+    获取指定时间段的采样间隔，使每条序列至多约 max_points 个点。
 
     Args:
         start_time (dt.datetime): 起始时间。
         end_time (dt.datetime): 终止时间。
+        max_points (int): 目标点数。
 
     Returns:
-        int: 采样间隔。
+        int: 采样间隔（秒），为 86400 的约数。
     """
-    # 根据时间段计算采样间隔
     period_seconds = (end_time - start_time).total_seconds()
+    return snap_interval(period_seconds / max(max_points, 1))
+
+
+# 瓦片长度（秒），瓦片边界与 UTC 日界对齐；采样间隔超过一天时瓦片为一个采样间隔
+TILE_SECONDS = 86400
+# 结束时间距今不足该时长（秒）的瓦片可能仍有新数据写入，这样的瓦片截止到查询终点，
+# 以截止时间与最新数据时间 token 区分缓存
+TILE_SETTLE_SECONDS = 3600
+
+# 各表的聚合方式，n 为每个采样点包含的原始记录数，用于计算任意范围的平均值
+HISTORY_TILE_QUERIES = {
+    "gpu_history": """
+        SELECT
+            gpu_index,
+            -- 将时间戳对齐到采样间隔
+            DATETIME(FLOOR(UNIXEPOCH(timestamp) / {interval}) * {interval}, 'unixepoch') AS aligned_timestamp,
+            AVG(gpu_utilization) AS gpu_utilization,
+            MIN(gpu_utilization_min) AS gpu_utilization_min,
+            MAX(gpu_utilization_max) AS gpu_utilization_max,
+            AVG(used_memory) AS used_memory,
+            MIN(used_memory_min) AS used_memory_min,
+            MAX(used_memory_max) AS used_memory_max,
+            COUNT(*) AS n
+        FROM gpu_history
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY gpu_index, aligned_timestamp
+        ORDER BY aligned_timestamp
+    """,
+    "gpu_user_history": """
+        SELECT
+            user,
+            gpu_index,
+            -- 将时间戳对齐到采样间隔
+            DATETIME(FLOOR(UNIXEPOCH(timestamp) / {interval}) * {interval}, 'unixepoch') AS aligned_timestamp,
+            AVG(gpu_utilization) AS gpu_utilization,
+            AVG(used_memory) AS used_memory,
+            COUNT(*) AS n
+        FROM gpu_user_history
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY user, gpu_index, aligned_timestamp
+        ORDER BY aligned_timestamp
+    """,
+}
+
+
+def _utc_str(epoch: int) -> str:
+    return dt.datetime.fromtimestamp(epoch, tz=dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
-    if period_seconds <= 3600:  # 小于 1 小时，采样间隔为 10 秒
-        interval = 30
-    elif period_seconds <= 86400:  # 1 小时到 1 天，采样间隔为 1 * (小时数//8 + 1) 分钟
-        interval = 60 * (period_seconds // 28800 + 1)
-    elif period_seconds <= 7 * 86400:  # 1 天到 7 天，采样间隔为 5 * 天数 分钟
-        interval = 300 * (period_seconds // 86400)
-    else:  # 超过 7 天，采样间隔为 1 小时
-        interval = 3600
 
-    return int(interval)
+@query_cache.cached
+def query_history_tile(
+    db_path: str, table: str, tile_start: int, tile_end: int, interval: int, tail_tm: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    查询一个瓦片 [tile_start, tile_end) 内按 interval 聚合的历史数据。
+
+    Args:
+        db_path (str): SQLite 数据库路径。
+        table (str): gpu_history 或 gpu_user_history。
+        tile_start (int): 瓦片起点（UTC 秒）。
+        tile_end (int): 瓦片终点（UTC 秒），仍在写入的瓦片截止到查询终点。
+        interval (int): 采样间隔（秒）。
+        tail_tm (Optional[str]): 仍在写入的瓦片使用最新数据时间 token，已完成的瓦片为 None。
+
+    Returns:
+        pd.DataFrame: 聚合数据，aligned_timestamp 为 UTC 字符串。
+    """
+    logger.trace(f"Querying {table} tile {_utc_str(tile_start)} (interval {interval}s) in {db_path}")
+    with read_connection(db_path) as conn:
+        query = HISTORY_TILE_QUERIES[table].format(interval=interval)
+        data = pd.read_sql_query(query, conn, params=(_utc_str(tile_start), _utc_str(tile_end)))
+    return data
 
 
-@st.cache_data
+def query_history_tiles(
+    db_path: str,
+    table: str,
+    start_time: dt.datetime,
+    end_time: dt.datetime,
+    interval: int,
+    latest_tm: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    将查询范围拆分为与 interval 对齐的瓦片，逐个读取（缓存）后拼接并裁剪到查询范围（精确到采样间隔）。
+
+    平移或扩展查询范围时已有的瓦片可以直接复用，随着数据写入只有最后的瓦片需要重新查询。
+    仍在写入的瓦片截止到 end_time（不含之后的数据），缓存键包含截止时间，
+    因此即使 latest_tm 为 None（终点早于最新数据），之后以更晚的终点查询时也不会复用缺少新数据的瓦片。
+    """
+    size = max(TILE_SECONDS, interval)
+    start_s, end_s = int(start_time.timestamp()), int(end_time.timestamp())
+    settle = dt.datetime.now(tz=dt.timezone.utc).timestamp() - TILE_SETTLE_SECONDS
+
+    tiles = []
+    for tile_start in range(start_s // size * size, end_s + 1, size):
+        tile_end = tile_start + size
+        tail_tm = None
+        if tile_end > settle:
+            tile_end = min(tile_end, end_s + 1)
+            tail_tm = latest_tm
+        tiles.append(query_history_tile(db_path, table, tile_start, tile_end, interval, tail_tm))
+    data = pd.concat(tiles, ignore_index=True)
+
+    lower = _utc_str(start_s // interval * interval)
+    upper = _utc_str(end_s)
+    return data[(data["aligned_timestamp"] >= lower) & (data["aligned_timestamp"] <= upper)].reset_index(drop=True)
+
+
+def downsample_gpu_history(data: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """
+    对每块 GPU 的使用率与显存分别做 LTTB 降采样，保留两者选中点的并集；
+    每个保留点的 *_min / *_max 为其覆盖范围内的包络，因此降采样不会丢失尖峰。
+
+    Args:
+        data (pd.DataFrame): 按时间排序的聚合数据。
+        max_points (int): 每块 GPU 每个指标的目标点数。
+
+    Returns:
+        pd.DataFrame: 降采样后的数据，列与输入相同。
+    """
+    parts = []
+    for _, group in data.groupby("gpu_index", sort=True):
+        x = group["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        index = np.union1d(
+            lttb(x, group["gpu_utilization"].to_numpy(), max_points),
+            lttb(x, group["used_memory"].to_numpy(), max_points),
+        )
+        sampled = group.iloc[index].copy()
+        for column in ("gpu_utilization", "used_memory"):
+            lo, hi = envelope(group[f"{column}_min"].to_numpy(), group[f"{column}_max"].to_numpy(), index)
+            sampled[f"{column}_min"] = lo
+            sampled[f"{column}_max"] = hi
+        parts.append(sampled)
+    if not parts:
+        return data
+    return pd.concat(parts).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+@query_cache.cached
 def query_gpu_history_usage(
     start_time: dt.datetime,
     end_time: dt.datetime,
     db_path: str,
     latest_tm: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+    method: str = "lttb",
 ) -> pd.DataFrame:
     """
-    查询指定时间范围内的 GPU 使用情况，并进行间隔采样以减小数据量。
+    查询指定时间范围内的 GPU 使用情况，并降采样到约 max_points 个点以减小数据量。
 
     Args:
         start_time (dt.datetime): 起始时间。
         end_time (dt.datetime): 终止时间。
         db_path (str): SQLite 数据库路径。
         latest_tm (Optional[str]): 查询时间 token
+        max_points (int): 每块 GPU 的目标点数，通常为图表宽度。
+        method (str): "lttb" 以 LTTB 保留曲线形状（各 GPU 的时间点不同）；
+            "mean" 按等间隔取均值（各 GPU 的时间点对齐，用于堆叠图）。
 
     Returns:
         pd.DataFrame: GPU 使用情况。
     """
     logger.trace(f"Querying GPU history usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 根据时间段计算采样间隔
-    interval = get_period_sample_interval(start_time, end_time)
-
-    # SQL 查询
-    query = f"""
-        WITH AlignedData AS (
-            SELECT
-                gpu_index,
-                -- 将时间戳对齐到采样间隔
-                DATETIME(FLOOR(UNIXEPOCH(timestamp) / {interval}) * {interval}, 'unixepoch') AS aligned_timestamp,
-                AVG(gpu_utilization) AS gpu_utilization,
-                MIN(gpu_utilization_min) AS gpu_utilization_min,
-                MAX(gpu_utilization_max) AS gpu_utilization_max,
-                AVG(used_memory) AS used_memory,
-                MIN(used_memory_min) AS used_memory_min,
-                MAX(used_memory_max) AS used_memory_max
-            FROM gpu_history
-            WHERE timestamp BETWEEN ? AND ?
-            GROUP BY gpu_index, aligned_timestamp
-        )
-        SELECT *
-        FROM AlignedData
-        ORDER BY aligned_timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
+    # 根据时间段计算采样间隔，LTTB 需要更密的数据作为输入
+    oversample = LTTB_OVERSAMPLE if method == "lttb" else 1
+    interval = get_period_sample_interval(start_time, end_time, max_points * oversample)
 
-    conn.close()
+    data = query_history_tiles(db_path, "gpu_history", start_time, end_time, interval, latest_tm)
+    data = data.drop(columns="n")
     logger.trace("Query GPU history usage completed")
 
     # 将时间戳转换为 datetime 类型
@@ -345,10 +484,13 @@ def query_gpu_history_usage(
     data["used_memory_max"] = data["used_memory_max"] / 0x40000000
     data["used_memory_min"] = data["used_memory_min"] / 0x40000000
 
+    if method == "lttb":
+        data = downsample_gpu_history(data, max_points)
+
     return data
 
 
-@st.cache_data
+@query_cache.cached
 def query_gpu_history_average_usage(
     start_time: dt.datetime,
     end_time: dt.datetime,
@@ -368,35 +510,57 @@ def query_gpu_history_average_usage(
         pd.DataFrame: GPU 平均使用情况。
     """
     logger.trace(f"Querying GPU history average usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 查询 GPU 信息
-    query = """
-        SELECT 
-            gpu_index,
-            AVG(gpu_utilization) AS avg_gpu_utilization,
-            AVG(used_memory) AS avg_used_memory
-        FROM gpu_history
-        WHERE timestamp BETWEEN ? AND ?
-        GROUP BY gpu_index
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        try:
+            sums = read_gpu_usage_sums(conn, start_time, end_time)
+        except pd.errors.DatabaseError as e:
+            if "no such table" not in str(e):
+                raise
+            # 旧版本创建的数据库尚未回填汇总表，直接扫描历史记录
+            sums = read_gpu_usage_sums(conn, start_time, end_time, use_rollup=False)
     logger.trace("Query GPU history average usage completed")
 
     # 将显存相关字段转换为 GB
-    data["avg_used_memory"] = data["avg_used_memory"] / 0x40000000
+    return pd.DataFrame(
+        {
+            "gpu_index": sums["gpu_index"],
+            "avg_gpu_utilization": sums["gpu_utilization"] / sums["n"],
+            "avg_used_memory": sums["used_memory"] / sums["n"] / 0x40000000,
+        }
+    )
 
-    return data
+
+@dataclass
+class UserHistory:
+    """
+    用户在各 GPU 上的历史使用情况，共用同一条时间轴
+
+    timestamps: 时间轴（本地时区），长度 T
+    users: 用户名，长度 U
+    gpus: GPU 编号，长度 G
+    values: 指标名（gpu_utilization / used_memory）到 [T × U × G] 数组的映射，没有记录的位置为 0
+    present: [U × G] 布尔数组，表示该用户在该 GPU 上是否有记录
+    """
+
+    timestamps: pd.DatetimeIndex = field(default_factory=lambda: pd.DatetimeIndex([]))
+    users: List[str] = field(default_factory=list)
+    gpus: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=int))
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+    present: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=bool))
+
+    @property
+    def empty(self) -> bool:
+        return len(self.users) == 0
 
 
-@st.cache_data
+@query_cache.cached
 def query_gpu_user_history_usage(
     start_time: dt.datetime,
     end_time: dt.datetime,
     db_path: str,
     latest_tm: Optional[str] = None,
-) -> Tuple[Dict[str, Dict[int, pd.DataFrame]], pd.DatetimeIndex]:
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> UserHistory:
     """
     查询指定时间范围内的用户 GPU 使用情况，并进行间隔采样以减小数据量。
 
@@ -405,72 +569,152 @@ def query_gpu_user_history_usage(
         end_time (dt.datetime): 终止时间。
         db_path (str): SQLite 数据库路径。
         latest_tm (Optional[str]): 查询时间 token
+        max_points (int): 时间轴的目标点数（堆叠图需要对齐的时间点，按等间隔取均值）。
 
     Returns:
-        Tuple[dict, pd.DatetimeIndex]: 用户 GPU 使用情况。
+        UserHistory: 用户 GPU 使用情况，[时间 × 用户 × GPU] 的稠密数组。
     """
     logger.trace(f"Querying GPU user history usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
     # 根据时间段计算采样间隔
-    interval = get_period_sample_interval(start_time, end_time)
+    interval = get_period_sample_interval(start_time, end_time, max_points)
 
-    # SQL 查询
-    query = f"""
-        WITH AlignedData AS (
-            SELECT
-                user,
-                gpu_index,
-                -- 将时间戳对齐到采样间隔
-                DATETIME(FLOOR(UNIXEPOCH(timestamp) / {interval}) * {interval}, 'unixepoch') AS aligned_timestamp,
-                AVG(gpu_utilization) AS gpu_utilization,
-                AVG(used_memory) AS used_memory
-            FROM gpu_user_history
-            WHERE timestamp BETWEEN ? AND ?
-            GROUP BY user, gpu_index, aligned_timestamp
-        )
-        SELECT *
-        FROM AlignedData
-        ORDER BY aligned_timestamp
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    data = query_history_tiles(db_path, "gpu_user_history", start_time, end_time, interval, latest_tm)
     logger.trace("Query GPU user history usage completed")
 
     if data.empty:
-        return {}, pd.DatetimeIndex([])
+        return UserHistory()
 
     # 将时间戳转换为 datetime 类型
-    data["timestamp"] = pd.to_datetime(data["aligned_timestamp"]).dt.tz_localize("UTC").dt.tz_convert("Asia/Shanghai")
-    max_time = data["timestamp"].max()
-    min_time = data["timestamp"].min()
+    timestamps = pd.to_datetime(data["aligned_timestamp"]).dt.tz_localize("UTC").dt.tz_convert("Asia/Shanghai")
+    min_time = timestamps.min()
+    max_time = timestamps.max()
+
+    # 共用的时间轴，数据晚于查询起点时在前面补一个 0 点，使面积图从 0 开始
+    axis_start = min_time - pd.Timedelta(seconds=interval) if min_time > start_time else min_time
+    axis = pd.date_range(start=axis_start, end=max_time, freq=f"{interval}s")
+
+    t_idx = axis.get_indexer(timestamps)
+    u_idx, users = pd.factorize(data["user"], sort=True)
+    g_idx, gpus = pd.factorize(data["gpu_index"], sort=True)
+
+    shape = (len(axis), len(users), len(gpus))
+    values = {}
+    for column, scale in (("gpu_utilization", 1), ("used_memory", 0x40000000)):
+        array = np.zeros(shape)
+        array[t_idx, u_idx, g_idx] = data[column].to_numpy() / scale
+        values[column] = array
+
+    present = np.zeros(shape[1:], dtype=bool)
+    present[u_idx, g_idx] = True
+
+    return UserHistory(
+        timestamps=axis, users=list(users), gpus=np.asarray(gpus, dtype=int), values=values, present=present
+    )
 
-    # 将显存相关字段转换为 GB
-    data["used_memory"] = data["used_memory"] / 0x40000000
 
-    # 按照'user'和'gpu_index'进行分组
-    grouped = data.groupby(["user", "gpu_index"])
+def usage_rollup_segments(start_time: dt.datetime, end_time: dt.datetime) -> List[Tuple[str, int, int]]:
+    """
+    将闭区间 [start_time, end_time] 拆分为左闭右开的 (period, start, end) 段（UTC 秒）：
+    中间的整天与整小时读取汇总表，首尾不足一小时的部分（period 为 "raw"）读取原始历史记录
+    """
+    start, end = int(start_time.timestamp()), int(end_time.timestamp()) + 1
+    hour_start, hour_end = -(-start // 3600) * 3600, end // 3600 * 3600
+    if hour_start >= hour_end:
+        return [("raw", start, end)]
 
-    user_gpu_history = {}
-    for (user, gpu_index), group in grouped:
-        end_time = group["timestamp"].max()
+    day_start, day_end = -(-hour_start // 86400) * 86400, hour_end // 86400 * 86400
+    if day_start < day_end:
+        middle = [("hour", hour_start, day_start), ("day", day_start, day_end), ("hour", day_end, hour_end)]
+    else:
+        middle = [("hour", hour_start, hour_end)]
+    segments = [("raw", start, hour_start), *middle, ("raw", hour_end, end)]
+    return [segment for segment in segments if segment[1] < segment[2]]
 
-        full_time_range = pd.date_range(
-            start=min_time - pd.Timedelta(seconds=interval) if min_time > start_time else min_time,
-            end=end_time + pd.Timedelta(seconds=interval) if end_time < max_time else end_time,
-            freq=f"{interval}s",
-        )
-        group = group.set_index("timestamp").reindex(full_time_range, fill_value=0).reset_index()
-        group.rename(columns={"index": "timestamp"}, inplace=True)
 
-        if user not in user_gpu_history:
-            user_gpu_history[user] = {}
-        user_gpu_history[user][gpu_index] = group
+def read_usage_totals(
+    conn, start_time: dt.datetime, end_time: dt.datetime, use_rollup: bool = True
+) -> Tuple[int, pd.DataFrame]:
+    """
+    读取时间段内的历史记录总数与各用户的 GPU 利用率、显存之和，由按小时 / 按天的汇总与首尾的原始记录拼接而成
+
+    Returns:
+        Tuple[int, pd.DataFrame]: gpu_history 的记录数；user, gpu_utilization, used_memory
+    """
+    if use_rollup:
+        segments = usage_rollup_segments(start_time, end_time)
+    else:
+        segments = [("raw", int(start_time.timestamp()), int(end_time.timestamp()) + 1)]
+
+    count_parts, user_parts, params = [], [], []
+    for period, start, end in segments:
+        if period == "raw":
+            count_parts.append("SELECT COUNT(*) AS n FROM gpu_history WHERE timestamp >= ? AND timestamp < ?")
+            user_parts.append(
+                "SELECT user, gpu_utilization, used_memory FROM gpu_user_history WHERE timestamp >= ? AND timestamp < ?"
+            )
+        else:
+            count_parts.append(
+                f"SELECT SUM(samples) AS n FROM gpu_history_rollup "
+                f"WHERE period = '{period}' AND bucket >= ? AND bucket < ?"
+            )
+            user_parts.append(
+                f"SELECT user, gpu_utilization_sum AS gpu_utilization, used_memory_sum AS used_memory "
+                f"FROM gpu_user_history_rollup "
+                f"WHERE period = '{period}' AND bucket >= ? AND bucket < ?"
+            )
+        params.append((_utc_str(start), _utc_str(end)))
+
+    flat_params = [value for pair in params for value in pair]
+    count = pd.read_sql_query(f"SELECT SUM(n) AS n FROM ({' UNION ALL '.join(count_parts)})", conn, params=flat_params)
+    total_count = int(count["n"].fillna(0).iloc[0])
+
+    query = f"""
+        SELECT user, SUM(gpu_utilization) AS gpu_utilization, SUM(used_memory) AS used_memory
+        FROM ({' UNION ALL '.join(user_parts)})
+        GROUP BY user
+    """
+    return total_count, pd.read_sql_query(query, conn, params=flat_params)
 
-    return user_gpu_history, pd.date_range(start=min_time, end=max_time, freq=f"{interval}s")
 
+def read_gpu_usage_sums(conn, start_time: dt.datetime, end_time: dt.datetime, use_rollup: bool = True) -> pd.DataFrame:
+    """
+    读取时间段内各 GPU 的记录数与利用率、显存之和，与 read_usage_totals() 相同地由汇总与首尾的原始记录拼接而成，
+    因此边界与查询范围完全一致
 
-@st.cache_data
+    Returns:
+        pd.DataFrame: gpu_index, n, gpu_utilization, used_memory
+    """
+    if use_rollup:
+        segments = usage_rollup_segments(start_time, end_time)
+    else:
+        segments = [("raw", int(start_time.timestamp()), int(end_time.timestamp()) + 1)]
+
+    parts, params = [], []
+    for period, start, end in segments:
+        if period == "raw":
+            parts.append(
+                "SELECT gpu_index, COUNT(*) AS n, SUM(gpu_utilization) AS gpu_utilization, "
+                "SUM(used_memory) AS used_memory FROM gpu_history "
+                "WHERE timestamp >= ? AND timestamp < ? GROUP BY gpu_index"
+            )
+        else:
+            parts.append(
+                f"SELECT gpu_index, samples AS n, gpu_utilization_sum AS gpu_utilization, "
+                f"used_memory_sum AS used_memory FROM gpu_history_rollup "
+                f"WHERE period = '{period}' AND bucket >= ? AND bucket < ?"
+            )
+        params.extend((_utc_str(start), _utc_str(end)))
+
+    query = f"""
+        SELECT gpu_index, SUM(n) AS n, SUM(gpu_utilization) AS gpu_utilization, SUM(used_memory) AS used_memory
+        FROM ({' UNION ALL '.join(parts)})
+        GROUP BY gpu_index
+        ORDER BY gpu_index
+    """
+    return pd.read_sql_query(query, conn, params=params)
+
+
+@query_cache.cached
 def query_gpu_user_history_total_usage(
     start_time: dt.datetime,
     end_time: dt.datetime,
@@ -490,34 +734,18 @@ def query_gpu_user_history_total_usage(
         pd.DataFrame: 用户 GPU 总用量。
     """
     logger.trace(f"Querying GPU user history total usage from {start_time} to {end_time} in {db_path}")
-    conn = sqlite3.connect(db_path)
-
-    # 先查询总的历史记录数量作为总时间
-    query = """
-        SELECT COUNT(*) AS total_count
-        FROM gpu_history
-        WHERE timestamp BETWEEN ? AND ?
-    """
-
-    total_count = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    total_count = total_count["total_count"].iloc[0]
-
-    # 查询用户 GPU 总用量
-    query = """
-        SELECT 
-            user,
-            SUM(gpu_utilization) AS 平均GPU用量,
-            SUM(used_memory) AS 平均显存用量
-        FROM gpu_user_history
-        WHERE timestamp BETWEEN ? AND ?
-        GROUP BY user
-    """
-    data = pd.read_sql_query(query, conn, params=(start_time, end_time))
-    conn.close()
+    with read_connection(db_path) as conn:
+        try:
+            total_count, data = read_usage_totals(conn, start_time, end_time)
+        except pd.errors.DatabaseError as e:
+            if "no such table" not in str(e):
+                raise
+            # 旧版本创建的数据库尚未回填汇总表，直接扫描历史记录
+            total_count, data = read_usage_totals(conn, start_time, end_time, use_rollup=False)
     logger.trace("Query GPU user history total usage completed")
 
-    # 计算总用量
-    data["平均GPU用量"] = (data["平均GPU用量"] / total_count).round(1)
-    data["平均显存用量"] = (data["平均显存用量"] / 0x40000000 / total_count).round(1)
+    # 总的历史记录数量作为总时间，计算平均用量
+    data["平均GPU用量"] = (data["gpu_utilization"] / total_count).round(1)
+    data["平均显存用量"] = (data["used_memory"] / 0x40000000 / total_count).round(1)
 
-    return data
+    return data[["user", "平均GPU用量", "平均显存用量"]]
@@ -0,0 +1,240 @@
+import os
+import time
+import sqlite3
+import threading
+import datetime as dt
+import pandas as pd
+from loguru import logger
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+from contrail.utils.scheduler import Ticker
+from contrail.utils.sqlite_pool import read_connection
+
+GPU_COLUMNS = [
+    "gpu_index",
+    "name",
+    "gpu_utilization",
+    "memory_utilization",
+    "total_memory",
+    "used_memory",
+    "free_memory",
+]
+USER_COLUMNS = ["gpu_index", "user", "gpu_utilization", "used_memory"]
+
+
+def _to_local(ts: pd.Series) -> pd.Series:
+    return pd.to_datetime(ts).dt.tz_localize("UTC").dt.tz_convert("Asia/Shanghai")
+
+
+def _empty(columns: list) -> pd.DataFrame:
+    data = pd.DataFrame(columns=columns)
+    data["timestamp"] = pd.Series(dtype="datetime64[ns, Asia/Shanghai]")
+    return data
+
+
+def _trim(chunks: Deque[pd.DataFrame], cutoff: dt.datetime) -> None:
+    """丢弃 cutoff 之前的数据，块内按 id 即写入顺序排列"""
+    while chunks and chunks[0]["timestamp"].iloc[-1] < cutoff:
+        chunks.popleft()
+    if chunks and chunks[0]["timestamp"].iloc[0] < cutoff:
+        chunks[0] = chunks[0][chunks[0]["timestamp"] >= cutoff]
+
+
+def read_latest_gpu_info(conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    读取最新一次采样的 GPU 状态（timestamp 为 UTC 字符串）
+
+    优先读取写入端维护的 gpu_latest 表（至多 N_GPU 行），旧版本创建的数据库中没有该表时回退到 gpu_info
+    """
+    try:
+        return pd.read_sql_query("SELECT * FROM gpu_latest ORDER BY gpu_index", conn)
+    except pd.errors.DatabaseError as e:
+        if "no such table" not in str(e):
+            raise
+    return pd.read_sql_query(
+        "SELECT * FROM gpu_info WHERE timestamp = (SELECT MAX(timestamp) FROM gpu_info) ORDER BY gpu_index", conn
+    )
+
+
+def read_device_status(conn: sqlite3.Connection) -> Optional[dict]:
+    """读取设备状态（最近采样时间、GPU 与用户数量、采样速率），没有记录时返回 None"""
+    try:
+        data = pd.read_sql_query("SELECT * FROM device_status WHERE id = 0", conn)
+    except pd.errors.DatabaseError as e:
+        if "no such table" not in str(e):
+            raise
+        return None
+    if data.empty:
+        return None
+    return data.iloc[0].drop("id").to_dict()
+
+
+def _concat(chunks: Deque[pd.DataFrame], columns: list) -> pd.DataFrame:
+    if not chunks:
+        return _empty(columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+@dataclass(frozen=True)
+class RealtimeSnapshot:
+    """
+    某一时刻的实时数据，由所有会话共享，使用方不应修改其中的 DataFrame（需要修改时先 copy）
+
+    latest: 最新一次采样的 gpu_info 行（timestamp 为本地时间字符串）
+    gpu: 窗口内的 gpu_info 行，使用率与显存在同一张表中（timestamp 为本地时区）
+    user: 窗口内的 gpu_index, user, gpu_utilization, used_memory, timestamp（本地时区）
+    """
+
+    latest: pd.DataFrame = field(default_factory=lambda: _empty(GPU_COLUMNS))
+    gpu: pd.DataFrame = field(default_factory=lambda: _empty(GPU_COLUMNS))
+    user: pd.DataFrame = field(default_factory=lambda: _empty(USER_COLUMNS))
+    updated_at: float = 0.0
+    error: Optional[str] = None
+
+    def window(self, start_time: dt.datetime) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """返回 start_time 之后的 GPU 与用户数据"""
+        gpu = self.gpu[self.gpu["timestamp"] >= start_time] if not self.gpu.empty else self.gpu
+        user = self.user[self.user["timestamp"] >= start_time] if not self.user.empty else self.user
+        return gpu, user
+
+
+class RealtimeFeed:
+    """
+    单个设备的实时数据源
+
+    后台线程每个 interval 读取一次新写入的行（按自增 id），追加到按时间裁剪的窗口中并生成快照，
+    所有会话读取同一份快照，数据库的查询量与在线人数和窗口长度无关；
+    超过 idle_timeout 秒无人读取时线程退出，下次读取时重新启动
+    """
+
+    def __init__(self, db_path: str, window: float = 60.0, interval: float = 1.0, idle_timeout: float = 30.0):
+        self.db_path = db_path
+        self.window = window
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+
+        self._snapshot = RealtimeSnapshot()
+        self._chunks: Dict[str, Deque[pd.DataFrame]] = {"gpu_info": deque(), "gpu_user_info": deque()}
+        self._last_id: Dict[str, Optional[int]] = {"gpu_info": None, "gpu_user_info": None}
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._last_access = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计信息
+        self.refreshes = 0
+        self.errors = 0
+
+    def _reset(self):
+        for table in self._chunks:
+            self._chunks[table].clear()
+            self._last_id[table] = None
+
+    def _fetch(self, conn, table: str, columns: list, start_time: str) -> pd.DataFrame:
+        """读取上次之后新写入的行；尚无数据时按时间读取整个窗口"""
+        last_id = self._last_id[table]
+        if last_id is None:
+            query = f"SELECT id, {', '.join(columns)}, timestamp FROM {table} WHERE timestamp >= ? ORDER BY id"
+            params: tuple = (start_time,)
+        else:
+            query = f"SELECT id, {', '.join(columns)}, timestamp FROM {table} WHERE id > ? ORDER BY id"
+            params = (last_id,)
+        data = pd.read_sql_query(query, conn, params=params)
+        if data.empty:
+            return data
+        self._last_id[table] = int(data["id"].iloc[-1])
+        data["timestamp"] = _to_local(data["timestamp"])
+        return data.drop(columns="id")
+
+    def _query(self) -> RealtimeSnapshot:
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        cutoff = now - dt.timedelta(seconds=self.window)
+        start_time = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 数据库文件被替换后 id 不再连续，重新读取整个窗口
+        try:
+            st = os.stat(self.db_path)
+            file_id = (st.st_dev, st.st_ino)
+        except FileNotFoundError:
+            file_id = None
+        if file_id != self._file_id:
+            self._reset()
+            self._file_id = file_id
+        elif time.time() - self._snapshot.updated_at > self.window:
+            # 停止期间积累的数据大多已在窗口之外，直接按时间读取
+            self._reset()
+
+        with read_connection(self.db_path) as conn:
+            latest = read_latest_gpu_info(conn)
+            new_gpu = self._fetch(conn, "gpu_info", GPU_COLUMNS, start_time)
+            new_user = self._fetch(conn, "gpu_user_info", USER_COLUMNS, start_time)
+
+        for table, new in (("gpu_info", new_gpu), ("gpu_user_info", new_user)):
+            chunks = self._chunks[table]
+            if not new.empty:
+                chunks.append(new)
+            _trim(chunks, cutoff)
+
+        gpu = _concat(self._chunks["gpu_info"], GPU_COLUMNS)
+        user = _concat(self._chunks["gpu_user_info"], USER_COLUMNS)
+        latest["timestamp"] = _to_local(latest["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+        return RealtimeSnapshot(latest=latest, gpu=gpu, user=user, updated_at=time.time())
+
+    def refresh(self) -> RealtimeSnapshot:
+        with self._refresh_lock:
+            try:
+                snapshot = self._query()
+                self.refreshes += 1
+            except Exception as e:
+                self.errors += 1
+                # 读取中途出错时无法确定已读到的位置，下次重新读取整个窗口
+                self._reset()
+                logger.error(f"Failed to refresh realtime feed of {self.db_path}: {e}")
+                # 保留上一份数据，由页面显示错误
+                old = self._snapshot
+                snapshot = RealtimeSnapshot(old.latest, old.gpu, old.user, old.updated_at, str(e))
+            self._snapshot = snapshot
+        return snapshot
+
+    def _run(self):
+        ticker = Ticker(self.interval, name=f"feed:{self.db_path}")
+        while True:
+            with self._lock:
+                # 与 snapshot() 在同一把锁下判断，避免读者看到即将退出的线程而不重新启动
+                if time.monotonic() - self._last_access >= self.idle_timeout:
+                    self._thread = None
+                    break
+            ticker.wait()
+            self.refresh()
+        logger.debug(f"Realtime feed of {self.db_path} stopped (idle)")
+
+    def snapshot(self) -> RealtimeSnapshot:
+        """读取最新的快照，必要时启动后台线程"""
+        with self._lock:
+            self._last_access = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"feed:{self.db_path}", daemon=True)
+                self._thread.start()
+                started = True
+            else:
+                started = False
+        snapshot = self._snapshot
+        if started and time.time() - snapshot.updated_at > 2 * self.interval:
+            # 线程刚启动时数据可能已过期，同步刷新一次
+            snapshot = self.refresh()
+        return snapshot
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "age": time.time() - self._snapshot.updated_at if self._snapshot.updated_at else None,
+        }
+
+
+__all__ = ["RealtimeSnapshot", "RealtimeFeed", "read_latest_gpu_info", "read_device_status"]
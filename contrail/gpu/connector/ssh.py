@@ -3,14 +3,75 @@ import re
 import time
 import socket
 import paramiko
-from typing import Optional
+from typing import Optional, List, Tuple
 from loguru import logger
 
 from contrail.gpu.framework import BaseDeviceConnector
+from contrail.gpu.connector.ssh_pool import get_transport_pool
+
+
+class LineSplitter:
+    """
+    增量按行切分字节流
+
+    只扫描新到达的数据，已消费的行立即从缓冲区移除；
+    不完整行超过 max_buffer 时丢弃该行剩余部分，保证缓冲区有界
+    """
+
+    def __init__(self, max_buffer: int = 1 << 20):
+        self.max_buffer = max_buffer
+        self._buf = bytearray()
+        self._discarding = False  # 正在丢弃超长行的剩余部分
+        self.overflows = 0
+
+    def clear(self):
+        self._buf.clear()
+        self._discarding = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """追加数据并返回新产生的完整行（不含换行符）"""
+        # 仅在新数据中查找换行，已缓冲的部分不再重复扫描
+        pos = data.find(b"\n")
+        if pos == -1:
+            if not self._discarding:
+                self._buf += data
+                if len(self._buf) > self.max_buffer:
+                    self.overflows += 1
+                    self._buf.clear()
+                    self._discarding = True
+            return []
+
+        lines = []
+        if self._discarding:
+            self._discarding = False
+        else:
+            self._buf += data[:pos]
+            lines.append(bytes(self._buf))
+        self._buf.clear()
+
+        start = pos + 1
+        pos = data.find(b"\n", start)
+        while pos != -1:
+            lines.append(data[start:pos])
+            start = pos + 1
+            pos = data.find(b"\n", start)
+
+        rest = data[start:]
+        if len(rest) > self.max_buffer:
+            self.overflows += 1
+            self._discarding = True
+        else:
+            self._buf += rest
+        return lines
 
 
 class SSHDeviceConnector(BaseDeviceConnector):
-    """SSH设备连接器"""
+    """
+    SSH设备连接器
+
+    - shell 模式（默认）：每个设备独立的 SSHClient 与交互式 shell
+    - exec 模式：共享连接池中的 Transport，每次轮询打开一个 exec channel
+    """
 
     # 常用 prompt 模式：末尾为 $ 或 #，或包含括号环境名 (env)
     PROMPT_RE = re.compile(r"(^.*[#$]\s*$)|(^.*\([^)]+\)\s*.*[#$]\s*$)")
@@ -23,14 +84,31 @@ class SSHDeviceConnector(BaseDeviceConnector):
         super().__init__(*args, **kwargs)
         self.client: Optional[paramiko.SSHClient] = None
         self.channel: Optional[paramiko.Channel] = None
-        self._recv_buffer = ""  # 未解析的字符缓冲
+        self._splitter = LineSplitter(int(self.config.params.get("max_line_bytes", 1 << 20)))
+        # 每个 channel 的读取计数：json 行 / 被跳过的噪声行（回显、prompt、非 JSON 输出）
+        self.line_stats = {"json": 0, "noise": 0, "overflow": 0}
         self._timeout_streak = 0
         self._last_read_was_timeout = False
 
+    @property
+    def use_exec(self) -> bool:
+        return self.config.params.get("mode", "shell") == "exec"
+
     def connect(self):
         if self._connected:
             return
 
+        if self.use_exec:
+            try:
+                get_transport_pool().get_transport(self.config.params)
+                self._connected = True
+                logger.info(f"[{self.config.name}] SSH pooled transport connected")
+            except Exception as e:
+                logger.exception(f"[{self.config.name}] SSH connect failed: {e}")
+                self.handle_error(e)
+                self._connected = False
+            return
+
         try:
             self.client = paramiko.SSHClient()
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -45,6 +123,8 @@ class SSHDeviceConnector(BaseDeviceConnector):
             )
             self.channel = self.client.invoke_shell()
             self.channel.settimeout(1.0)
+            self._splitter.clear()
+            self.line_stats = {"json": 0, "noise": 0, "overflow": 0}
 
             init_cmd = self.config.params.get("init_cmd")
             if init_cmd:
@@ -59,7 +139,10 @@ class SSHDeviceConnector(BaseDeviceConnector):
             self._connected = False
 
     def disconnect(self):
+        # exec 模式下 Transport 由连接池管理，失效时由连接池自动重建
         if self.channel:
+            self.line_stats["overflow"] = self._splitter.overflows
+            logger.debug(f"[{self.config.name}] channel line stats: {self.line_stats}")
             try:
                 self.channel.close()
             except Exception:
@@ -100,20 +183,32 @@ class SSHDeviceConnector(BaseDeviceConnector):
             except Exception:
                 break
 
+    @staticmethod
+    def _looks_like_json(s: bytes) -> bool:
+        return (s[:1] == b"[" and s[-1:] == b"]") or (s[:1] == b"{" and s[-1:] == b"}")
+
+    def _clean_line(self, ln: bytes) -> str:
+        s = ln.decode(errors="ignore").strip()
+        if "\x1b" in s:
+            s = self.ANSI_ESCAPE_RE.sub("", s).strip()
+        return s
+
     def _read_lines_until_json(self, cmd: str, timeout: float) -> Optional[list]:
         """
-        从 channel 读取并按行解析 JSON 输出
+        从 channel 增量读取并按行解析 JSON 输出
         """
         deadline = time.time() + timeout
-        self._recv_buffer = ""
+        self._splitter.clear()
         self._last_read_was_timeout = False
+        cmd = cmd.strip()
 
         assert self.channel is not None
 
         while time.time() < deadline:
+            lines = []
             try:
                 while self.channel.recv_ready():
-                    self._recv_buffer += self.channel.recv(65536).decode(errors="ignore")
+                    lines += self._splitter.feed(self.channel.recv(65536))
             except socket.timeout:
                 logger.warning(f"[{self.config.name}] channel read timeout")
                 pass
@@ -121,36 +216,44 @@ class SSHDeviceConnector(BaseDeviceConnector):
                 logger.exception(f"[{self.config.name}] channel read error: {e}")
                 return None
 
-            # 如果有完整行则处理
-            if "\n" in self._recv_buffer:
-                lines = self._recv_buffer.splitlines()
-                # 如果最后一行不是以换行结束，则保留为不完整行
-                self._recv_buffer = "" if self._recv_buffer.endswith("\n") else lines.pop()
-
-                for i, ln in enumerate(lines):
-                    # 过滤转义字符和回显
-                    s = self.ANSI_ESCAPE_RE.sub("", ln.strip())
-                    if not s or s.endswith(cmd.strip()) or self.PROMPT_RE.match(s):
-                        continue
-
-                    # Exception Traceback 检测
-                    if self.PYTHON_ERROR_RE.match(s):
-                        traceback_msg = "\n".join(
-                            [s] + [self.ANSI_ESCAPE_RE.sub("", l.strip()) for l in lines[i + 1 :]]
-                        )
-                        self.handle_error(RuntimeError(traceback_msg))
-                        return None
+            for i, ln in enumerate(lines):
+                # 快速路径：整行形如 JSON 时直接解析，无需正则
+                s = ln.strip()
+                if self._looks_like_json(s):
+                    try:
+                        obj = json.loads(s)
+                        self.line_stats["json"] += 1
+                        return obj
+                    except ValueError:
+                        pass
 
-                    # 尝试解析 JSON
+                # 过滤转义字符和回显
+                s = self._clean_line(ln)
+                if not s or s.endswith(cmd) or self.PROMPT_RE.match(s):
+                    self.line_stats["noise"] += 1
+                    continue
+
+                # Exception Traceback 检测
+                if self.PYTHON_ERROR_RE.match(s):
+                    traceback_msg = "\n".join([s] + [self._clean_line(l) for l in lines[i + 1 :]])
+                    self.handle_error(RuntimeError(traceback_msg))
+                    return None
+
+                # 去除转义字符后再尝试解析 JSON
+                if self._looks_like_json(s.encode()):
                     try:
                         obj = json.loads(s)
+                        self.line_stats["json"] += 1
                         return obj
-                    except Exception:
+                    except ValueError:
                         logger.warning(
-                            f"[{self.config.name}] non-json line ignored: {s if len(s) <= 200 else s[:200]} (len={len(s)})"
+                            f"[{self.config.name}] malformed json line ignored: {s if len(s) <= 200 else s[:200]} (len={len(s)})"
                         )
+                self.line_stats["noise"] += 1
+                logger.trace(f"[{self.config.name}] non-json line ignored: {s if len(s) <= 200 else s[:200]}")
 
-            time.sleep(0.02)
+            if not lines:
+                time.sleep(0.02)
 
         logger.warning(f"[{self.config.name}] read timeout, no JSON parsed")
         self._last_read_was_timeout = True
@@ -168,10 +271,85 @@ class SSHDeviceConnector(BaseDeviceConnector):
         else:
             self._timeout_streak = 0
 
+    def _exec_command(self) -> Tuple[str, float]:
+        params = self.config.params
+        cmd = params["command"]
+        init_cmd = params.get("init_cmd")
+        if init_cmd:
+            cmd = f"{init_cmd} && {cmd}"
+        return cmd, float(params.get("read_timeout", 5.0))
+
+    def _collect_exec(self) -> Optional[list]:
+        """
+        通过共享 Transport 的 exec channel 执行命令并解析 JSON 输出
+        """
+        cmd, read_timeout = self._exec_command()
+        try:
+            status, stdout, stderr = get_transport_pool().exec(self.config.params, cmd, timeout=read_timeout)
+        except Exception as e:
+            logger.exception(f"[{self.config.name}] exec failed: {e}")
+            self.handle_error(e)
+            return None
+        return self._parse_exec_output(status, stdout, stderr)
+
+    async def _acollect_exec(self) -> Optional[list]:
+        cmd, read_timeout = self._exec_command()
+        try:
+            status, stdout, stderr = await get_transport_pool().aexec(self.config.params, cmd, timeout=read_timeout)
+        except Exception as e:
+            logger.exception(f"[{self.config.name}] exec failed: {e}")
+            self.handle_error(e)
+            return None
+        return self._parse_exec_output(status, stdout, stderr)
+
+    def _parse_exec_output(self, status: int, stdout: bytes, stderr: bytes) -> Optional[list]:
+        """解析 exec channel 的输出：超时、远端报错或取最后一行 JSON"""
+        if status == -1:
+            logger.warning(f"[{self.config.name}] read timeout, no JSON parsed")
+            self._last_read_was_timeout = True
+            self._detect_timeout_streak()
+            return None
+        self._last_read_was_timeout = False
+
+        if status != 0:
+            # 远端报错（如 Python Traceback）输出在 stderr 中
+            err = stderr.decode(errors="ignore").strip()
+            self.handle_error(RuntimeError(f"command exited with {status}: {err[-2000:]}"))
+            return None
+
+        # 取最后一行可解析的 JSON 输出
+        for ln in reversed(stdout.splitlines()):
+            s = ln.strip()
+            if not self._looks_like_json(s):
+                self.line_stats["noise"] += 1
+                continue
+            try:
+                result = json.loads(s)
+                self.line_stats["json"] += 1
+                self._timeout_streak = 0
+                return result
+            except ValueError:
+                logger.warning(f"[{self.config.name}] malformed json line ignored (len={len(s)})")
+
+        logger.warning(f"[{self.config.name}] no JSON found in command output")
+        return None
+
+    async def acollect(self) -> Optional[list]:
+        """exec 模式在事件循环中直接等待输出；shell 模式的交互式 channel 仍在线程池中读取"""
+        if self.use_exec and self._connected:
+            return await self._acollect_exec()
+        return await super().acollect()
+
     def collect(self) -> Optional[list]:
         """
         发送命令并等待按行 JSON 输出
         """
+        if self.use_exec:
+            if not self._connected:
+                logger.warning(f"[{self.config.name}] not connected")
+                return None
+            return self._collect_exec()
+
         if not self._connected or not self.channel:
             logger.warning(f"[{self.config.name}] not connected")
             return None
@@ -0,0 +1,404 @@
+import time
+import socket
+import asyncio
+import threading
+import paramiko
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from contrail.gpu.framework import BaseDeviceConnector, DeviceConfig
+from contrail.gpu.supervisor import RestartPolicy, Supervisor, read_group_messages
+from contrail.utils.scheduler import Ticker
+
+
+HostKey = Tuple[str, int, str]
+
+
+class SSHTransportPool:
+    """
+    SSH 连接池：每个 (host, port, user) 只维护一个 Transport，
+    每次轮询在其上打开轻量的 exec channel；支持通过跳板机 (jump host) 建立连接
+    """
+
+    def __init__(self, connect_timeout: float = 10.0, keepalive: int = 30):
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self._clients: Dict[HostKey, paramiko.SSHClient] = {}
+        self._host_locks: Dict[HostKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _target(params: dict) -> Tuple[HostKey, Optional[str]]:
+        key = (params["host"], int(params.get("port", 22)), params["user"])
+        return key, params.get("key_file")
+
+    @staticmethod
+    def _jump(params: dict) -> Optional[Tuple[HostKey, Optional[str]]]:
+        if not params.get("jump_host"):
+            return None
+        key = (
+            params["jump_host"],
+            int(params.get("jump_port", 22)),
+            params.get("jump_user", params["user"]),
+        )
+        return key, params.get("jump_key_file", params.get("key_file"))
+
+    def _host_lock(self, key: HostKey) -> threading.Lock:
+        with self._lock:
+            if key not in self._host_locks:
+                self._host_locks[key] = threading.Lock()
+            return self._host_locks[key]
+
+    def _get_client(
+        self,
+        key: HostKey,
+        key_file: Optional[str],
+        jump: Optional[Tuple[HostKey, Optional[str]]] = None,
+    ) -> paramiko.SSHClient:
+        """获取（必要时建立）到指定主机的共享连接"""
+        with self._host_lock(key):
+            client = self._clients.get(key)
+            transport = client.get_transport() if client else None
+            if transport is not None and transport.is_active():
+                return client  # type: ignore[return-value]
+
+            if client is not None:
+                logger.warning(f"[ssh-pool] transport to {key[2]}@{key[0]}:{key[1]} is inactive, reconnecting")
+                self._close_client(client)
+
+            sock = None
+            if jump is not None:
+                jump_client = self._get_client(*jump)
+                jump_transport = jump_client.get_transport()
+                assert jump_transport is not None
+                sock = jump_transport.open_channel(
+                    "direct-tcpip", (key[0], key[1]), ("127.0.0.1", 0), timeout=self.connect_timeout
+                )
+
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            try:
+                client.connect(
+                    hostname=key[0],
+                    port=key[1],
+                    username=key[2],
+                    key_filename=key_file,
+                    timeout=self.connect_timeout,
+                    banner_timeout=self.connect_timeout,
+                    auth_timeout=self.connect_timeout,
+                    look_for_keys=False,
+                    allow_agent=False,
+                    sock=sock,  # type: ignore[arg-type]
+                )
+            except Exception:
+                # 连接失败时关闭跳板机上的通道，避免在长期存在的跳板连接上泄漏
+                client.close()
+                if sock is not None:
+                    sock.close()
+                raise
+            transport = client.get_transport()
+            assert transport is not None
+            transport.set_keepalive(self.keepalive)
+
+            self._clients[key] = client
+            logger.info(f"[ssh-pool] transport opened to {key[2]}@{key[0]}:{key[1]}")
+            return client
+
+    def get_transport(self, params: dict) -> paramiko.Transport:
+        """获取目标设备的共享 Transport"""
+        key, key_file = self._target(params)
+        client = self._get_client(key, key_file, self._jump(params))
+        transport = client.get_transport()
+        assert transport is not None
+        return transport
+
+    def exec(self, params: dict, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        在共享 Transport 上打开 exec channel 执行命令
+
+        Returns:
+            Tuple[int, bytes, bytes]: 退出码（超时为 -1）、stdout 与 stderr
+        """
+        deadline = time.time() + timeout
+        try:
+            transport = self.get_transport(params)
+            channel = transport.open_session(timeout=timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            self.invalidate(params)
+            raise
+
+        stdout, stderr = bytearray(), bytearray()
+        try:
+            channel.settimeout(max(0.1, deadline - time.time()))
+            channel.exec_command(command)
+
+            while time.time() < deadline:
+                if channel.recv_ready():
+                    stdout += channel.recv(65536)
+                elif channel.recv_stderr_ready():
+                    stderr += channel.recv_stderr(65536)
+                elif channel.exit_status_ready():
+                    break
+                else:
+                    time.sleep(0.01)
+
+            if not channel.exit_status_ready():
+                return -1, bytes(stdout), bytes(stderr)
+
+            # 读取 exit 之后残留的数据
+            while channel.recv_ready():
+                stdout += channel.recv(65536)
+            while channel.recv_stderr_ready():
+                stderr += channel.recv_stderr(65536)
+            return channel.recv_exit_status(), bytes(stdout), bytes(stderr)
+        except socket.timeout:
+            return -1, bytes(stdout), bytes(stderr)
+        finally:
+            channel.close()
+
+    async def aexec(self, params: dict, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        exec() 的异步版本：打开 channel（必要时建立连接）需要等待服务器响应，在线程池中执行；
+        之后等待命令结束与读取输出在事件循环中以非阻塞方式轮询，不占用线程
+
+        Returns:
+            Tuple[int, bytes, bytes]: 退出码（超时为 -1）、stdout 与 stderr
+        """
+        deadline = time.time() + timeout
+
+        def open_channel() -> Optional[paramiko.Channel]:
+            try:
+                transport = self.get_transport(params)
+                channel = transport.open_session(timeout=timeout)
+            except (paramiko.SSHException, EOFError, OSError):
+                self.invalidate(params)
+                raise
+            try:
+                channel.settimeout(max(0.1, deadline - time.time()))
+                channel.exec_command(command)
+            except socket.timeout:
+                channel.close()
+                return None
+            except BaseException:
+                channel.close()
+                raise
+            return channel
+
+        channel = await asyncio.to_thread(open_channel)
+        if channel is None:
+            return -1, b"", b""
+
+        stdout, stderr = bytearray(), bytearray()
+        try:
+            # recv_ready 时 recv 立即返回，不会阻塞事件循环
+            while time.time() < deadline:
+                if channel.recv_ready():
+                    stdout += channel.recv(65536)
+                elif channel.recv_stderr_ready():
+                    stderr += channel.recv_stderr(65536)
+                elif channel.exit_status_ready():
+                    break
+                else:
+                    await asyncio.sleep(0.01)
+
+            if not channel.exit_status_ready():
+                return -1, bytes(stdout), bytes(stderr)
+
+            while channel.recv_ready():
+                stdout += channel.recv(65536)
+            while channel.recv_stderr_ready():
+                stderr += channel.recv_stderr(65536)
+            return channel.recv_exit_status(), bytes(stdout), bytes(stderr)
+        finally:
+            channel.close()
+
+    def invalidate(self, params: dict):
+        """丢弃目标设备的共享连接，下次使用时重新建立"""
+        key, _ = self._target(params)
+        with self._host_lock(key):
+            client = self._clients.pop(key, None)
+        if client is not None:
+            self._close_client(client)
+
+    @staticmethod
+    def _close_client(client: paramiko.SSHClient):
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            self._close_client(client)
+
+
+_default_pool: Optional[SSHTransportPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_transport_pool() -> SSHTransportPool:
+    """获取当前进程内共享的 SSH 连接池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SSHTransportPool()
+        return _default_pool
+
+
+class SSHFanoutPoller:
+    """
+    在单个进程内通过线程池并发轮询多个 SSH 设备
+
+    主进程通过 group_queue 增删或替换设备，由 factory 在进程内创建新的连接器
+    """
+
+    def __init__(
+        self,
+        connectors: List[BaseDeviceConnector],
+        max_workers: int = 8,
+        policy: Optional[RestartPolicy] = None,
+        status_queue=None,
+        group_queue=None,
+        factory: Optional[Callable[[DeviceConfig], BaseDeviceConnector]] = None,
+    ):
+        self.connectors = {c.config.name: c for c in connectors}
+        self.max_workers = max(1, max_workers)
+        self.supervisor = Supervisor(policy, status_queue)
+        self.group_queue = group_queue
+        self.factory = factory
+        self._inflight: Dict[str, Tuple[Future, float]] = {}
+        self._tickers: Dict[str, Ticker] = {}
+
+    def _poll_timeout(self, connector: BaseDeviceConnector) -> float:
+        params = connector.config.params
+        read_timeout = float(params.get("read_timeout", 5.0))
+        return float(params.get("poll_timeout", read_timeout + 5.0))
+
+    def _reap(self, now: float):
+        """回收已完成的轮询，并报告超时的设备"""
+        for name, (future, started) in list(self._inflight.items()):
+            if future.done():
+                del self._inflight[name]
+                exc = future.exception()
+                if exc is not None:
+                    connector = self.connectors[name]
+                    logger.error(f"[{name}] poll failed in fan-out worker")
+                    connector.handle_error(exc)  # type: ignore[arg-type]
+            elif now - started > self._poll_timeout(self.connectors[name]):
+                # 线程无法被强制取消，在其结束前不会再次提交该设备
+                logger.warning(f"[{name}] poll exceeded {self._poll_timeout(self.connectors[name]):.1f}s timeout")
+                self._inflight[name] = (future, now)
+                self.connectors[name].handle_error(TimeoutError(f"poll timeout on {name}"))
+
+    def _restart(self, name: str):
+        connector = self.connectors[name]
+        try:
+            connector.restart()
+        except Exception as e:
+            logger.error(f"[{name}] Failed to restart in fan-out worker")
+            connector.handle_error(e)
+        self.supervisor.on_restart(name)
+        self._tickers[name].reset(immediate=True)
+
+    def _start(self, name: str):
+        connector = self.connectors[name]
+        try:
+            connector.start()
+        except Exception as e:
+            logger.error(f"[{name}] Failed to start in fan-out worker")
+            connector.handle_error(e)
+        self._tickers[name].reset(immediate=True)
+
+    def _add_device(self, config: DeviceConfig, executor: ThreadPoolExecutor):
+        assert self.factory is not None
+        self.connectors[config.name] = self.factory(config)
+        self._tickers[config.name] = Ticker(config.poll_interval, name=f"{config.name}:poll")
+        # 建立连接可能阻塞，在线程池中执行
+        self._inflight[config.name] = (executor.submit(self._start, config.name), time.monotonic())
+        logger.info(f"[{config.name}] Added to fan-out polling")
+
+    def _remove_device(self, name: str):
+        connector = self.connectors.pop(name, None)
+        if connector is None:
+            return
+        self._tickers.pop(name, None)
+        self.supervisor.forget(name)
+        inflight = self._inflight.pop(name, None)
+        if inflight is not None:
+            # 线程无法被强制取消，等待进行中的轮询结束后再关闭
+            inflight[0].add_done_callback(lambda _: connector.close())
+        else:
+            connector.close()
+        logger.info(f"[{name}] Removed from fan-out polling")
+
+    def _apply_group_messages(self, executor: ThreadPoolExecutor):
+        """应用主进程下发的设备变更，不影响组内其他设备"""
+        for message in read_group_messages(self.group_queue):
+            action = message[0]
+            if action == "add":
+                self._add_device(message[1], executor)
+            elif action == "replace":
+                self._remove_device(message[1].name)
+                self._add_device(message[1], executor)
+            elif action == "remove":
+                self._remove_device(message[1])
+            elif action == "update" and message[1] in self.connectors:
+                self.connectors[message[1]].control_queue.put(message[2])
+
+    def run(self):
+        for connector in self.connectors.values():
+            connector.start()
+            ticker = Ticker(connector.config.poll_interval, name=f"{connector.config.name}:poll")
+            ticker.reset(immediate=True)
+            self._tickers[connector.config.name] = ticker
+
+        logger.info(f"Starting SSH fan-out polling for {list(self.connectors)} (max_workers={self.max_workers})")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ssh-poll") as executor:
+            while self.connectors:
+                self._apply_group_messages(executor)
+                now = time.monotonic()
+                self._reap(now)
+
+                for name, connector in list(self.connectors.items()):
+                    if name in self._inflight:
+                        continue
+                    if not connector._connected:
+                        if self.supervisor.due(name) and len(self._inflight) < self.max_workers:
+                            self._inflight[name] = (executor.submit(self._restart, name), now)
+                        elif not self.supervisor.pending(name):
+                            if not self.supervisor.on_failure(name, connector._last_error):
+                                logger.error(f"[{name}] disconnected, removed from fan-out polling")
+                                self._remove_device(name)
+                        continue
+                    self.supervisor.on_healthy(name)
+                    ticker = self._tickers[name]
+                    ticker.set_interval(connector.config.poll_interval)
+                    if not ticker.due:
+                        continue
+                    if len(self._inflight) >= self.max_workers:
+                        break
+
+                    self._inflight[name] = (executor.submit(connector.step), now)
+                    _, missed = ticker.advance()
+                    connector.stats.skipped_ticks += missed
+
+                time.sleep(0.01)
+
+        logger.error("All SSH fan-out devices disconnected")
+
+
+def run_ssh_fanout(
+    connectors: List[BaseDeviceConnector],
+    max_workers: int = 8,
+    policy: Optional[RestartPolicy] = None,
+    status_queue=None,
+    group_queue=None,
+    factory: Optional[Callable[[DeviceConfig], BaseDeviceConnector]] = None,
+):
+    """SSH 并发轮询进程入口"""
+    SSHFanoutPoller(connectors, max_workers, policy, status_queue, group_queue, factory).run()
@@ -0,0 +1,188 @@
+import os
+import hmac
+import json
+import queue
+import secrets
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import unquote
+from loguru import logger
+
+# GET 只能执行只读命令，其余命令需使用 POST
+READ_ONLY_COMMANDS = ("stats", "list")
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+
+def load_token(path: str) -> str:
+    """读取控制接口的令牌，文件不存在时生成一个（权限 0600）"""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_urlsafe(32))
+        logger.info(f"Control token written to {path}")
+    os.chmod(path, 0o600)
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    server: "_ControlHTTPServer"
+
+    def _reply(self, code: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check(self) -> bool:
+        """拒绝来自浏览器页面的请求（DNS rebinding / CSRF）以及未携带令牌的请求"""
+        host = self.headers.get("Host", "")
+        hostname = host.partition("]")[0] + "]" if host.startswith("[") else host.split(":")[0]
+        if hostname not in LOCAL_HOSTS:
+            self._reply(403, {"error": "invalid host"})
+            return False
+        if self.headers.get("Origin"):
+            self._reply(403, {"error": "cross-origin requests are not allowed"})
+            return False
+        auth = self.headers.get("Authorization", "")
+        token = auth[len("Bearer ") :] if auth.startswith("Bearer ") else ""
+        if not hmac.compare_digest(token.encode(), self.server.control.token.encode()):
+            self._reply(401, {"error": "invalid token"})
+            return False
+        return True
+
+    def _dispatch(self, command: str):
+        if not command.strip():
+            self._reply(400, {"error": "empty command"})
+            return
+        try:
+            result = self.server.control.submit(command)
+            self._reply(200, result)
+        except FutureTimeoutError:
+            self._reply(504, {"error": "command timed out"})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def do_GET(self):
+        # GET /stats, GET /list
+        if not self._check():
+            return
+        command = " ".join(unquote(p) for p in self.path.strip("/").split("/") if p)
+        if command not in READ_ONLY_COMMANDS:
+            self._reply(405, {"error": f"use POST for {command!r}"})
+            return
+        self._dispatch(command)
+
+    def do_POST(self):
+        # POST / 请求体为 JSON，例如 {"command": "reload config/host_config.json"}
+        if not self._check():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "content type must be application/json"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8") if length else "{}")
+            command = body.get("command", "") if isinstance(body, dict) else ""
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        self._dispatch(str(command))
+
+    def log_message(self, format, *args):
+        logger.trace(f"[control] {self.address_string()} {format % args}")
+
+
+class _ControlHTTPServer(ThreadingHTTPServer):
+    daemon_threads = False  # 关闭时等待正在返回的请求
+    control: "ControlServer"
+
+
+class ControlServer:
+    """
+    本地控制接口（仅监听 localhost 的 HTTP）
+
+    请求需携带 token_path 文件中的令牌（Authorization: Bearer），Host 必须为本机地址且不能带 Origin，
+    GET 只能执行只读命令，其余命令以 application/json 的 POST 提交，防止浏览器页面跨站调用。
+    HTTP 线程只负责收发请求，命令通过队列交给主循环执行，保证与 stdin 命令串行处理；
+    fileno() 可加入主循环的 select 以便立即唤醒
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 3335, token_path: str = "data/control_token", timeout: float = 30.0
+    ):
+        self.address: Tuple[str, int] = (host, port)
+        self.token_path = token_path
+        self.token = ""
+        self.timeout = timeout
+        self._requests: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._server: Optional[_ControlHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        try:
+            self.token = load_token(self.token_path)
+            self._server = _ControlHTTPServer(self.address, _ControlHandler)
+        except OSError as e:
+            logger.error(f"Failed to start control server on {self.address[0]}:{self.address[1]}: {e}")
+            return False
+        self._server.control = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="control-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Control server listening on http://{self.address[0]}:{self.address[1]}")
+        return True
+
+    def fileno(self) -> int:
+        return self._wakeup_r
+
+    def submit(self, command: str) -> dict:
+        """HTTP 线程：提交命令并等待主循环返回结果"""
+        future: Future = Future()
+        self._requests.put((command, future))
+        os.write(self._wakeup_w, b"\0")
+        return future.result(timeout=self.timeout)
+
+    def handle_pending(self, handler) -> bool:
+        """
+        主循环：执行所有待处理的命令
+
+        Returns:
+            bool: 是否处理了至少一条命令
+        """
+        try:
+            os.read(self._wakeup_r, 4096)
+        except BlockingIOError:
+            pass
+
+        handled = False
+        while True:
+            try:
+                command, future = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            handled = True
+            try:
+                future.set_result(handler(command))
+            except BaseException as e:
+                future.set_exception(e if isinstance(e, Exception) else RuntimeError(repr(e)))
+                if not isinstance(e, Exception):
+                    raise
+        return handled
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for fd in (self._wakeup_r, self._wakeup_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -1,14 +1,23 @@
 import abc
 import time
 import json
-import schedule
+import queue
+import asyncio
 import datetime as dt
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Dict, Any, Optional
 from loguru import logger
 
 # 复用原有模块的功能
 from contrail.gpu.GPU_logger import *
+from contrail.gpu.writer import submit_samples
+from contrail.gpu.stats import ConnectorStats
+from contrail.gpu.GPU_fault_detector import FaultDetectionWorker, get_fault_detection_worker
+from contrail.utils.scheduler import FixedRateScheduler, Ticker
+
+
+# 聚合任务在窗口结束后延迟执行的秒数，等待窗口末尾的采样写入数据库
+AGGREGATE_DELAY = 2.0
 
 
 @dataclass
@@ -21,6 +30,8 @@ class DeviceConfig:
     poll_interval: float = 1.0
     aggregate_period: int = 30
     clean_period: int = 3600
+    fault_detection: bool = False  # 是否对该设备的聚合数据进行故障检测
+    fault_rules: Optional[str] = None  # 故障规则配置文件，None 表示使用默认规则
 
     def __post_init__(self):
         self._validate_params()
@@ -38,6 +49,14 @@ class DeviceConfig:
         if missing:
             raise ValueError(f"Missing params for {self.name}({self.type}): {missing}")
 
+    def diff(self, other: "DeviceConfig") -> Dict[str, Any]:
+        """返回 other 中取值不同的字段"""
+        return {f.name: getattr(other, f.name) for f in fields(self) if getattr(self, f.name) != getattr(other, f.name)}
+
+
+# 可在运行中直接生效的字段，其余字段（type/params/db_path）变化时需要重启连接器
+LIVE_UPDATE_FIELDS = ("poll_interval", "aggregate_period", "clean_period", "retries")
+
 
 class BaseDeviceConnector(abc.ABC):
     """设备连接器基类"""
@@ -47,9 +66,21 @@ class BaseDeviceConnector(abc.ABC):
         self._connected = False
         self._last_seen = None
         self._error_count = 0
+        self._last_error: Optional[str] = None
         self.realtime_db_path = f"{self.config.db_path}/gpu_info_{self.config.name}.db"
         self.history_db_path = f"{self.config.db_path}/gpu_history_{self.config.name}.db"
         self.scheduler = None
+        # 独立写入进程的队列，为 None 时直接写入数据库
+        self.writer_queue = None
+        self.writer_put_timeout = 5.0
+        # 运行统计，通过 status_queue 报告给主进程
+        self.stats = ConnectorStats()
+        self.status_queue = None
+        # 主进程下发的配置更新（仅 LIVE_UPDATE_FIELDS）
+        self.control_queue = None
+        # 故障检测在采集进程内的后台线程中执行，于 start() 时创建
+        self.email_config = "config/email_config.json"
+        self.fault_detector: Optional[FaultDetectionWorker] = None
 
         # 初始化数据库
         self._init_db()
@@ -60,6 +91,11 @@ class BaseDeviceConnector(abc.ABC):
         initialize_database(self.history_db_path, is_history=True)
         logger.info(f"[{self.config.name}] Database initialized")
 
+    def attach_writer(self, writer_queue, put_timeout: float = 5.0):
+        """将采样交由独立的写入进程写入数据库"""
+        self.writer_queue = writer_queue
+        self.writer_put_timeout = put_timeout
+
     @abc.abstractmethod
     def connect(self):
         """建立连接"""
@@ -80,10 +116,39 @@ class BaseDeviceConnector(abc.ABC):
         """获取原始数据"""
         pass
 
+    async def acollect(self) -> Optional[list]:
+        """异步获取原始数据，默认在线程池中执行阻塞的 collect()"""
+        return await asyncio.to_thread(self.collect)
+
     def process(self):
         """处理并存储数据"""
+        start = time.perf_counter()
         try:
             raw_data = self.collect()
+        except Exception as e:
+            logger.error(f"[{self.config.name}] Data processing failed")
+            self.handle_error(e)
+            return
+        self.store(raw_data)
+        self.stats.poll_latency.observe(time.perf_counter() - start)
+        self.stats.maybe_report(self.config.name, self.status_queue)
+
+    async def aprocess(self):
+        """异步采集，数据处理与写入在线程池中执行"""
+        start = time.perf_counter()
+        try:
+            raw_data = await self.acollect()
+        except Exception as e:
+            logger.error(f"[{self.config.name}] Data processing failed")
+            self.handle_error(e)
+            return
+        await asyncio.to_thread(self.store, raw_data)
+        self.stats.poll_latency.observe(time.perf_counter() - start)
+        self.stats.maybe_report(self.config.name, self.status_queue)
+
+    def store(self, raw_data: Optional[list]):
+        """处理并写入一次采集的数据"""
+        try:
             if not raw_data:
                 return
 
@@ -91,26 +156,36 @@ class BaseDeviceConnector(abc.ABC):
             # timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
             curr_time = dt.datetime.now(tz=dt.timezone.utc)
             timestamp = curr_time.strftime("%Y-%m-%d %H:%M:%S")
-            update_database(gpu_dfs, timestamp, self.realtime_db_path)
+            write_start = time.perf_counter()
+            if self.writer_queue is not None:
+                # 写入延迟包含队列背压的等待时间
+                records = gpu_dfs_to_records(gpu_dfs)
+                submit_samples(self.writer_queue, self.realtime_db_path, timestamp, records, self.writer_put_timeout)
+            else:
+                update_database(gpu_dfs, timestamp, self.realtime_db_path)
+            self.stats.write_latency.observe(time.perf_counter() - write_start)
 
             # 测试阶段使用 print 代替数据库更新
             # print(f"Updating database for {self.config.name} at {timestamp}: {gpu_dfs}")
 
             self._last_seen = time.time()
+            self.stats.samples += 1
+            self.stats.last_seen = self._last_seen
 
         except Exception as e:
             logger.error(f"[{self.config.name}] Data processing failed")
             self.handle_error(e)
 
-    def aggregate(self):
-        """聚合数据"""
-        timestamp = dt.datetime.now(tz=dt.timezone.utc)
+    def aggregate(self, timestamp: Optional[dt.datetime] = None):
+        """聚合 [timestamp - aggregate_period, timestamp) 内的数据"""
+        timestamp = timestamp or dt.datetime.now(tz=dt.timezone.utc)
         aggregate_data(
             timestamp,
             period_s=self.config.aggregate_period,
             db_path=self.history_db_path,
             db_realtime_path=self.realtime_db_path,
-            fault_detector=None,
+            fault_detector=self.fault_detector,
+            device_name=self.config.name,
         )
 
     def clean(self):
@@ -122,25 +197,96 @@ class BaseDeviceConnector(abc.ABC):
             db_path=self.realtime_db_path,
         )
 
-    def run(self):
+    def start(self):
+        """建立连接并注册定时任务"""
         self.connect()
         self._last_seen = time.time()
 
-        self.scheduler = schedule.Scheduler()
-        self.scheduler.every(self.config.aggregate_period).seconds.do(self.aggregate)
-        self.scheduler.every(self.config.clean_period).seconds.do(self.clean)
+        if self.config.fault_detection and self.fault_detector is None:
+            try:
+                self.fault_detector = get_fault_detection_worker(
+                    self.config.fault_rules, self.email_config, alert_db_path=f"{self.config.db_path}/alerts.db"
+                )
+            except Exception as e:
+                logger.error(f"[{self.config.name}] Failed to enable fault detection: {e}")
+
+        self._schedule_jobs()
         logger.info(f"[{self.config.name}] Starting data collection")
 
+    def _schedule_jobs(self):
+        name = self.config.name
+        self.scheduler = FixedRateScheduler(name)
+        # 聚合窗口对齐到 aggregate_period 的整数倍，错过的窗口会被补齐
+        self.scheduler.every(
+            self.config.aggregate_period,
+            self.aggregate,
+            offset=AGGREGATE_DELAY,
+            pass_boundary=True,
+            catch_up=10,
+            name=f"{name}:aggregate",
+        )
+        self.scheduler.every(self.config.clean_period, self.clean, name=f"{name}:clean")
+
+    def apply_updates(self) -> bool:
+        """应用主进程下发的配置更新，返回是否有更新"""
+        if self.control_queue is None:
+            return False
+
+        changes = {}
+        while True:
+            try:
+                changes.update(self.control_queue.get_nowait())
+            except queue.Empty:
+                break
+        changes = {k: v for k, v in changes.items() if k in LIVE_UPDATE_FIELDS and getattr(self.config, k) != v}
+        if not changes:
+            return False
+
+        for key, value in changes.items():
+            setattr(self.config, key, value)
+        if self.scheduler is not None and ("aggregate_period" in changes or "clean_period" in changes):
+            self._schedule_jobs()
+        logger.info(f"[{self.config.name}] Config updated: {changes}")
+        return True
+
+    def step(self):
+        """执行一次采集并运行到期的定时任务"""
+        self.apply_updates()
+        self.process()
+        assert self.scheduler is not None
+        self.scheduler.run_pending()
+
+    def restart(self):
+        """重新建立连接并清零错误计数（不重新初始化数据库）"""
+        self.disconnect()
+        self._error_count = 0
+        self.start()
+
+    def close(self):
+        """设备被移除或替换时调用：结束该设备的告警与故障检测状态并断开连接"""
+        if self.fault_detector is not None:
+            self.fault_detector.remove_device(self.config.name)
+            self.fault_detector = None
+        self.disconnect()
+
+    def run(self):
+        self.start()
+
+        # 按对齐的固定频率采集，采集耗时不计入间隔
+        ticker = Ticker(self.config.poll_interval, name=f"{self.config.name}:poll")
         while self._connected:
-            self.process()
-            self.scheduler.run_pending()
+            self.step()
 
-            time.sleep(self.config.poll_interval)
+            ticker.set_interval(self.config.poll_interval)
+            ticker.wait()
+            self.stats.skipped_ticks = ticker.skipped
 
     def handle_error(self, error: Exception):
         """错误处理"""
         logger.error(f"[{self.config.name}] Unexpected error: {error}")
+        self._last_error = str(error) or repr(error)
         self._error_count += 1
+        self.stats.errors += 1
         if self._error_count >= self.config.retries:
             self.disconnect()
             logger.error(f"[{self.config.name}] Disconnected due to persistent errors")
@@ -2,36 +2,152 @@ import schedule
 import os
 import json
 from loguru import logger
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Set
 from multiprocessing import Process
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import shlex
 import sys
+import time
+import queue
 import select
+import functools
+import sqlite3
+import multiprocessing as mp
 
-from contrail.gpu.framework import DeviceConfig
+from contrail.gpu.framework import BaseDeviceConnector, DeviceConfig, LIVE_UPDATE_FIELDS
 from contrail.gpu.connector.local import LocalDeviceConnector
 from contrail.gpu.connector.socket import SocketDeviceConnector
 from contrail.gpu.connector.ssh import SSHDeviceConnector
+from contrail.gpu.connector.ssh_pool import run_ssh_fanout
+from contrail.gpu.runtime import run_async_runtime
+from contrail.gpu.writer import WriterConfig, create_writer_queue, run_database_writer
+from contrail.gpu.supervisor import RestartPolicy, Supervisor, run_connector
+from contrail.gpu.control import ControlServer
+from contrail.gpu.GPU_alert_store import AlertStore
+from contrail.gpu.stats import process_rss
 from contrail.utils.email_sender import EmailSender, EmailTemplate
 
 
+CONNECTOR_TYPES = {"local": LocalDeviceConnector, "socket": SocketDeviceConnector, "ssh": SSHDeviceConnector}
+
+
+def create_connector(
+    config: DeviceConfig,
+    status_queue=None,
+    control_queue=None,
+    writer_queue=None,
+    writer_put_timeout: float = 5.0,
+    email_config: Optional[str] = None,
+) -> BaseDeviceConnector:
+    """
+    创建设备连接器
+
+    共享进程组在子进程内通过该函数创建新加入的设备，此时 control_queue 为进程内的队列
+    """
+    connector = CONNECTOR_TYPES[config.type](config)
+    connector.status_queue = status_queue
+    connector.control_queue = control_queue if control_queue is not None else queue.Queue()
+    if email_config:
+        connector.email_config = email_config
+    if writer_queue is not None:
+        connector.attach_writer(writer_queue, writer_put_timeout)
+    return connector
+
+
 @dataclass
 class ManagerConfig:
     reload_interval: int = 0  # 0 表示不自动重载
     db_path: str = "data"
     log_path: str = "log"
+    ssh_fanout: bool = False  # 所有 ssh 设备在同一进程内并发轮询
+    ssh_max_workers: int = 8
+    runtime: str = "process"  # process: 每个设备一个进程 / async: 少量进程内以事件循环驱动所有设备
+    runtime_workers: int = 1
+    runtime_threads: int = 32
+    writer_service: bool = False  # 由单独的写入进程批量写入所有设备的实时数据
+    writer_queue_size: int = 1024
+    writer_batch_size: int = 256
+    writer_flush_interval: float = 0.5
+    writer_put_timeout: float = 5.0
+    restart_enabled: bool = True  # 异常退出的设备按指数退避自动重启
+    restart_base_delay: float = 1.0
+    restart_max_delay: float = 60.0
+    restart_max_attempts: int = 10  # 0 表示不限
+    restart_reset_after: float = 300.0
+    email_config: str = "config/email_config.json"
+    fault_rules: Optional[str] = None  # 设备未指定 fault_rules 时使用的规则文件
+    control_host: str = "127.0.0.1"
+    control_port: int = 0  # 本地控制接口端口，0 表示不启用
+    control_token: str = "data/control_token"  # 控制接口的令牌文件，不存在时自动生成
+
+    @property
+    def restart_policy(self) -> RestartPolicy:
+        return RestartPolicy(
+            enabled=self.restart_enabled,
+            base_delay=self.restart_base_delay,
+            max_delay=self.restart_max_delay,
+            max_attempts=self.restart_max_attempts,
+            reset_after=self.restart_reset_after,
+        )
+
+    @property
+    def writer(self) -> WriterConfig:
+        return WriterConfig(
+            queue_size=self.writer_queue_size,
+            batch_size=self.writer_batch_size,
+            flush_interval=self.writer_flush_interval,
+            put_timeout=self.writer_put_timeout,
+        )
+
+
+@dataclass
+class DeviceChanges:
+    """一次重载配置产生的设备变更"""
+
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)  # 仅调整了间隔等参数，已在运行中生效
+    restarted: List[str] = field(default_factory=list)  # 连接参数变化，需要重启（共享进程组内只重建该设备）
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def to_start(self) -> List[str]:
+        return self.added + self.restarted
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.restarted or self.removed)
+
+    def as_dict(self) -> dict:
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "restarted": self.restarted,
+            "removed": self.removed,
+        }
 
 
 class DeviceManager:
     """总控端设备管理器"""
 
     def __init__(self, email_sender: Optional[EmailSender] = None):
-        self.connected_devices: Dict[str, Dict] = {}  # 设备名称 -> {connector, process}
+        self.connected_devices: Dict[str, Dict] = {}  # 设备名称 -> {connector, process, group}
+        self.groups: Dict[str, Optional[Process]] = {}  # 共享进程组名称 -> 进程
+        self.group_queues: Dict[str, mp.Queue] = {}  # 共享进程组名称 -> 设备变更队列
+        self.writer_groups: Set[str] = set()  # 在组内以写入队列创建新设备的共享进程组
         self.email_sender = email_sender
         self._config_path = "config/host_config.json"
         self.config = ManagerConfig()
         self.reload_scheduler = None
+        self.writer_queue = None
+        self.writer_process: Optional[Process] = None
+        # 子进程通过 status_queue 报告设备的失败与重启
+        self.status_queue = mp.Queue()
+        self.supervisor = Supervisor(self.config.restart_policy)
+        # 子进程定期报告的运行统计
+        self.device_stats: Dict[str, dict] = {}
+        self.writer_stats: Optional[dict] = None
+        self.control: Optional[ControlServer] = None
+        self._started_at = time.time()
+        self._exit_requested = False
 
     def add_device(self, config: DeviceConfig):
         """添加设备并初始化连接器"""
@@ -39,14 +155,41 @@ class DeviceManager:
             logger.warning(f"Device {config.name} already connected")
             return
 
-        connector_map = {"local": LocalDeviceConnector, "socket": SocketDeviceConnector, "ssh": SSHDeviceConnector}
-
-        connector = connector_map[config.type](config)
-        self.connected_devices[config.name] = {"connector": connector, "process": None}  # 进程将在 monitor() 中初始化
+        if self.config.writer_service and self.writer_queue is None:
+            self.writer_queue = create_writer_queue(self.config.writer)
+        connector = create_connector(config, control_queue=mp.Queue(), **self._connector_options())
+        group = self._assign_group(config)
+        process = self.groups.get(group) if group else None
+        # 独立进程将在 monitor() 中初始化；运行中的共享进程组直接在组内添加该设备
+        self.connected_devices[config.name] = {"connector": connector, "process": process, "group": group}
+        if group:
+            self._send_group(group, "add", config)
         logger.info(f"Added device: {config.name} ({config.type})")
 
-    def remove_device(self, name: str):
-        """安全移除设备"""
+    def _connector_options(self) -> dict:
+        """除 control_queue 外创建连接器所需的参数"""
+        return {
+            "status_queue": self.status_queue,
+            "writer_queue": self.writer_queue if self.config.writer_service else None,
+            "writer_put_timeout": self.config.writer_put_timeout,
+            "email_config": self.config.email_config,
+        }
+
+    def _send_group(self, group: str, *message) -> bool:
+        """向运行中的共享进程组下发设备变更，进程组未运行时返回 False（重启时将使用最新的设备列表）"""
+        process = self.groups.get(group)
+        if process is None or not process.is_alive():
+            return False
+        self.group_queues[group].put(message)
+        return True
+
+    def remove_device(self, name: str, close_alerts: bool = True):
+        """
+        安全移除设备
+
+        共享进程组中的设备通过变更队列从组内移除，不影响组内其他设备；
+        close_alerts 为 False 时保留其活跃告警（退出时，重启后恢复）
+        """
         if name not in self.connected_devices:
             logger.warning(f"Device {name} not found")
             return
@@ -54,51 +197,222 @@ class DeviceManager:
         device = self.connected_devices[name]
         process = device["process"]
         connector = device["connector"]
+        group = device["group"]
 
         # 断开连接
         if connector:
             connector.disconnect()
             logger.info(f"Disconnected {name}")
 
-        # 终止进程
+        # 移除记录
+        del self.connected_devices[name]
+        self.supervisor.forget(name)
+        self.device_stats.pop(name, None)
+
+        if group:
+            if self.group_members(group):
+                self._send_group(group, "remove", name)
+            else:
+                # 组内已无设备：终止进程组
+                self._terminate(self.groups.pop(group, None), f"group {group}")
+                self.group_queues.pop(group, None)
+                self.writer_groups.discard(group)
+                self.supervisor.forget(f"group:{group}")
+        else:
+            # 终止进程
+            self._terminate(process, name)
+        if close_alerts:
+            self._close_alerts(connector.config)
+        logger.info(f"Removed device {name}")
+
+    @staticmethod
+    def _close_alerts(config: DeviceConfig):
+        """
+        结束被移除或替换的设备在告警记录中的活跃告警
+
+        独立进程被直接终止，无法自行处理；共享进程组内的设备还会由组内的故障检测清除其状态
+        """
+        if not config.fault_detection:
+            return
+        try:
+            closed = AlertStore(f"{config.db_path}/alerts.db").close_device(config.name)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to close alerts of {config.name}: {e}")
+            return
+        if closed:
+            logger.info(f"Closed {closed} active alert(s) of {config.name}")
+
+    def update_device(self, config: DeviceConfig, changes: DeviceChanges):
+        """
+        将已有设备更新为新配置
+
+        仅 LIVE_UPDATE_FIELDS 变化时通过 control_queue 下发给运行中的连接器，不中断采集；
+        其余字段变化时重建连接器：共享进程组内的设备保持原有分组，仅在组内替换该设备的连接器，
+        独立进程的重启由调用方完成
+        """
+        device = self.connected_devices[config.name]
+        connector = device["connector"]
+        diff = connector.config.diff(config)
+        if not diff:
+            return
+
+        if set(diff) <= set(LIVE_UPDATE_FIELDS):
+            # 主进程中的配置同步更新，之后重启进程时沿用新配置
+            connector.config = config
+            # 共享进程组内新加入的设备在子进程中创建，只能通过进程组的变更队列下发
+            if not (device["group"] and self._send_group(device["group"], "update", config.name, diff)):
+                connector.control_queue.put(diff)
+            changes.updated.append(config.name)
+            logger.info(f"Updated device {config.name} in place: {diff}")
+            return
+
+        logger.info(f"Device {config.name} changed ({sorted(diff)}), restarting")
+        group = device["group"]
+        if group and self._assign_group(config, group) == group:
+            connector.disconnect()
+            device["connector"] = create_connector(config, control_queue=mp.Queue(), **self._connector_options())
+            self.supervisor.forget(config.name)
+            self.device_stats.pop(config.name, None)
+            self._send_group(group, "replace", config)
+            self._close_alerts(connector.config)
+        else:
+            self.remove_device(config.name)
+            self.add_device(config)
+        changes.restarted.append(config.name)
+
+    @staticmethod
+    def _terminate(process: Optional[Process], name: str):
+        """终止进程"""
         if process and process.is_alive():
             logger.info(f"Terminating process for {name} (pid={process.pid})")
             process.terminate()
             process.join(timeout=3)
             if process.is_alive():
-                logger.error(f"Failed to terminate process for {name}")
+                logger.error(f"Failed to terminate process for {name}, pid={process.pid}")
             else:
                 logger.info(f"Process for {name} terminated")
 
-        # 移除记录
-        del self.connected_devices[name]
-        logger.info(f"Removed device {name}")
+    def _assign_group(self, config: DeviceConfig, current: Optional[str] = None) -> Optional[str]:
+        """确定设备所属的共享进程组，None 表示独立进程；current 为设备当前所在的组，仍然有效时保持不变"""
+        if self.config.runtime == "async":
+            groups = [f"runtime-{i}" for i in range(max(1, self.config.runtime_workers))]
+            if current in groups:
+                return current
+            # 分配到设备数最少的 worker
+            return min(groups, key=lambda g: len(self.group_members(g)))
+        if config.type == "ssh" and self.config.ssh_fanout:
+            return "ssh"
+        return None
+
+    def group_members(self, group: str) -> list:
+        return [name for name, device in self.connected_devices.items() if device["group"] == group]
+
+    def start_group(self, group: str):
+        """（重新）启动共享进程组"""
+        self._terminate(self.groups.get(group), f"group {group}")
+
+        members = self.group_members(group)
+        if not members:
+            self.groups.pop(group, None)
+            self.group_queues.pop(group, None)
+            self.writer_groups.discard(group)
+            return
+
+        connectors = [self.connected_devices[name]["connector"] for name in members]
+        policy = self.config.restart_policy
+        # 每次启动使用新的变更队列：新进程已包含当前全部设备，旧队列中未处理的变更不再需要
+        group_queue = mp.Queue()
+        factory = functools.partial(create_connector, **self._connector_options())
+        if group.startswith("runtime-"):
+            args = (connectors, self.config.runtime_threads, policy, self.status_queue, group_queue, factory)
+            p = Process(target=run_async_runtime, args=args)
+        else:
+            args = (connectors, self.config.ssh_max_workers, policy, self.status_queue, group_queue, factory)
+            p = Process(target=run_ssh_fanout, args=args)
+        p.daemon = True
+        p.start()
+
+        self.groups[group] = p
+        self.group_queues[group] = group_queue
+        if factory.keywords["writer_queue"] is not None:
+            self.writer_groups.add(group)
+        else:
+            self.writer_groups.discard(group)
+        for name in members:
+            self.connected_devices[name]["process"] = p
+        logger.info(f"Started group process {group} for {members} (pid={p.pid})")
 
     def create_process(self, name):
         """创建进程"""
         device = self.connected_devices[name]
         connector = device["connector"]
 
+        if device["group"]:
+            self.start_group(device["group"])
+            return
+
         # 终止旧进程
-        if device["process"] and device["process"].is_alive():
-            logger.info(f"Terminating old process for {name} (pid={device['process'].pid})")
-            device["process"].terminate()
-            device["process"].join(timeout=3)
-            if device["process"].is_alive():
-                logger.error(f"Failed to terminate old process for {name}, pid={device['process'].pid}")
-            else:
-                logger.info(f"Old process for {name} terminated")
+        self._terminate(device["process"], name)
 
         # 创建新进程
-        p = Process(target=connector.run)
+        p = Process(target=run_connector, args=(connector, self.status_queue))
         p.daemon = True
         p.start()
 
         device["process"] = p
         logger.info(f"Started monitoring process for {name} (pid={p.pid})")
 
-    def process_command(self, command_str: str):
-        """处理命令"""
+    def start_writer(self):
+        """启动（或重启）数据库写入进程"""
+        if self.writer_queue is None:
+            return
+        self._terminate(self.writer_process, "database writer")
+
+        p = Process(target=run_database_writer, args=(self.writer_queue, self.config.writer, self.status_queue))
+        p.daemon = True
+        p.start()
+
+        self.writer_process = p
+        logger.info(f"Started database writer process (pid={p.pid})")
+
+    def stop_writer(self):
+        """通知写入进程写完剩余数据后退出"""
+        if self.writer_process is None:
+            return
+        if self.writer_process.is_alive():
+            assert self.writer_queue is not None
+            self.writer_queue.put(None)
+            self.writer_process.join(timeout=10)
+        self._terminate(self.writer_process, "database writer")
+        self.writer_process = None
+
+    def sync_writer(self):
+        """
+        按 writer_service 启动或停止写入进程
+
+        关闭 writer_service 后，尚未重启的设备仍挂载在写入队列上，
+        写入进程在最后一个此类设备（及以写入队列启动的共享进程组）重启或移除后才停止
+        """
+        if self.config.writer_service:
+            if self.writer_queue is None:
+                self.writer_queue = create_writer_queue(self.config.writer)
+            if self.writer_process is None:
+                self.start_writer()
+            return
+
+        if self.writer_queue is None:
+            return
+        if self.writer_groups or any(
+            device["connector"].writer_queue is not None for device in self.connected_devices.values()
+        ):
+            return
+        logger.info("writer_service disabled, stopping database writer")
+        self.stop_writer()
+        self.writer_queue = None
+        self.writer_stats = None
+
+    def process_command(self, command_str: str) -> dict:
+        """处理命令（来自 stdin 或本地控制接口），返回结果"""
         parts = shlex.split(command_str)
         command = parts[0]
         if command == "reload":
@@ -108,74 +422,119 @@ class DeviceManager:
                     config_path = os.path.expanduser(parts[1])
                     if os.path.exists(config_path):
                         logger.info(f"Reloading config from {config_path}...")
-                        device_added = self.load_config(config_path)
+                        changes = self.load_config(config_path)
                     else:
                         logger.warning(f"Config file {config_path} does not exist")
-                        device_added = []
+                        return {"error": f"config file {config_path} does not exist"}
                 else:
-                    device_added = self.load_devices()
+                    changes = self.load_devices()
 
-                for name in device_added:
-                    self.create_process(name)
+                self.create_processes(changes.to_start)
+                return changes.as_dict()
             except Exception as e:
                 logger.error(f"Failed to reload config: {e}")
+                return {"error": f"failed to reload config: {e}"}
         elif command == "exit":
             logger.info("Received exit command, cleaning up and exiting...")
-            for name in list(self.connected_devices.keys()):
-                self.remove_device(name)
-            sys.exit(0)
+            self._exit_requested = True
+            return {"status": "exiting"}
         elif command == "list":
             logger.info("Connected devices:")
-            for name in self.connected_devices.keys():
-                logger.info(f" - {name}")
+            result = {}
+            for name, device in self.connected_devices.items():
+                state = self.supervisor.states.get(name)
+                group = f" [{device['group']}]" if device["group"] else ""
+                restarts = f" restarts={state.restart_count}, last_error={state.last_error}" if state else ""
+                logger.info(f" - {name}{group}{restarts}")
+                result[name] = {"type": device["connector"].config.type, "group": device["group"]}
+            return {"devices": result}
+        elif command == "stats":
+            stats = self.collect_stats()
+            for name, device in stats["devices"].items():
+                poll = device.get("poll_latency_ms") or {}
+                logger.info(
+                    f" - {name}: alive={device['alive']}, samples/s={device.get('samples_per_sec', 0):.2f}, "
+                    f"poll p95={poll.get('p95')}ms, errors={device.get('errors', 0)}, "
+                    f"last_seen_age={device.get('last_seen_age')}"
+                )
+            return stats
         elif command == "remove" and len(parts) == 2:
             # 移除指定设备
             name = parts[1]
             if name in self.connected_devices:
                 self.remove_device(name)
+                return {"removed": name}
             else:
                 logger.warning(f"Device {name} not found")
+                return {"error": f"device {name} not found"}
         else:
             logger.warning(f"Unknown command: {command_str}")
+            return {"error": f"unknown command: {command_str}"}
+
+    def collect_stats(self) -> dict:
+        """汇总所有设备的运行统计"""
+        self._drain_status()
+        now = time.time()
+
+        devices = {}
+        for name, device in self.connected_devices.items():
+            process = device["process"]
+            state = self.supervisor.states.get(name)
+            stats = dict(self.device_stats.get(name, {}))
+            if stats.get("last_seen"):
+                stats["last_seen_age"] = round(now - stats["last_seen"], 1)
+            devices[name] = {
+                "type": device["connector"].config.type,
+                "group": device["group"],
+                "alive": bool(process and process.is_alive()),
+                **stats,
+                "restart": state.as_dict() if state else None,
+            }
+
+        return {
+            "manager": {"pid": os.getpid(), "rss": process_rss(), "uptime": round(now - self._started_at, 1)},
+            "writer": self.writer_stats,
+            "devices": devices,
+        }
 
     def monitor(self):
         """启动所有设备的监控进程，并监听 stdin 输入"""
         logger.info("Starting monitoring loop")
 
-        # 初始化所有设备的监控进程
-        for name in list(self.connected_devices.keys()):
-            device = self.connected_devices[name]
-            connector = device["connector"]
-
-            p = Process(target=connector.run)
-            p.daemon = True
-            p.start()
+        if self.config.control_port:
+            self.control = ControlServer(
+                self.config.control_host, self.config.control_port, token_path=self.config.control_token
+            )
+            if not self.control.start():
+                self.control = None
 
-            device["process"] = p
-            logger.info(f"Started monitoring process for {name} (pid={p.pid})")
+        # 初始化所有设备的监控进程
+        self.create_processes(list(self.connected_devices.keys()))
 
         try:
             while True:
+                self.sync_writer()
+                if self.writer_process and not self.writer_process.is_alive():
+                    logger.error("Database writer terminates unexpectedly, restarting")
+                    self.start_writer()
+
                 # 检查设备状态
-                for name in list(self.connected_devices.keys()):
-                    device = self.connected_devices.get(name)
-                    if not device:
-                        continue
-
-                    process = device["process"]
-                    if process and not process.is_alive():
-                        logger.error(f"Process for {name} terminates unexpectedly")
-                        # self.send_alert(f"Device {name} terminates unexpectedly")
-                        self.remove_device(name)  # 自动清理异常设备
-
-                # 检查 stdin 输入
-                rlist, _, _ = select.select([sys.stdin], [], [], 2)
-                if rlist:
+                self.supervise()
+
+                # 检查 stdin 输入与控制接口的请求
+                inputs = [sys.stdin] + ([self.control] if self.control else [])
+                rlist, _, _ = select.select(inputs, [], [], 2)
+                if sys.stdin in rlist:
                     cmd = sys.stdin.readline().strip()
                     if cmd:
                         self.process_command(cmd)
+                if self.control and self.control in rlist:
+                    self.control.handle_pending(self.process_command)
                 # 如果没有输入，2秒后继续循环
 
+                if self._exit_requested:
+                    break
+
                 if self.reload_scheduler:
                     schedule.run_pending()
 
@@ -185,10 +544,86 @@ class DeviceManager:
             logger.error(f"Monitoring error: {str(e)}")
         finally:
             # 清理所有设备
-            for name in list(self.connected_devices.keys()):
-                self.remove_device(name)
+            self.shutdown()
+            if self.control:
+                self.control.close()
+                self.control = None
             logger.info("Monitoring stopped")
 
+    def _drain_status(self):
+        """读取子进程报告的设备事件"""
+        while True:
+            try:
+                key, event, payload = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event == "stats":
+                if key == "writer":
+                    self.writer_stats = payload
+                else:
+                    self.device_stats[key] = payload
+            else:
+                self.supervisor.apply_report(key, event, payload)
+                device = self.connected_devices.get(key)
+                if event == "gave_up" and device and device["group"]:
+                    # 共享进程组已放弃并移除该设备，与独立进程一致，从设备列表中移除
+                    logger.error(f"Device {key} gave up in group {device['group']} (last error: {payload})")
+                    self.remove_device(key)
+
+    def supervise(self):
+        """检查进程状态，按退避策略重启异常退出的设备或进程组"""
+        self._drain_status()
+
+        # 共享进程组
+        for group, process in list(self.groups.items()):
+            key = f"group:{group}"
+            if process is None:
+                continue
+            if process.is_alive():
+                self.supervisor.on_healthy(key)
+            elif self.supervisor.due(key):
+                self.start_group(group)
+                self.supervisor.on_restart(key)
+            elif not self.supervisor.pending(key):
+                logger.error(f"Group process {group} terminates unexpectedly (exitcode={process.exitcode})")
+                if not self.supervisor.on_failure(key, f"exitcode {process.exitcode}"):
+                    # 放弃重启：自动清理该组内的设备
+                    self.groups.pop(group, None)
+                    for name in self.group_members(group):
+                        self.remove_device(name)
+                    self.supervisor.forget(key)
+
+        # 独立进程的设备
+        for name in list(self.connected_devices.keys()):
+            device = self.connected_devices.get(name)
+            if not device or device["group"]:
+                continue
+
+            process = device["process"]
+            if process is None:
+                continue
+            if process.is_alive():
+                self.supervisor.on_healthy(name)
+            elif self.supervisor.due(name):
+                self.create_process(name)
+                self.supervisor.on_restart(name)
+            elif not self.supervisor.pending(name):
+                logger.error(f"Process for {name} terminates unexpectedly (exitcode={process.exitcode})")
+                # self.send_alert(f"Device {name} terminates unexpectedly")
+                if not self.supervisor.on_failure(name):
+                    self.remove_device(name)  # 放弃重启：自动清理异常设备
+
+    def shutdown(self):
+        """终止所有进程并移除所有设备"""
+        for group, process in list(self.groups.items()):
+            self._terminate(process, f"group {group}")
+        self.groups.clear()
+        self.group_queues.clear()
+        self.writer_groups.clear()
+        for name in list(self.connected_devices.keys()):
+            self.remove_device(name, close_alerts=False)
+        self.stop_writer()
+
     def send_alert(self, message: str):
         """发送警报通知"""
         if self.email_sender:
@@ -206,7 +641,8 @@ class DeviceManager:
 
                 if new_config != self.config:
                     self.config = new_config
-                    logger.warning(f"Manager config updated: pre-existing devices will not be affected")
+                    self.supervisor.policy = self.config.restart_policy
+                    logger.warning(f"Manager config updated: process layout changes apply to restarted devices only")
 
                     if self.reload_scheduler:
                         schedule.clear(self.reload_scheduler)
@@ -223,35 +659,64 @@ class DeviceManager:
 
         return self.load_devices()
 
-    def load_devices(self, log=True):
-        """加载配置文件"""
-        device_added = []
+    def load_devices(self, log=True) -> DeviceChanges:
+        """
+        加载配置文件，与当前运行的设备比较并应用差异
+
+        新设备将被添加，删除的设备将被移除，配置变化的设备按 update_device() 更新；
+        运行中的共享进程组通过变更队列在组内增删设备，返回的 DeviceChanges 中 to_start 需要由 create_processes() 启动
+        """
+        changes = DeviceChanges()
+        configs: Dict[str, DeviceConfig] = {}
 
         with open(self._config_path, "r") as f:
             config = json.load(f)
             config["monitor"].pop("config", None)
 
             for _, conf in config["monitor"].items():
-                conf = {"db_path": self.config.db_path} | conf
-                if conf["name"] not in self.connected_devices:
-                    self.add_device(DeviceConfig(**conf))
-                    device_added.append(conf["name"])
+                conf = {"db_path": self.config.db_path, "fault_rules": self.config.fault_rules} | conf
+                configs[conf["name"]] = DeviceConfig(**conf)
+
+        for name in list(self.connected_devices.keys()):
+            if name not in configs:
+                self.remove_device(name)
+                changes.removed.append(name)
+
+        for name, device_config in configs.items():
+            if name not in self.connected_devices:
+                self.add_device(device_config)
+                changes.added.append(name)
+            else:
+                self.update_device(device_config, changes)
 
-        if device_added:
-            logger.info(f"Loaded config from {self._config_path}, added devices: {device_added}")
+        if changes:
+            logger.info(f"Loaded config from {self._config_path}, changes: {changes.as_dict()}")
         elif log:
-            logger.info("No new devices added from config")
+            logger.info("No device changes from config")
         else:
-            logger.trace("No new devices added from config")
+            logger.trace("No device changes from config")
 
-        return device_added
+        return changes
 
     def reload_job(self):
         """自动重载设备并创建进程"""
         logger.trace("Auto reloading devices...")
-        device_added = self.load_devices(log=False)
-        for name in device_added:
-            self.create_process(name)
+        changes = self.load_devices(log=False)
+        self.create_processes(changes.to_start)
+
+    def create_processes(self, names: list):
+        """为多个设备创建进程，同一进程组只启动一次，已在运行的进程组不重启"""
+        # 写入进程需先于采集进程启动（重载配置时可能刚启用 writer_service）
+        self.sync_writer()
+        groups = set()
+        for name in names:
+            group = self.connected_devices[name]["group"]
+            if not group:
+                self.create_process(name)
+            elif not (self.groups.get(group) and self.groups[group].is_alive()):
+                groups.add(group)
+        for group in groups:
+            self.start_group(group)
 
 
 # 使用示例
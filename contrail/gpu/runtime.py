@@ -0,0 +1,173 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+from contrail.gpu.framework import BaseDeviceConnector, DeviceConfig
+from contrail.gpu.supervisor import RestartPolicy, Supervisor, read_group_messages
+from contrail.utils.scheduler import Ticker
+
+
+class AsyncDeviceRuntime:
+    """
+    单个事件循环驱动多个设备连接器
+
+    所有设备共享同一个时钟：每个 tick 检查到期的设备并为其创建轮询任务，
+    单个设备的异常只影响其自身的任务，断开的设备按退避策略在进程内重连；
+    主进程通过 group_queue 增删或替换设备，由 factory 在进程内创建新的连接器
+    """
+
+    def __init__(
+        self,
+        connectors: List[BaseDeviceConnector],
+        max_threads: int = 32,
+        policy: Optional[RestartPolicy] = None,
+        status_queue=None,
+        group_queue=None,
+        factory: Optional[Callable[[DeviceConfig], BaseDeviceConnector]] = None,
+    ):
+        self.connectors = {c.config.name: c for c in connectors}
+        self.max_threads = max(1, max_threads)
+        self.supervisor = Supervisor(policy, status_queue)
+        self.group_queue = group_queue
+        self.factory = factory
+        self._update_tick()
+        self._tickers: Dict[str, Ticker] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _update_tick(self):
+        intervals = [c.config.poll_interval for c in self.connectors.values()] or [1.0]
+        self.tick = max(0.05, min(intervals) / 2)
+
+    async def _start_device(self, name: str):
+        """建立连接（可能阻塞，例如 socket 等待 accept）"""
+        connector = self.connectors[name]
+        try:
+            await asyncio.to_thread(connector.start)
+        except Exception as e:
+            logger.error(f"[{name}] Failed to start in async runtime")
+            connector.handle_error(e)
+        self._tickers[name] = Ticker(connector.config.poll_interval, name=f"{name}:poll")
+        self._tickers[name].reset(immediate=True)
+
+    async def _restart_device(self, name: str):
+        connector = self.connectors[name]
+        try:
+            await asyncio.to_thread(connector.restart)
+        except Exception as e:
+            logger.error(f"[{name}] Failed to restart in async runtime")
+            connector.handle_error(e)
+        self.supervisor.on_restart(name)
+        self._tickers[name].reset(immediate=True)
+
+    async def _poll_device(self, name: str):
+        connector = self.connectors[name]
+        if connector.apply_updates():
+            self._update_tick()
+        await connector.aprocess()
+        if connector.scheduler is not None:
+            # 聚合与清理涉及数据库读写，放在线程池中执行
+            await asyncio.to_thread(connector.scheduler.run_pending)
+
+    def _add_device(self, config: DeviceConfig):
+        assert self.factory is not None
+        self.connectors[config.name] = self.factory(config)
+        self._update_tick()
+        self._spawn(config.name, self._start_device(config.name))
+        logger.info(f"[{config.name}] Added to async runtime")
+
+    def _remove_device(self, name: str):
+        connector = self.connectors.pop(name, None)
+        if connector is None:
+            return
+        self._tickers.pop(name, None)
+        self.supervisor.forget(name)
+        self._update_tick()
+        # 线程池中的采集无法被取消，等待进行中的轮询结束后再关闭，避免其在关闭后继续提交故障检测；
+        # 断开连接可能阻塞，不等待其完成
+        loop = asyncio.get_running_loop()
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.add_done_callback(lambda _: loop.run_in_executor(None, connector.close))
+        else:
+            loop.run_in_executor(None, connector.close)
+        logger.info(f"[{name}] Removed from async runtime")
+
+    def _apply_group_messages(self):
+        """应用主进程下发的设备变更，不影响组内其他设备"""
+        for message in read_group_messages(self.group_queue):
+            action = message[0]
+            if action == "add":
+                self._add_device(message[1])
+            elif action == "replace":
+                self._remove_device(message[1].name)
+                self._add_device(message[1])
+            elif action == "remove":
+                self._remove_device(message[1])
+            elif action == "update" and message[1] in self.connectors:
+                self.connectors[message[1]].control_queue.put(message[2])
+
+    def _on_task_done(self, name: str, task: asyncio.Task):
+        # 已移除（或被替换）的设备的旧任务结束时，不应影响新任务与新的连接器
+        if self._tasks.get(name) is not task:
+            return
+        del self._tasks[name]
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None and name in self.connectors:
+            logger.error(f"[{name}] Poll task failed: {exc}")
+            self.connectors[name].handle_error(exc)  # type: ignore[arg-type]
+
+    def _spawn(self, name: str, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=f"device-{name}")
+        self._tasks[name] = task
+        task.add_done_callback(lambda t, n=name: self._on_task_done(n, t))
+        return task
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="device-io"))
+
+        logger.info(f"Starting async runtime for {list(self.connectors)} (tick={self.tick:.2f}s)")
+        for name in self.connectors:
+            self._spawn(name, self._start_device(name))
+
+        while self.connectors:
+            self._apply_group_messages()
+            for name, connector in list(self.connectors.items()):
+                if name in self._tasks or name not in self._tickers:
+                    continue
+                if not connector._connected:
+                    if self.supervisor.due(name):
+                        self._spawn(name, self._restart_device(name))
+                    elif not self.supervisor.pending(name):
+                        if not self.supervisor.on_failure(name, connector._last_error):
+                            logger.error(f"[{name}] disconnected, removed from async runtime")
+                            self._remove_device(name)
+                    continue
+                self.supervisor.on_healthy(name)
+                ticker = self._tickers[name]
+                ticker.set_interval(connector.config.poll_interval)
+                if not ticker.due:
+                    continue
+
+                _, missed = ticker.advance()
+                connector.stats.skipped_ticks += missed
+                self._spawn(name, self._poll_device(name))
+
+            await asyncio.sleep(self.tick)
+
+        logger.error("All devices in async runtime disconnected")
+
+
+def run_async_runtime(
+    connectors: List[BaseDeviceConnector],
+    max_threads: int = 32,
+    policy: Optional[RestartPolicy] = None,
+    status_queue=None,
+    group_queue=None,
+    factory: Optional[Callable[[DeviceConfig], BaseDeviceConnector]] = None,
+):
+    """异步运行时进程入口"""
+    asyncio.run(AsyncDeviceRuntime(connectors, max_threads, policy, status_queue, group_queue, factory).run())
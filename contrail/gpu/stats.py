@@ -0,0 +1,100 @@
+import os
+import time
+import bisect
+import psutil
+from typing import List, Optional
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（毫秒）"""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """以桶上界近似分位数"""
+        if not self.count:
+            return None
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "avg": self.total_ms / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max_ms,
+            "buckets": {label: c for label, c in zip(labels, self.counts) if c},
+        }
+
+
+def process_rss() -> int:
+    """当前进程的常驻内存（字节）"""
+    try:
+        return psutil.Process(os.getpid()).memory_info().rss
+    except psutil.Error:
+        return -1
+
+
+class ConnectorStats:
+    """
+    设备连接器的运行统计
+
+    在采集进程内累计，按 report_interval 通过 status_queue 发送快照给主进程
+    """
+
+    def __init__(self, report_interval: float = 5.0):
+        self.report_interval = report_interval
+        self.poll_latency = LatencyHistogram()
+        self.write_latency = LatencyHistogram()
+        self.samples = 0
+        self.errors = 0
+        self.skipped_ticks = 0  # 采集耗时超过间隔而跳过的 tick
+        self.last_seen: Optional[float] = None
+        self._last_report = time.monotonic()
+        self._last_samples = 0
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        elapsed = max(1e-6, now - self._last_report)
+        snap = {
+            "poll_latency_ms": self.poll_latency.snapshot(),
+            "write_latency_ms": self.write_latency.snapshot(),
+            "samples": self.samples,
+            "samples_per_sec": (self.samples - self._last_samples) / elapsed,
+            "errors": self.errors,
+            "skipped_ticks": self.skipped_ticks,
+            "last_seen": self.last_seen,
+            "pid": os.getpid(),
+            "rss": process_rss(),
+        }
+        self._last_report = now
+        self._last_samples = self.samples
+        return snap
+
+    def maybe_report(self, name: str, status_queue) -> None:
+        if status_queue is None or time.monotonic() - self._last_report < self.report_interval:
+            return
+        try:
+            status_queue.put_nowait((name, "stats", self.snapshot()))
+        except Exception:
+            pass
@@ -0,0 +1,158 @@
+import time
+import queue
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+@dataclass
+class RestartPolicy:
+    enabled: bool = True
+    base_delay: float = 1.0  # 首次重启前的等待时间（秒）
+    max_delay: float = 60.0  # 等待时间上限
+    max_attempts: int = 10  # 连续重启次数上限，0 表示不限
+    reset_after: float = 300.0  # 稳定运行超过该时间后清零连续重启次数
+    jitter: float = 0.2  # 随机抖动比例
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次（从 1 开始）重启前的等待时间"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def exhausted(self, attempt: int) -> bool:
+        return not self.enabled or (self.max_attempts > 0 and attempt >= self.max_attempts)
+
+
+@dataclass
+class RestartState:
+    restart_count: int = 0  # 累计重启次数
+    attempt: int = 0  # 连续重启次数
+    last_error: Optional[str] = None
+    last_failure: Optional[float] = None  # time.time()
+    started_at: float = field(default_factory=time.monotonic)
+    next_restart: Optional[float] = None  # time.monotonic()
+    gave_up: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "restart_count": self.restart_count,
+            "attempt": self.attempt,
+            "last_error": self.last_error,
+            "last_failure": self.last_failure,
+            "restart_pending": self.next_restart is not None,
+            "gave_up": self.gave_up,
+        }
+
+
+class Supervisor:
+    """
+    按退避策略管理设备（或进程组）的重启
+
+    on_failure() 记录失败并安排下一次重启，due() 判断是否到达重启时间，
+    on_restart() 在重启后调用；稳定运行 reset_after 秒后由 on_healthy() 清零连续重启次数
+    """
+
+    def __init__(self, policy: Optional[RestartPolicy] = None, status_queue=None):
+        self.policy = policy or RestartPolicy()
+        self.status_queue = status_queue
+        self.states: Dict[str, RestartState] = {}
+
+    def state(self, key: str) -> RestartState:
+        if key not in self.states:
+            self.states[key] = RestartState()
+        return self.states[key]
+
+    def on_failure(self, key: str, error: Optional[str] = None) -> bool:
+        """记录一次失败并安排重启，返回 False 表示放弃重启"""
+        state = self.state(key)
+        if error:
+            state.last_error = error
+        state.last_failure = time.time()
+        self.report(key, "failure", state.last_error)
+
+        if self.policy.exhausted(state.attempt):
+            state.gave_up = True
+            state.next_restart = None
+            # 共享进程组中的设备：通知主进程将其移除，之后 reload 时可重新添加
+            self.report(key, "gave_up", state.last_error)
+            logger.error(f"[{key}] Giving up after {state.attempt} consecutive restarts (last error: {state.last_error})")
+            return False
+
+        state.attempt += 1
+        delay = self.policy.delay(state.attempt)
+        state.next_restart = time.monotonic() + delay
+        logger.warning(f"[{key}] Restarting in {delay:.1f}s (attempt {state.attempt}, last error: {state.last_error})")
+        return True
+
+    def pending(self, key: str) -> bool:
+        state = self.states.get(key)
+        return state is not None and state.next_restart is not None
+
+    def due(self, key: str) -> bool:
+        state = self.states.get(key)
+        return state is not None and state.next_restart is not None and time.monotonic() >= state.next_restart
+
+    def on_restart(self, key: str):
+        state = self.state(key)
+        state.restart_count += 1
+        state.next_restart = None
+        state.started_at = time.monotonic()
+        logger.info(f"[{key}] Restarted (total {state.restart_count})")
+        self.report(key, "restart", None)
+
+    def on_healthy(self, key: str):
+        state = self.states.get(key)
+        if state and state.attempt and time.monotonic() - state.started_at > self.policy.reset_after:
+            state.attempt = 0
+
+    def forget(self, key: str):
+        self.states.pop(key, None)
+
+    def report(self, key: str, event: str, error: Optional[str]):
+        """将设备的失败 / 重启事件报告给主进程"""
+        if self.status_queue is not None:
+            try:
+                self.status_queue.put_nowait((key, event, error))
+            except Exception:
+                pass
+
+    def apply_report(self, key: str, event: str, error: Optional[str]):
+        """主进程：记录子进程报告的事件"""
+        state = self.state(key)
+        if event == "restart":
+            state.restart_count += 1
+        else:
+            state.last_error = error or state.last_error
+            state.last_failure = time.time()
+
+
+def run_connector(connector, status_queue=None):
+    """单设备进程入口：退出前将最后的错误报告给主进程"""
+    try:
+        connector.run()
+    except Exception as e:
+        connector._last_error = repr(e)
+        raise
+    finally:
+        if status_queue is not None and connector._last_error:
+            try:
+                status_queue.put_nowait((connector.config.name, "failure", connector._last_error))
+            except Exception:
+                pass
+
+
+def read_group_messages(group_queue) -> List[tuple]:
+    """
+    读取主进程下发给共享进程组的设备变更
+
+    ("add", config) / ("replace", config) / ("remove", name) / ("update", name, diff)
+    """
+    messages = []
+    if group_queue is None:
+        return messages
+    while True:
+        try:
+            messages.append(group_queue.get_nowait())
+        except queue.Empty:
+            return messages
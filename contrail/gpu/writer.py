@@ -0,0 +1,183 @@
+import time
+import queue
+import sqlite3
+import multiprocessing as mp
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from contrail.gpu.GPU_logger import insert_records
+from contrail.gpu.stats import LatencyHistogram, process_rss
+
+
+@dataclass
+class WriterConfig:
+    queue_size: int = 1024  # 队列容量，写入落后时采集端将阻塞
+    batch_size: int = 256  # 单次提交的最大采样数
+    flush_interval: float = 0.5  # 最长攒批时间（秒）
+    put_timeout: float = 5.0  # 采集端最长阻塞时间，超时则丢弃该次采样
+    report_interval: float = 10.0  # 队列深度与写入延迟的报告间隔
+
+
+# 队列中的一次采样：(db_path, timestamp, gpu_rows, user_rows)
+Sample = Tuple[str, str, List[tuple], List[tuple]]
+
+
+def submit_samples(
+    sample_queue,
+    db_path: str,
+    timestamp: str,
+    records: Tuple[List[tuple], List[tuple]],
+    timeout: float = 5.0,
+) -> bool:
+    """
+    采集端：将一次采样推入写入队列
+
+    队列已满时阻塞至多 timeout 秒（背压），仍无法写入则丢弃并返回 False
+    """
+    try:
+        sample_queue.put((db_path, timestamp, *records), timeout=timeout)
+        return True
+    except queue.Full:
+        logger.warning(f"Writer queue full for {timeout:.1f}s, dropping sample for {db_path}")
+        return False
+
+
+class DatabaseWriter:
+    """
+    独立的数据库写入进程
+
+    从有界队列中读取所有设备的采样，按数据库分批，每个数据库每批只提交一次事务
+    """
+
+    def __init__(self, sample_queue, config: Optional[WriterConfig] = None, status_queue=None):
+        self.queue = sample_queue
+        self.config = config or WriterConfig()
+        self.status_queue = status_queue
+        self._conns: Dict[str, sqlite3.Connection] = {}
+        self._pending: Dict[str, List[Sample]] = {}
+        self._n_pending = 0
+        self._running = True
+
+        # 统计信息
+        self.samples_written = 0
+        self.commits = 0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+        self.max_depth = 0
+        self.write_latency = LatencyHistogram()
+
+    def _connection(self, db_path: str) -> sqlite3.Connection:
+        conn = self._conns.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns[db_path] = conn
+        return conn
+
+    def queue_depth(self) -> int:
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:  # macOS
+            return -1
+
+    def flush(self):
+        """每个数据库一个事务，批量提交所有待写入的采样"""
+        for db_path, samples in self._pending.items():
+            if not samples:
+                continue
+            start = time.perf_counter()
+            conn = self._connection(db_path)
+            try:
+                conn.execute("BEGIN")
+                for _, timestamp, gpu_rows, user_rows in samples:
+                    insert_records(conn, gpu_rows, user_rows, timestamp)
+                conn.commit()
+                self.samples_written += len(samples)
+                self.commits += 1
+            except Exception as e:
+                logger.error(f"Error writing {len(samples)} samples to {db_path}: {e}")
+                conn.rollback()
+                # 连接可能已损坏（例如文件被替换），下次重新建立
+                conn.close()
+                self._conns.pop(db_path, None)
+            elapsed = time.perf_counter() - start
+            self.write_latency.observe(elapsed)
+            self.write_time += elapsed
+            self.max_write_time = max(self.max_write_time, elapsed)
+
+        self._pending.clear()
+        self._n_pending = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_depth,
+            "samples": self.samples_written,
+            "commits": self.commits,
+            "commit_latency_ms": self.write_latency.snapshot(),
+            "rss": process_rss(),
+        }
+
+    def report(self):
+        avg_ms = self.write_time / self.commits * 1000 if self.commits else 0.0
+        logger.info(
+            f"[writer] queue_depth={self.queue_depth()} (max {self.max_depth}), "
+            f"samples={self.samples_written}, commits={self.commits}, "
+            f"write_latency avg={avg_ms:.1f}ms max={self.max_write_time * 1000:.1f}ms"
+        )
+        if self.status_queue is not None:
+            try:
+                self.status_queue.put_nowait(("writer", "stats", self.snapshot()))
+            except Exception:
+                pass
+        self.max_depth = 0
+        self.max_write_time = 0.0
+
+    def run(self):
+        logger.info(f"Database writer started: {self.config}")
+        last_flush = last_report = time.monotonic()
+
+        try:
+            while self._running:
+                timeout = max(0.0, self.config.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self.queue.get(timeout=timeout)
+                    if item is None:
+                        self._running = False
+                    else:
+                        self._pending.setdefault(item[0], []).append(item)
+                        self._n_pending += 1
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                self.max_depth = max(self.max_depth, self.queue_depth())
+                if (
+                    self._n_pending >= self.config.batch_size
+                    or now - last_flush >= self.config.flush_interval
+                    or not self._running
+                ):
+                    self.flush()
+                    last_flush = now
+
+                if now - last_report >= self.config.report_interval:
+                    self.report()
+                    last_report = now
+        except KeyboardInterrupt:
+            self.flush()
+        finally:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+            logger.info("Database writer stopped")
+
+
+def create_writer_queue(config: WriterConfig):
+    return mp.Queue(maxsize=config.queue_size)
+
+
+def run_database_writer(sample_queue, config: WriterConfig, status_queue=None):
+    """数据库写入进程入口"""
+    DatabaseWriter(sample_queue, config, status_queue).run()
@@ -11,6 +11,8 @@ class EnabledFeature:
     user_info: bool = False
     name_dict: bool = False
     history_only: bool = False
+    alerts: bool = False
+    admin: bool = False
 
 
 @dataclass
@@ -43,6 +45,7 @@ _config = load_config()
 webapp_config = _config.get("webapp", {})
 enabled_features = EnabledFeature(**webapp_config.get("features", {}))
 devices_config = webapp_config.get("devices", {})
+alerts_db_path = webapp_config.get("alerts_db_path", "data/alerts.db")
 
 ai4s_users = None
 server_users = None
@@ -99,6 +102,7 @@ __all__ = [
     "webapp_config",
     "enabled_features",
     "devices_config",
+    "alerts_db_path",
     "ai4s_users",
     "server_users",
     "query_ai4s_username",
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def _bucket_edges(n: int, n_out: int) -> np.ndarray:
+    """将内部点 1..n-2 等分为 n_out-2 个桶，返回 n_out-1 个边界"""
+    return np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（升序，包含首尾两点）
+
+    标准 LTTB 以上一个桶中选中的点为顶点，需要逐桶计算；这里先以上一个桶的均值为顶点选点，
+    再以第一轮选中的点为顶点重新选点，两轮均对所有桶一次向量化完成，结果与标准算法基本一致
+
+    Args:
+        x (np.ndarray): 单调递增的横坐标
+        y (np.ndarray): 纵坐标
+        n_out (int): 目标点数
+
+    Returns:
+        np.ndarray: 保留点的下标
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64) - float(x[0])
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = _bucket_edges(n, n_out)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+
+    # 各桶的均值
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    mean_x = (cum_x[ends] - cum_x[starts]) / counts
+    mean_y = (cum_y[ends] - cum_y[starts]) / counts
+
+    # 三角形的另一个顶点：下一个桶的均值（最后一个桶为尾点）
+    cx = np.concatenate((mean_x[1:], [x[-1]]))
+    cy = np.concatenate((mean_y[1:], [y[-1]]))
+
+    bucket = np.repeat(np.arange(len(counts)), counts)
+    idx = np.arange(1, n - 1)
+
+    def select(ax: np.ndarray, ay: np.ndarray) -> np.ndarray:
+        ax, ay = ax[bucket], ay[bucket]
+        area = np.abs((ax - cx[bucket]) * (y[idx] - ay) - (ax - x[idx]) * (cy[bucket] - ay))
+        # 每个桶中面积最大的第一个点
+        best = np.maximum.reduceat(area, starts - 1)
+        candidates = np.flatnonzero(area == best[bucket])
+        _, first = np.unique(bucket[candidates], return_index=True)
+        return idx[candidates[first]]
+
+    # 第一轮以上一个桶的均值为顶点（第一个桶为首点）
+    selected = select(np.concatenate(([x[0]], mean_x[:-1])), np.concatenate(([y[0]], mean_y[:-1])))
+    # 第二轮以上一个桶中第一轮选中的点为顶点
+    prev = np.concatenate(([0], selected[:-1]))
+    selected = select(x[prev], y[prev])
+
+    return np.concatenate(([0], selected, [n - 1]))
+
+
+def envelope(lo: np.ndarray, hi: np.ndarray, index: np.ndarray) -> tuple:
+    """
+    min / max 包络：每个保留点覆盖从该点到下一个保留点之前的所有原始点
+
+    Args:
+        lo (np.ndarray): 原始数据的下界
+        hi (np.ndarray): 原始数据的上界
+        index (np.ndarray): 保留点的下标（升序，以 0 开始）
+
+    Returns:
+        tuple: 每个保留点对应的 (下界, 上界)
+    """
+    return np.minimum.reduceat(lo, index), np.maximum.reduceat(hi, index)
+
+
+__all__ = ["lttb", "envelope"]
@@ -1,3 +1,4 @@
+import os
 import smtplib
 from email.mime.text import MIMEText
 import json
@@ -11,11 +12,16 @@ from loguru import logger
 class EmailSender:
     def __init__(self, config_file: str = "email_config.json", password: Optional[str] = None):
         self.config = self.load_config(config_file)
-        self.smtp_server = "smtp." + self.config["sender_email"].split("@")[1]
+        self.smtp_server = self.config.get("smtp_server") or "smtp." + self.config["sender_email"].split("@")[1]
         self.smtp_port = self.config["smtp_port"]
+        self.use_ssl = self.config.get("use_ssl", True)  # False 时使用明文 SMTP（可配合 starttls）
+        self.starttls = self.config.get("starttls", False)
+        self.timeout = self.config.get("timeout", 30)
         self.sender_email = self.config["sender_email"]
-        self.password = password
+        # 未指定密码时依次读取配置文件中的 password 与环境变量 CONTRAIL_EMAIL_PASSWORD
+        self.password = password or self.config.get("password") or os.environ.get("CONTRAIL_EMAIL_PASSWORD")
         self.receivers = self.config["receivers"]
+        self._smtp: Optional[smtplib.SMTP] = None
 
     @staticmethod
     def load_config(config_file: str) -> dict:
@@ -27,22 +33,66 @@ class EmailSender:
             logger.error(f"Failed to load config file {config_file}: {e}")
             raise
 
+    def connect(self) -> smtplib.SMTP:
+        """建立（或复用）已登录的 SMTP 会话"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+
+        if self.use_ssl:
+            smtp_obj = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        else:
+            smtp_obj = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+            if self.starttls:
+                smtp_obj.starttls()
+        try:
+            if self.password:
+                smtp_obj.login(self.sender_email, self.password)
+        except Exception:
+            smtp_obj.close()
+            raise
+        self._smtp = smtp_obj
+        return smtp_obj
+
+    def close(self) -> None:
+        """关闭复用的 SMTP 会话"""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    def deliver(self, subject: str, content: str, keep_alive: bool = False) -> None:
+        """发送邮件，失败时抛出异常；keep_alive 为 True 时保留会话供下次使用"""
+        msg = MIMEText(content, "plain", "utf-8")
+        msg["Subject"] = subject
+        msg["From"] = self.sender_email
+        msg["To"] = ",".join(self.receivers)
+
+        try:
+            smtp_obj = self.connect()
+            smtp_obj.sendmail(self.sender_email, self.receivers, msg.as_string())
+        except (smtplib.SMTPException, OSError):
+            self.close()
+            raise
+        if not keep_alive:
+            self.close()
+
     def send_email(self, subject: str, content: str) -> None:
         """发送邮件"""
         try:
-            msg = MIMEText(content, "plain", "utf-8")
-            msg["Subject"] = subject
-            msg["From"] = self.sender_email
-            msg["To"] = ",".join(self.receivers)
-
-            with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port) as smtp_obj:
-                smtp_obj.login(self.sender_email, self.password)
-                smtp_obj.sendmail(self.sender_email, self.receivers, msg.as_string())
+            self.deliver(subject, content)
             logger.info("Email sent successfully.")
 
         except smtplib.SMTPAuthenticationError:
             logger.error("SMTP authentication failed. Check your email or password.")
-        except smtplib.SMTPException as e:
+        except (smtplib.SMTPException, OSError) as e:
             logger.error(f"Failed to send email: {e}")
 
 
@@ -51,11 +101,13 @@ class EmailTemplate:
         self.subject = subject
         self.content = content
 
+    def render(self, **kwargs) -> str:
+        """填充邮件内容"""
+        return Template(self.content).safe_substitute(**kwargs)
+
     def __call__(self, email_sender: EmailSender, **kwargs) -> None:
         """执行邮件发送"""
-        template = Template(self.content)
-        content = template.safe_substitute(**kwargs)
-        email_sender.send_email(self.subject, content)
+        email_sender.send_email(self.subject, self.render(**kwargs))
 
 
 class BasicEvent:
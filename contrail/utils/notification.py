@@ -0,0 +1,220 @@
+import time
+import queue
+import random
+import threading
+import datetime
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+from contrail.utils.email_sender import EmailSender
+
+
+@dataclass
+class NotificationConfig:
+    digest_window: float = 60.0  # 同类通知的合并窗口（秒）
+    rate_limit: float = 600.0  # 同类通知两次发送的最短间隔（秒），期间的通知合并到下一封邮件
+    max_retries: int = 5
+    retry_base_delay: float = 5.0
+    retry_max_delay: float = 300.0
+    idle_timeout: float = 300.0  # SMTP 会话空闲超过该时间后关闭
+    max_pending: int = 100  # 每类通知最多保留的条数，超出的只计数
+    queue_size: int = 256
+
+
+@dataclass
+class Notification:
+    subject: str
+    content: str
+    key: str
+    created: float = field(default_factory=time.time)
+    callback: Optional[Callable[[bool], None]] = None  # 发送成功或最终失败后调用
+
+
+@dataclass
+class _Batch:
+    items: List[Notification] = field(default_factory=list)
+    first: float = field(default_factory=time.monotonic)
+    overflow: int = 0
+    attempt: int = 0
+    retry_at: float = 0.0
+
+
+class NotificationDispatcher:
+    """
+    异步通知队列
+
+    send_email() 只将通知放入队列，由后台线程发送：同类（key 相同，默认为邮件主题）的通知在
+    digest_window 内合并为一封摘要，每类至多每 rate_limit 秒发送一次，失败时按指数退避重试；
+    所有邮件复用同一个已登录的 SMTP 会话。可替代 EmailSender 传给 EmailTemplate
+    """
+
+    def __init__(self, sender: EmailSender, config: Optional[NotificationConfig] = None):
+        self.sender = sender
+        self.config = config or NotificationConfig(**sender.config.get("notification", {}))
+        self.queue: "queue.Queue[Optional[Notification]]" = queue.Queue(maxsize=self.config.queue_size)
+        self._batches: Dict[str, _Batch] = {}
+        self._next_allowed: Dict[str, float] = {}
+        self._last_used = 0.0
+        self._running = True
+
+        # 统计信息
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="notification", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        subject: str,
+        content: str,
+        key: Optional[str] = None,
+        callback: Optional[Callable[[bool], None]] = None,
+    ) -> bool:
+        """提交通知（不阻塞），队列已满时丢弃并返回 False"""
+        item = Notification(subject, content, key or subject, callback=callback)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.error(f"Notification queue full, dropped: {subject}")
+            self._callback([item], False)
+            return False
+
+    def send_email(self, subject: str, content: str) -> None:
+        """与 EmailSender.send_email 相同的接口，供 EmailTemplate 使用"""
+        self.submit(subject, content)
+
+    def _add(self, item: Notification):
+        batch = self._batches.setdefault(item.key, _Batch())
+        if len(batch.items) < self.config.max_pending:
+            batch.items.append(item)
+        else:
+            batch.overflow += 1
+            self._callback([item], False)
+
+    @staticmethod
+    def _callback(items: List[Notification], success: bool):
+        for item in items:
+            if item.callback is None:
+                continue
+            try:
+                item.callback(success)
+            except Exception as e:
+                logger.error(f"Notification callback for '{item.subject}' failed: {e}")
+
+    def _due_at(self, key: str, batch: _Batch) -> float:
+        return max(
+            batch.first + self.config.digest_window,
+            self._next_allowed.get(key, 0.0),
+            batch.retry_at,
+        )
+
+    @staticmethod
+    def _digest(batch: _Batch):
+        items = batch.items
+        if len(items) == 1 and not batch.overflow:
+            return items[0].subject, items[0].content
+
+        subject = f"{items[0].subject} (x{len(items) + batch.overflow})"
+        parts = []
+        for i, item in enumerate(items, 1):
+            created = datetime.datetime.fromtimestamp(item.created).strftime("%Y-%m-%d %H:%M:%S")
+            parts.append(f"===== [{i}/{len(items)}] {created} {item.subject} =====\n{item.content.strip()}")
+        if batch.overflow:
+            parts.append(f"... and {batch.overflow} more notifications omitted")
+        return subject, "\n\n".join(parts)
+
+    def _send(self, key: str, batch: _Batch, now: float) -> bool:
+        subject, content = self._digest(batch)
+        try:
+            self.sender.deliver(subject, content, keep_alive=True)
+        except Exception as e:
+            batch.attempt += 1
+            if batch.attempt > self.config.max_retries:
+                self.failed += len(batch.items) + batch.overflow
+                logger.error(f"Failed to send notification '{subject}' after {batch.attempt} attempts: {e}")
+                self._callback(batch.items, False)
+                return True
+            delay = min(self.config.retry_max_delay, self.config.retry_base_delay * 2 ** (batch.attempt - 1))
+            delay *= random.uniform(0.8, 1.2)
+            batch.retry_at = now + delay
+            logger.warning(f"Failed to send notification '{subject}' (attempt {batch.attempt}): {e}, retry in {delay:.1f}s")
+            return False
+
+        self.sent += 1
+        self._callback(batch.items, True)
+        self._last_used = now
+        self._next_allowed[key] = now + self.config.rate_limit
+        logger.info(f"Notification sent: {subject}")
+        return True
+
+    def flush(self, force: bool = False):
+        """发送到期的摘要；force 为 True 时忽略合并窗口与频率限制"""
+        now = time.monotonic()
+        for key, batch in list(self._batches.items()):
+            if not force and now < self._due_at(key, batch):
+                continue
+            if self._send(key, batch, now):
+                del self._batches[key]
+            elif force:
+                # 停止时不再重试
+                self._callback(batch.items, False)
+                del self._batches[key]
+
+    def _timeout(self) -> float:
+        now = time.monotonic()
+        deadlines = [self._due_at(key, batch) for key, batch in self._batches.items()]
+        if self.sender._smtp is not None:
+            deadlines.append(self._last_used + self.config.idle_timeout)
+        if not deadlines:
+            return 1.0
+        return min(1.0, max(0.0, min(deadlines) - now))
+
+    def _run(self):
+        while self._running:
+            try:
+                item = self.queue.get(timeout=self._timeout())
+                if item is None:
+                    self._running = False
+                else:
+                    self._add(item)
+                # 取出队列中已到达的其余通知
+                while self._running:
+                    item = self.queue.get_nowait()
+                    if item is None:
+                        self._running = False
+                    else:
+                        self._add(item)
+            except queue.Empty:
+                pass
+
+            try:
+                self.flush(force=not self._running)
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}")
+
+            if self.sender._smtp is not None and time.monotonic() - self._last_used > self.config.idle_timeout:
+                self.sender.close()
+
+        self.sender.close()
+
+    def close(self, timeout: float = 30.0):
+        """发送剩余的通知并停止后台线程"""
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "pending": {key: len(batch.items) + batch.overflow for key, batch in self._batches.items()},
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+__all__ = ["NotificationConfig", "Notification", "NotificationDispatcher"]
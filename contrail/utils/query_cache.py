@@ -0,0 +1,199 @@
+import sys
+import copy
+import time
+import inspect
+import threading
+import functools
+import dataclasses
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+@dataclass
+class CachePolicy:
+    """
+    单个查询函数的缓存策略
+
+    ttl: 条目的有效期（秒），None 表示不过期
+    max_entries: 该函数至多保留的条目数，None 表示只受总内存预算限制
+    """
+
+    ttl: Optional[float] = None
+    max_entries: Optional[int] = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires")
+
+    def __init__(self, value: Any, size: int, expires: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+def estimate_size(obj: Any) -> int:
+    """估计缓存值占用的内存（字节），DataFrame 按 deep=True 计算"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(estimate_size(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    if isinstance(obj, (tuple, list, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    return sys.getsizeof(obj)
+
+
+class QueryCache:
+    """
+    进程内共享的查询缓存
+
+    所有函数的条目放在同一个 LRU 链表中：超过函数自身的 max_entries 时淘汰该函数最久未使用的条目，
+    超过总内存预算 max_bytes 时淘汰全局最久未使用的条目；过期条目在读取或写入时清理。
+    返回值为缓存值的副本，调用方可以放心修改
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, policies: Optional[Dict[str, CachePolicy]] = None):
+        self.max_bytes = max_bytes
+        self.policies: Dict[str, CachePolicy] = dict(policies or {})
+        self.total_bytes = 0
+
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._stats: Dict[str, CacheStats] = {}
+        self._lock = threading.Lock()
+
+    def _policy(self, name: str) -> CachePolicy:
+        return self.policies.get(name) or CachePolicy()
+
+    def _remove(self, key: Tuple[str, Hashable]) -> _Entry:
+        entry = self._entries.pop(key)
+        stats = self._stats[key[0]]
+        stats.entries -= 1
+        stats.bytes -= entry.size
+        self.total_bytes -= entry.size
+        return entry
+
+    def _purge_expired(self, name: str, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if k[0] == name and e.expires is not None and e.expires <= now]
+        for key in expired:
+            self._remove(key)
+            self._stats[name].expirations += 1
+
+    def get(self, name: str, key: Hashable) -> Tuple[bool, Any]:
+        full_key = (name, key)
+        with self._lock:
+            stats = self._stats.setdefault(name, CacheStats())
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(full_key)
+                stats.expirations += 1
+                entry = None
+            if entry is None:
+                stats.misses += 1
+                return False, None
+            self._entries.move_to_end(full_key)
+            stats.hits += 1
+            value = entry.value
+        return True, copy.deepcopy(value)
+
+    def put(self, name: str, key: Hashable, value: Any) -> None:
+        policy = self._policy(name)
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.warning(f"Result of {name} ({size} bytes) exceeds cache budget, not cached")
+            return
+
+        now = time.monotonic()
+        expires = now + policy.ttl if policy.ttl is not None else None
+        full_key = (name, key)
+        with self._lock:
+            stats = self._stats.setdefault(name, CacheStats())
+            if full_key in self._entries:
+                self._remove(full_key)
+
+            if policy.max_entries is not None and stats.entries >= policy.max_entries:
+                self._purge_expired(name, now)
+                # 淘汰该函数最久未使用的条目
+                for k in [k for k in self._entries if k[0] == name][: stats.entries - policy.max_entries + 1]:
+                    self._remove(k)
+                    stats.evictions += 1
+
+            while self._entries and self.total_bytes + size > self.max_bytes:
+                k = next(iter(self._entries))
+                self._remove(k)
+                self._stats[k[0]].evictions += 1
+
+            self._entries[full_key] = _Entry(copy.deepcopy(value), size, expires)
+            stats.entries += 1
+            stats.bytes += size
+            self.total_bytes += size
+
+    def clear(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if name is None or k[0] == name]:
+                self._remove(key)
+
+    def stats(self) -> pd.DataFrame:
+        """各函数的命中 / 未命中 / 淘汰计数与当前占用"""
+        with self._lock:
+            rows = [{"function": name, **asdict(stats)} for name, stats in self._stats.items()]
+        for row in rows:
+            policy = self._policy(row["function"])
+            row["ttl"] = policy.ttl
+            row["max_entries"] = policy.max_entries
+            total = row["hits"] + row["misses"]
+            row["hit_rate"] = row["hits"] / total if total else None
+        return pd.DataFrame(rows)
+
+    def cached(self, func: Callable) -> Callable:
+        """
+        缓存函数的返回值，参数按签名绑定（含默认值）后作为键，策略按函数名在 policies 中查找
+
+        用法:
+            @query_cache.cached
+            def query_xxx(start_time: str, end_time: str, db_path: str) -> pd.DataFrame: ...
+        """
+        name = func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            try:
+                hash(key)
+            except TypeError:
+                key = repr(key)
+
+            found, value = self.get(name, key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            self.put(name, key, value)
+            return value
+
+        wrapper.clear = lambda: self.clear(name)  # type: ignore[attr-defined]
+        return wrapper
+
+
+__all__ = ["CachePolicy", "CacheStats", "QueryCache", "estimate_size"]
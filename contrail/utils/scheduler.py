@@ -0,0 +1,182 @@
+import math
+import time
+import datetime as dt
+from typing import Any, Callable, List, Optional, Tuple
+from loguru import logger
+
+
+class Ticker:
+    """
+    固定频率的时钟
+
+    等待使用单调时钟，触发时刻对齐到墙上时间 interval 的整数倍（再加上 offset），
+    因此执行耗时不会累积为漂移；执行超时错过的 tick 会被跳过并计数
+    """
+
+    def __init__(self, interval: float, offset: float = 0.0, align: bool = True, name: str = "ticker"):
+        if interval <= 0:
+            raise ValueError(f"Invalid interval for {name}: {interval}")
+        self.interval = float(interval)
+        self.offset = offset
+        self.align = align
+        self.name = name
+        self.skipped = 0
+        self._sync_clock()
+        self.next_boundary = self._first_boundary()
+
+    def _sync_clock(self):
+        self._wall_offset = time.time() - time.monotonic()
+
+    def now(self) -> float:
+        """以单调时钟推算的墙上时间，若系统时间被调整则重新同步"""
+        now = time.monotonic() + self._wall_offset
+        if abs(time.time() - now) > 1.0:
+            logger.info(f"[{self.name}] Wall clock adjusted, resynchronizing")
+            self._sync_clock()
+            now = time.monotonic() + self._wall_offset
+            self.next_boundary = self._first_boundary(now)
+        return now
+
+    def _first_boundary(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() + self._wall_offset if now is None else now
+        if not self.align:
+            return now + self.interval
+        return (math.floor((now - self.offset) / self.interval) + 1) * self.interval
+
+    def set_interval(self, interval: float):
+        """修改频率，从下一个对齐的时刻开始生效"""
+        if interval == self.interval:
+            return
+        self.interval = float(interval)
+        self.next_boundary = self._first_boundary()
+
+    def reset(self, immediate: bool = False):
+        """重新对齐；immediate 为 True 时立即触发一次"""
+        self.next_boundary = self._first_boundary()
+        if immediate:
+            self.next_boundary -= self.interval
+
+    def remaining(self) -> float:
+        """距离下一次触发的秒数"""
+        return self.next_boundary + self.offset - self.now()
+
+    @property
+    def due(self) -> bool:
+        return self.remaining() <= 0
+
+    def advance(self) -> Tuple[float, int]:
+        """
+        消耗到期的 tick 并安排下一次触发
+
+        Returns:
+            Tuple[float, int]: 本次 tick 的时刻（对齐的墙上时间戳）与错过的 tick 数
+        """
+        now = self.now()
+        boundary = self.next_boundary
+        missed = max(0, int((now - self.offset - boundary) // self.interval))
+        self.next_boundary = boundary + (missed + 1) * self.interval
+        if missed:
+            self.skipped += missed
+            logger.warning(f"[{self.name}] Overran by {now - self.offset - boundary:.2f}s, missed {missed} tick(s)")
+        return boundary, missed
+
+    def wait(self) -> Tuple[float, int]:
+        """阻塞到下一次触发"""
+        remaining = self.remaining()
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.advance()
+
+
+class FixedRateJob:
+    def __init__(
+        self,
+        ticker: Ticker,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        pass_boundary: bool = False,
+        catch_up: int = 0,
+    ):
+        self.ticker = ticker
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.pass_boundary = pass_boundary
+        self.catch_up = catch_up
+        self.runs = 0
+
+    @property
+    def name(self) -> str:
+        return self.ticker.name
+
+    def run(self):
+        boundary, missed = self.ticker.advance()
+        # catch_up > 0 时补执行错过的 tick（例如补齐聚合窗口），最多 catch_up 个
+        n_catch = min(missed, self.catch_up)
+        for i in range(n_catch, -1, -1):
+            tick = boundary + (missed - i) * self.ticker.interval
+            if self.pass_boundary:
+                self.func(dt.datetime.fromtimestamp(tick, tz=dt.timezone.utc), *self.args, **self.kwargs)
+            else:
+                self.func(*self.args, **self.kwargs)
+            self.runs += 1
+
+
+class FixedRateScheduler:
+    """
+    基于 Ticker 的定时任务调度，替代 schedule.Scheduler
+
+    任务在 interval 整数倍的墙上时刻（加 offset）触发；pass_boundary 为 True 时
+    任务的第一个参数为该时刻（UTC datetime），可作为半开区间 [t - interval, t) 的右端点
+    """
+
+    def __init__(self, name: str = "scheduler"):
+        self.name = name
+        self.jobs: List[FixedRateJob] = []
+
+    def every(
+        self,
+        interval: float,
+        func: Callable,
+        *args: Any,
+        offset: float = 0.0,
+        pass_boundary: bool = False,
+        catch_up: int = 0,
+        name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> FixedRateJob:
+        ticker = Ticker(interval, offset=offset, name=name or f"{self.name}:{getattr(func, '__name__', 'job')}")
+        job = FixedRateJob(ticker, func, args, kwargs, pass_boundary=pass_boundary, catch_up=catch_up)
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self):
+        """执行所有到期的任务"""
+        for job in self.jobs:
+            if job.ticker.due:
+                job.run()
+
+    def idle_seconds(self) -> Optional[float]:
+        """距离最近一个任务触发的秒数"""
+        if not self.jobs:
+            return None
+        return max(0.0, min(job.ticker.remaining() for job in self.jobs))
+
+    def wait(self, max_wait: Optional[float] = None):
+        """阻塞到最近一个任务触发（至多 max_wait 秒）后执行到期的任务"""
+        idle = self.idle_seconds()
+        if idle is None:
+            idle = max_wait or 1.0
+        if max_wait is not None:
+            idle = min(idle, max_wait)
+        if idle > 0:
+            time.sleep(idle)
+        self.run_pending()
+
+    @property
+    def skipped(self) -> int:
+        return sum(job.ticker.skipped for job in self.jobs)
+
+    def clear(self):
+        self.jobs.clear()
@@ -0,0 +1,149 @@
+import socketserver
+import threading
+from dataclasses import dataclass
+from email import message_from_string
+from email.header import decode_header, make_header
+from typing import List, Optional, Tuple
+from loguru import logger
+
+
+@dataclass
+class ReceivedMail:
+    sender: str
+    receivers: List[str]
+    data: str
+
+    @property
+    def subject(self) -> str:
+        return str(make_header(decode_header(message_from_string(self.data).get("Subject", ""))))
+
+    @property
+    def body(self) -> str:
+        msg = message_from_string(self.data)
+        payload = msg.get_payload(decode=True)
+        return payload.decode(msg.get_content_charset() or "utf-8") if isinstance(payload, bytes) else str(payload)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    server: "_SinkServer"
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self._reply("220 contrail-smtp-sink ready")
+        sender, receivers = "", []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            command = line.split(" ", 1)[0].upper()
+
+            if command == "EHLO":
+                self._reply("250-contrail-smtp-sink")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif command == "HELO":
+                self._reply("250 contrail-smtp-sink")
+            elif command == "AUTH":
+                self.server.logins += 1
+                self._reply("235 Authentication successful")
+            elif command == "MAIL":
+                sender, receivers = line.split(":", 1)[1].strip().strip("<>"), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                receivers.append(line.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode("utf-8", "replace")
+                    if data in (".\r\n", ".\n", ""):
+                        break
+                    lines.append(data[1:] if data.startswith("..") else data)
+                self.server.record(ReceivedMail(sender, receivers, "".join(lines)))
+                self._reply("250 OK")
+            elif command in ("NOOP", "RSET"):
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int]):
+        super().__init__(address, _SMTPHandler)
+        self.messages: List[ReceivedMail] = []
+        self.logins = 0
+        self.lock = threading.Lock()
+        self.received = threading.Condition(self.lock)
+
+    def record(self, mail: ReceivedMail):
+        with self.received:
+            self.messages.append(mail)
+            self.received.notify_all()
+        logger.info(f"[smtp-sink] {mail.sender} -> {mail.receivers}: {mail.subject}")
+
+
+class LocalSMTPSink:
+    """
+    本地 SMTP 服务（不投递），用于测试通知与邮件模板
+
+    在邮件配置中设置 "smtp_server": "127.0.0.1"、"smtp_port": <port>、"use_ssl": false 即可将邮件发送到这里
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _SinkServer((host, port))
+        self.address: Tuple[str, int] = self._server.server_address[:2]  # type: ignore[assignment]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def messages(self) -> List[ReceivedMail]:
+        with self._server.lock:
+            return list(self._server.messages)
+
+    @property
+    def logins(self) -> int:
+        return self._server.logins
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        """等待至少收到 count 封邮件"""
+        with self._server.received:
+            return self._server.received.wait_for(lambda: len(self._server.messages) >= count, timeout)
+
+    def start(self) -> "LocalSMTPSink":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink that prints received mails.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    sink = LocalSMTPSink(args.host, args.port)
+    logger.info(f"SMTP sink listening on {sink.address[0]}:{sink.address[1]}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        sink.close()
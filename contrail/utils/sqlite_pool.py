@@ -0,0 +1,142 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from loguru import logger
+
+
+# 只读连接的参数：mmap 映射的页由操作系统在连接间共享，cache_size 为每个连接的页缓存（负数单位为 KiB）
+READ_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16384,
+    "temp_store": "MEMORY",
+}
+
+
+def _file_id(db_path: str) -> Optional[Tuple[int, int]]:
+    """数据库文件的 (设备号, inode)，文件被替换（例如同步覆盖）后会变化"""
+    try:
+        st = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "file_id")
+
+    def __init__(self, conn: sqlite3.Connection, file_id: Optional[Tuple[int, int]]):
+        self.conn = conn
+        self.file_id = file_id
+
+
+class ReadConnectionPool:
+    """
+    单个数据库的只读连接池
+
+    连接以 mode=ro 的 URI 打开并设置 query_only，可在线程间复用（Streamlit 每次运行脚本的线程不同）；
+    取出连接时检查数据库文件是否被替换，若是则丢弃旧连接重新打开
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 4):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+
+        # 统计信息
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+
+    def _open(self, file_id: Optional[Tuple[int, int]]) -> _PooledConnection:
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+        for key, value in READ_PRAGMAS.items():
+            conn.execute(f"PRAGMA {key} = {value}")
+        self.created += 1
+        return _PooledConnection(conn, file_id)
+
+    def acquire(self) -> _PooledConnection:
+        file_id = _file_id(self.db_path)
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open(file_id)
+            if pooled.file_id == file_id:
+                self.reused += 1
+                return pooled
+            # 文件已被替换，旧连接仍指向原 inode
+            self.recycled += 1
+            logger.debug(f"Database {self.db_path} was replaced, recycling read connection")
+            pooled.conn.close()
+
+    def release(self, pooled: _PooledConnection, broken: bool = False) -> None:
+        if broken or self._idle.qsize() >= self.max_idle:
+            pooled.conn.close()
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except sqlite3.DatabaseError:
+            # 连接可能已失效（例如文件损坏或被截断），不再放回
+            broken = True
+            raise
+        finally:
+            if pooled.conn.in_transaction:
+                pooled.conn.rollback()
+            self.release(pooled, broken)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().conn.close()
+            except queue.Empty:
+                return
+
+    def snapshot(self) -> dict:
+        return {
+            "idle": self._idle.qsize(),
+            "created": self.created,
+            "reused": self.reused,
+            "recycled": self.recycled,
+        }
+
+
+_pools: Dict[str, ReadConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_read_pool(db_path: str) -> ReadConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ReadConnectionPool(db_path)
+        return pool
+
+
+def read_connection(db_path: str):
+    """
+    从进程内共享的连接池取出只读连接
+
+    用法:
+        with read_connection(db_path) as conn:
+            data = pd.read_sql_query(query, conn)
+    """
+    return get_read_pool(db_path).connection()
+
+
+def pool_stats() -> Dict[str, dict]:
+    with _pools_lock:
+        return {path: pool.snapshot() for path, pool in _pools.items()}
+
+
+__all__ = ["ReadConnectionPool", "get_read_pool", "read_connection", "pool_stats"]
@@ -0,0 +1,60 @@
+import pandas as pd
+import streamlit as st
+
+from contrail.gpu.GPU_query_db import query_cache
+from contrail.utils.sqlite_pool import pool_stats
+
+CACHE_COLUMN_NAMES = {
+    "function": "函数",
+    "entries": "条目数",
+    "size": "占用 MB",
+    "hits": "命中",
+    "misses": "未命中",
+    "hit_rate": "命中率",
+    "evictions": "淘汰",
+    "expirations": "过期",
+    "ttl": "有效期 s",
+    "max_entries": "条目上限",
+}
+
+
+def webapp_admin():
+    """
+    运行状态页面：查询缓存与数据库连接池
+    """
+    st.title("运行状态")
+
+    st.subheader("查询缓存")
+    stats = query_cache.stats()
+    total_mb = query_cache.total_bytes / 1024 / 1024
+    budget_mb = query_cache.max_bytes / 1024 / 1024
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("缓存占用", f"{total_mb:.1f} / {budget_mb:.0f} MB")
+    if not stats.empty:
+        hits, misses = stats["hits"].sum(), stats["misses"].sum()
+        col2.metric("总命中率", f"{hits / (hits + misses):.1%}" if hits + misses else "-")
+        col3.metric("总淘汰数", int(stats["evictions"].sum()))
+
+        stats["size"] = (stats["bytes"] / 1024 / 1024).round(2)
+        stats = stats[list(CACHE_COLUMN_NAMES)].rename(columns=CACHE_COLUMN_NAMES)
+        st.dataframe(
+            stats,
+            hide_index=True,
+            use_container_width=True,
+            column_config={"命中率": st.column_config.NumberColumn(format="percent")},
+        )
+    else:
+        st.info("缓存暂无记录。")
+
+    if st.button("清空缓存"):
+        query_cache.clear()
+        st.rerun()
+
+    st.subheader("数据库连接池")
+    pools = pool_stats()
+    if pools:
+        df = pd.DataFrame.from_dict(pools, orient="index").rename_axis("数据库").reset_index()
+        st.dataframe(df, hide_index=True, use_container_width=True)
+    else:
+        st.info("尚未打开数据库连接。")
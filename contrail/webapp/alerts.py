@@ -0,0 +1,88 @@
+import datetime as dt
+import pandas as pd
+import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+
+from contrail.gpu.GPU_alert_store import query_active_alerts, query_alert_history
+from contrail.utils.config import alerts_db_path, devices_config
+
+COLUMN_NAMES = {
+    "device": "设备",
+    "kind": "类型",
+    "name": "名称",
+    "gpus": "GPU",
+    "users": "用户",
+    "message": "说明",
+    "start_time": "开始时间",
+    "end_time": "结束时间",
+    "notification": "通知",
+}
+
+
+@st.cache_data(ttl=30)
+def load_active_alerts(db_path: str, device: str | None) -> pd.DataFrame:
+    return query_active_alerts(db_path, device)
+
+
+@st.cache_data(ttl=60)
+def load_alert_history(db_path: str, start_time: str, end_time: str, device: str | None) -> pd.DataFrame:
+    return query_alert_history(db_path, start_time, end_time, device)
+
+
+def render_alerts(df: pd.DataFrame, show_end: bool = True):
+    columns = [c for c in COLUMN_NAMES if show_end or c != "end_time"]
+    df = df[columns].copy()
+    for col in ("start_time", "end_time"):
+        if col in df.columns:
+            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    st.dataframe(df.rename(columns=COLUMN_NAMES), hide_index=True, use_container_width=True)
+
+
+def webapp_alerts():
+    """
+    告警记录页面
+    """
+    st.title("GPU 告警")
+
+    col1, col2, col3 = st.columns([4, 11, 1], vertical_alignment="center")
+
+    col1.checkbox("自动刷新", key="alerts_autorefresh", value=True)
+
+    with col3:
+        if st.session_state["alerts_autorefresh"]:
+            st_autorefresh(interval=60000, key="alerts_monitor")
+
+    devices = [config["hostname"] for config in devices_config.values()]
+    selected = col2.selectbox("设备", ["全部"] + devices, label_visibility="collapsed")
+    device = None if selected == "全部" else selected.lower()
+
+    st.subheader("当前告警")
+    active = load_active_alerts(alerts_db_path, device)
+    if active.empty:
+        st.success("当前没有活跃的告警。")
+    else:
+        render_alerts(active, show_end=False)
+
+    st.subheader("历史告警")
+    today = dt.date.today()
+    col1, col2 = st.columns(2)
+    start_date = col1.date_input("开始日期", value=today - dt.timedelta(days=7), key="alerts_start_date")
+    end_date = col2.date_input("结束日期", value=today, key="alerts_end_date")
+
+    assert isinstance(start_date, dt.date)
+    assert isinstance(end_date, dt.date)
+    if start_date > end_date:
+        st.error("结束日期必须不早于开始日期！")
+        return
+
+    # 数据库中为 UTC 时间
+    start_time = dt.datetime.combine(start_date, dt.time.min).astimezone(dt.timezone.utc)
+    end_time = dt.datetime.combine(end_date + dt.timedelta(days=1), dt.time.min).astimezone(dt.timezone.utc)
+    history = load_alert_history(
+        alerts_db_path, start_time.strftime("%Y-%m-%d %H:%M:%S"), end_time.strftime("%Y-%m-%d %H:%M:%S"), device
+    )
+    if history.empty:
+        st.info("该日期范围内没有告警记录。")
+    else:
+        st.write(f"共 {len(history)} 条记录")
+        render_alerts(history)
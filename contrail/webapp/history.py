@@ -67,14 +67,14 @@ def gpu_chart_band(df, y_label, N_GPU=8):
     st.plotly_chart(fig, use_container_width=True, key=f"{y_label}_band")
 
 
-def gpu_chart_user(user_usage_grouped, y_label, db_path, N_GPU=8):
+def gpu_chart_user(user_history: UserHistory, y_label, db_path, N_GPU=8):
     # stack area chart for y_label
-    # df["gpu_index"] = df["gpu_index"].astype(str)
     colors = px.colors.qualitative.Plotly
     tot_colors = len(colors)
     opacities = [0.3 + 0.7 * i / (N_GPU - 1) for i in range(N_GPU)]
 
-    data, base = user_usage_grouped
+    base = user_history.timestamps
+    values = user_history.values.get(y_label)
 
     fig = go.Figure()
     # add line of zeros as base
@@ -90,13 +90,13 @@ def gpu_chart_user(user_usage_grouped, y_label, db_path, N_GPU=8):
         )
     )
 
-    for i, (user, gpu_data) in enumerate(data.items()):
+    for i, user in enumerate(user_history.users):
         color = ",".join([str(int(colors[i % tot_colors][j : j + 2], 16)) for j in (1, 3, 5)])
         username = query_server_username(db_path, user)
         fig.add_trace(
             go.Scatter(
                 name=username,
-                x=list(gpu_data.values())[0]["timestamp"],
+                x=base[:1],
                 y=[0],
                 mode="lines",
                 legendgroup=username,
@@ -105,16 +105,18 @@ def gpu_chart_user(user_usage_grouped, y_label, db_path, N_GPU=8):
                 showlegend=True,
             )
         )
-        for gpu_index, gpu_i in gpu_data.items():
+        # 所有序列共用时间轴，直接取 [时间 × 用户 × GPU] 数组的切片
+        for g in np.flatnonzero(user_history.present[i]):
+            gpu_index = int(user_history.gpus[g])
             fig.add_trace(
                 go.Scatter(
                     name=f"{username} GPU {gpu_index}",
-                    x=gpu_i["timestamp"],
-                    y=gpu_i[y_label],
+                    x=base,
+                    y=values[:, i, g],
                     mode="lines",
-                    line=dict(width=1, color=f"rgba({color},{opacities[int(gpu_index)]})"),
+                    line=dict(width=1, color=f"rgba({color},{opacities[gpu_index]})"),
                     fill="tonexty",
-                    fillcolor=f"rgba({color},{opacities[int(gpu_index)] - 0.2})",
+                    fillcolor=f"rgba({color},{opacities[gpu_index] - 0.2})",
                     stackgroup="one",
                     legendgroup=username,
                     showlegend=False,
@@ -212,6 +214,12 @@ def get_default_time(db_path):
     return default_start_time, default_end_time, min_time, max_time, latest_timestamp
 
 
+def get_max_points() -> int:
+    # 每个像素约一个点，以 250 为步长取整，避免不同窗口宽度产生过多缓存条目
+    width = st.session_state.get("viewport_width") or (1200 if st.session_state.is_session_pc else 400)
+    return int(min(max(width, 250), 2500) // 250 * 250)
+
+
 def store_value(key: str) -> None:
     st.session_state["_" + key] = st.session_state[key]
 
@@ -281,6 +289,7 @@ def webapp_history(hostname="Virgo", db_path="data/gpu_history_virgo.db", config
             else:
                 update_token = None
 
+            max_points = get_max_points()
             try:
                 gpu_avg_fd = query_gpu_history_average_usage(start_time, end_time, DB_PATH, update_token)
 
@@ -304,12 +313,15 @@ def webapp_history(hostname="Virgo", db_path="data/gpu_history_virgo.db", config
 
             try:
                 if select == "**详细信息**":
-                    gpu_usage_df = query_gpu_history_usage(start_time, end_time, DB_PATH, update_token)
+                    gpu_usage_df = query_gpu_history_usage(start_time, end_time, DB_PATH, update_token, max_points)
                 elif select == "**用户使用**":
-                    user_usage_grouped = query_gpu_user_history_usage(start_time, end_time, DB_PATH, update_token)
-                    user_total_df = query_gpu_user_history_total_usage(start_time, end_time, DB_PATH)
+                    user_history = query_gpu_user_history_usage(start_time, end_time, DB_PATH, update_token, max_points)
+                    user_total_df = query_gpu_user_history_total_usage(start_time, end_time, DB_PATH, update_token)
                 elif select == "**汇总数据**":
-                    gpu_usage_df = query_gpu_history_usage(start_time, end_time, DB_PATH, update_token)
+                    # 堆叠图需要各 GPU 的时间点对齐
+                    gpu_usage_df = query_gpu_history_usage(
+                        start_time, end_time, DB_PATH, update_token, max_points, method="mean"
+                    )
 
             except Exception as e:
                 st.error(f"查询数据时出现错误：{e}")
@@ -331,12 +343,12 @@ def webapp_history(hostname="Virgo", db_path="data/gpu_history_virgo.db", config
                 user_total_df["user"] = user_total_df["user"].apply(lambda x: query_server_username(DB_PATH, x))
 
                 st.subheader("用户使用率 %")
-                gpu_chart_user(user_usage_grouped, "gpu_utilization", DB_PATH, N_GPU)
+                gpu_chart_user(user_history, "gpu_utilization", DB_PATH, N_GPU)
 
                 st.dataframe(user_total_df)
 
                 st.subheader("用户显存用量 GB")
-                gpu_chart_user(user_usage_grouped, "used_memory", DB_PATH, N_GPU)
+                gpu_chart_user(user_history, "used_memory", DB_PATH, N_GPU)
 
             elif select == "**汇总数据**":
                 st.subheader("总使用率 %")
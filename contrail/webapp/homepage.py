@@ -1,11 +1,17 @@
 import json
 import os
+import time
+import threading
 import pandas as pd
 import datetime as dt
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 
-from contrail.gpu.GPU_query_db import query_latest_gpu_info
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from contrail.gpu.GPU_query_db import query_latest_gpu_info, query_device_status
 from contrail.utils.config import enabled_features, webapp_config
 
 
@@ -48,35 +54,112 @@ class HomePage:
         webapp_homepage(self.pages, self.configs, self.md_content)
 
 
-def device_status(device, timestamp: str):
+# 超过该时间（秒）没有新的采样时认为设备离线
+OFFLINE_THRESHOLD = 300
+# 等待各设备状态的时间（秒），超时的设备先显示上一次读取的结果
+STATUS_TIMEOUT = 2.0
+
+
+@dataclass
+class DeviceResult:
+    """
+    主页中一台设备的状态
+
+    gpu: 最新的 GPU 状态（query_latest_gpu_info），尚未读取到时为 None
+    status: 设备状态（query_device_status）
+    error: 读取失败时的错误信息
+    stale: 本次读取超时，gpu / status 为上一次的结果
+    loaded_at: 读取完成的时间
+    """
+
+    gpu: Optional[pd.DataFrame] = None
+    status: Optional[dict] = None
+    error: Optional[str] = None
+    stale: bool = False
+    loaded_at: Optional[float] = None
+
+
+# 所有会话共用的线程池，单个数据库被锁住（例如 VACUUM）时只占用一个线程
+_status_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="homepage")
+_status_lock = threading.Lock()
+_pending: Dict[str, Future] = {}
+_last_results: Dict[str, DeviceResult] = {}
+
+
+def load_device_status(db_path: str, timestamp: str) -> DeviceResult:
+    gpu = query_latest_gpu_info(db_path, timestamp)
+    status = query_device_status(db_path, timestamp)
+    return DeviceResult(gpu=gpu, status=status, loaded_at=time.time())
+
+
+def _remember(db_path: str):
+    def callback(future: Future):
+        if future.exception() is None:
+            with _status_lock:
+                _last_results[db_path] = future.result()
+
+    return callback
+
+
+def gather_device_status(devices: List, timestamp: str, timeout: float = STATUS_TIMEOUT) -> Dict[str, DeviceResult]:
+    """
+    在线程池中并发读取各设备的最新状态，至多等待 timeout 秒；超时的设备返回上一次的结果并标记为 stale，
+    其查询在后台继续执行，完成后的结果供之后的页面使用
+    """
+    futures = {}
+    with _status_lock:
+        for device in devices:
+            db_path = device.realtime_db_path
+            future = _pending.get(db_path)
+            # 上一次的查询仍未完成时不重复提交，避免在被锁住的数据库上堆积线程
+            if future is None or future.done():
+                future = _status_executor.submit(load_device_status, db_path, timestamp)
+                future.add_done_callback(_remember(db_path))
+                _pending[db_path] = future
+            futures[device.hostname] = (db_path, future)
+
+    wait([future for _, future in futures.values()], timeout=timeout)
+
+    results = {}
+    for hostname, (db_path, future) in futures.items():
+        if future.done():
+            try:
+                results[hostname] = future.result()
+            except Exception as e:
+                results[hostname] = DeviceResult(error=str(e))
+        else:
+            with _status_lock:
+                last = _last_results.get(db_path)
+            results[hostname] = replace(last, stale=True) if last else DeviceResult(stale=True)
+    return results
+
+
+def device_status(device, result: Optional[DeviceResult]):
     name = device.hostname
-    db_path = device.realtime_db_path
     gpu = device.gpu_type
     n_gpu = device.config["N_GPU"]
     gmem = device.config["GMEM"]
 
-    if enabled_features.history_only:
+    if enabled_features.history_only or result is None:
         st.subheader(name)
         st.caption(f"{n_gpu} × {gpu} {gmem}G")
         return None
 
-    current_timestamp = None
-    try:
-        gpu_current_df = query_latest_gpu_info(db_path, timestamp)
-        if not gpu_current_df.empty:
-            current_timestamp = gpu_current_df["timestamp"].max()
-    except Exception as e:
-        st.error(e)
+    if result.error:
+        st.error(result.error)
         return None
 
-    if gpu_current_df.empty:
+    gpu_current_df = result.gpu
+    if gpu_current_df is None or gpu_current_df.empty:
         st.subheader(name)
+        message = "正在读取 GPU 数据" if gpu_current_df is None else "无法读取 GPU 数据"
         st.write(
-            "<hr style='margin: 10px 0 5px 0;'><span style='color: orange;'>无法读取 GPU 数据</span>",
+            f"<hr style='margin: 10px 0 5px 0;'><span style='color: orange;'>{message}</span>",
             unsafe_allow_html=True,
         )
         return None
 
+    current_timestamp = gpu_current_df["timestamp"].max()
     mean_util = gpu_current_df["gpu_utilization"].mean()
 
     st.subheader(name)
@@ -86,14 +169,30 @@ def device_status(device, timestamp: str):
         unsafe_allow_html=True,
     )
 
+    if result.stale:
+        loaded_at = dt.datetime.fromtimestamp(result.loaded_at)
+        st.write(
+            f"<span style='color: gray;'>⏳ 响应超时，显示 {loaded_at:%H:%M:%S} 读取的数据</span>",
+            unsafe_allow_html=True,
+        )
+
+    status = result.status
+    if status is not None and status["last_seen"] is not None:
+        idle = (pd.Timestamp.now(tz="Asia/Shanghai") - status["last_seen"]).total_seconds()
+        if idle > OFFLINE_THRESHOLD:
+            st.write(
+                f"<span style='color: orange;'>最近采样于 {status['last_seen']:%m-%d %H:%M}，监控程序可能离线</span>",
+                unsafe_allow_html=True,
+            )
+
     return current_timestamp
 
 
-def device_card_pc(device, pages):
+def device_card_pc(device, pages, result: Optional[DeviceResult] = None):
     cont1, cont2 = st.columns([3, 2], vertical_alignment="center")
 
     with cont1:
-        current_timestamp = device_status(device, dt.datetime.now().strftime("%Y-%m-%d %H:%M"))
+        current_timestamp = device_status(device, result)
 
     if not enabled_features.history_only:
         cont2.page_link(pages[device.hostname][0], label="实时状态", use_container_width=True)
@@ -104,8 +203,8 @@ def device_card_pc(device, pages):
     return current_timestamp
 
 
-def device_card_mobile(device, pages):
-    current_timestamp = device_status(device, dt.datetime.now().strftime("%Y-%m-%d %H:%M"))
+def device_card_mobile(device, pages, result: Optional[DeviceResult] = None):
+    current_timestamp = device_status(device, result)
 
     if not enabled_features.history_only:
         col1, col2 = st.columns(2)
@@ -179,6 +278,11 @@ def webapp_homepage(pages, configs, md_content=None):
     configs_list = list(configs.values())
     times = []
 
+    # 先并发读取所有设备的状态，再依次渲染
+    results = {}
+    if not enabled_features.history_only:
+        results = gather_device_status(configs_list, dt.datetime.now().strftime("%Y-%m-%d %H:%M"))
+
     n_cols = 2
     for i in range(0, len(configs_list), n_cols):
         cols = st.columns(n_cols, border=True)
@@ -186,11 +290,12 @@ def webapp_homepage(pages, configs, md_content=None):
             if i + j >= len(configs_list):
                 break
             with col:
-                timestamp = device_card(configs_list[i + j], pages)
+                device = configs_list[i + j]
+                timestamp = device_card(device, pages, results.get(device.hostname))
                 if timestamp:
                     times.append(timestamp)
 
-    if not enabled_features.history_only:
+    if not enabled_features.history_only and times:
         times = [dt.datetime.strptime(ts, "%Y-%m-%d %H:%M:%S") for ts in times]
         min_time = min(times).strftime("%Y-%m-%d %H:%M")
         max_time = max(times).strftime("%Y-%m-%d %H:%M")
@@ -43,14 +43,9 @@ def get_gpu_color(N_GPU, not_pc):
     return gpu_color
 
 
-def render_detail_view(start_time, end_time, DB_PATH, axis_x, PARAMS):
-    try:
-        gpu_utilization_df = query_gpu_realtime_usage(start_time, end_time, DB_PATH)
-        gpu_memory_df = query_gpu_memory_realtime_usage(start_time, end_time, DB_PATH)
-    except Exception as e:
-        st.error(f"查询详细数据时出现错误：{e}")
-        logger.error(f"Error querying realtime details: {e}")
-        return
+def render_detail_view(gpu_df, axis_x, PARAMS):
+    gpu_utilization_df = gpu_df[["gpu_index", "gpu_utilization", "timestamp"]]
+    gpu_memory_df = gpu_df[["gpu_index", "used_memory", "timestamp"]]
 
     (N_GPU, GMEM, DURATION, not_pc) = PARAMS
     gpu_tooltips = [alt.Tooltip(str(i), type="quantitative") for i in range(N_GPU)]
@@ -99,18 +94,12 @@ def render_detail_view(start_time, end_time, DB_PATH, axis_x, PARAMS):
     st.altair_chart(chart, use_container_width=True)  # pyright: ignore[reportArgumentType]
 
 
-def render_user_view(start_time, end_time, DB_PATH, axis_x):
-    try:
-        user_gpu_df = query_user_gpu_realtime_usage(start_time, end_time, DB_PATH)
-        user_gpu_memory_df = query_user_gpu_memory_realtime_usage(start_time, end_time, DB_PATH)
-
-        # 处理用户名
-        user_gpu_df["user"] = user_gpu_df["user"].apply(lambda x: query_server_username(DB_PATH, x))
-        user_gpu_memory_df["user"] = user_gpu_memory_df["user"].apply(lambda x: query_server_username(DB_PATH, x))
-    except Exception as e:
-        st.error(f"查询用户数据时出现错误：{e}")
-        logger.error(f"Error querying user data: {e}")
-        return
+def render_user_view(user_df, DB_PATH, axis_x):
+    # 快照由所有会话共享，处理用户名前先复制
+    user_df = user_df.copy()
+    user_df["user"] = user_df["user"].apply(lambda x: query_server_username(DB_PATH, x))
+    user_gpu_df = user_df[["gpu_index", "user", "gpu_utilization", "timestamp"]]
+    user_gpu_memory_df = user_df[["gpu_index", "user", "used_memory", "timestamp"]]
 
     gpu_opacity = alt.Opacity("gpu_index:N").title("GPU")
     user_color = alt.Color("user:N").title("用户").scale(range=COLOR_SCHEME)
@@ -143,14 +132,9 @@ def render_user_view(start_time, end_time, DB_PATH, axis_x):
     )
 
 
-def render_summary_view(start_time, end_time, DB_PATH, axis_x, PARAMS):
-    try:
-        gpu_utilization_df = query_gpu_realtime_usage(start_time, end_time, DB_PATH)
-        gpu_memory_df = query_gpu_memory_realtime_usage(start_time, end_time, DB_PATH)
-    except Exception as e:
-        st.error(f"查询汇总数据时出现错误：{e}")
-        logger.error(f"Error querying summary data: {e}")
-        return
+def render_summary_view(gpu_df, axis_x, PARAMS):
+    gpu_utilization_df = gpu_df[["gpu_index", "gpu_utilization", "timestamp"]]
+    gpu_memory_df = gpu_df[["gpu_index", "used_memory", "timestamp"]]
 
     (N_GPU, GMEM, DURATION, not_pc) = PARAMS
     gpu_color = get_gpu_color(N_GPU, not_pc)
@@ -220,6 +204,9 @@ def webapp_realtime(hostname="Virgo", db_path="data/gpu_history_virgo.db", confi
         st.session_state[monitor_key] = 0
     st.session_state[prev_refresh_key] = auto_refresh
 
+    # 同一设备的所有会话共享一个后台数据源，数据库查询量与在线人数无关
+    feed = get_realtime_feed(DB_PATH, window=config.get("DURATION", 30))
+
     warning_container = st.empty()
     panel_empty = st.empty()
     st.divider()
@@ -252,20 +239,16 @@ def webapp_realtime(hostname="Virgo", db_path="data/gpu_history_virgo.db", confi
         if st.session_state.get(f"_selection_realtime_{hostname}", None) is None:
             st.session_state[f"_selection_realtime_{hostname}"] = "**详细信息**"
 
-        end_time_dt = dt.datetime.now(tz=dt.timezone.utc)
-        start_time_dt = end_time_dt - dt.timedelta(seconds=DURATION)
-        start_time = start_time_dt.strftime("%Y-%m-%d %H:%M:%S")
-        end_time = end_time_dt.strftime("%Y-%m-%d %H:%M:%S")
+        start_time_dt = dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(seconds=DURATION)
 
-        try:
-            gpu_current_df = query_latest_gpu_info(DB_PATH, end_time)
+        snapshot = feed.snapshot()
+        if snapshot.error is not None:
+            warning_container.error(f"查询数据时出现错误：{snapshot.error}")
+            if snapshot.updated_at == 0:
+                return
 
-            check_usage_df = query_gpu_realtime_usage(start_time, end_time, DB_PATH)
-
-        except Exception as e:
-            warning_container.error(f"查询数据时出现错误：{e}")
-            logger.error(f"Error querying realtime data: {e}")
-            return
+        gpu_current_df = snapshot.latest
+        check_usage_df, user_df = snapshot.window(start_time_dt)
 
         if not gpu_current_df.empty:
             current_timestamp = gpu_current_df["timestamp"].max()
@@ -288,11 +271,11 @@ def webapp_realtime(hostname="Virgo", db_path="data/gpu_history_virgo.db", confi
 
         # 根据选择渲染不同视图
         if select == "**详细信息**" or select is None:
-            render_detail_view(start_time, end_time, DB_PATH, axis_x, PARAMS)
+            render_detail_view(check_usage_df, axis_x, PARAMS)
         elif select == "**用户使用**":
-            render_user_view(start_time, end_time, DB_PATH, axis_x)
+            render_user_view(user_df, DB_PATH, axis_x)
         elif select == "**汇总数据**":
-            render_summary_view(start_time, end_time, DB_PATH, axis_x, PARAMS)
+            render_summary_view(check_usage_df, axis_x, PARAMS)
 
     # === 执行 Fragment ===
     _render_fragment()
@@ -66,6 +66,20 @@ def feature_pages():
             st.Page(webapp_ai4s, title="AI4S 任务列表", url_path="ai4s_tasks"),
         ]
 
+    if enabled_features.alerts:
+        from contrail.webapp.alerts import webapp_alerts
+
+        pages["Alerts"] = [
+            st.Page(webapp_alerts, title="GPU 告警", url_path="alerts"),
+        ]
+
+    if enabled_features.admin:
+        from contrail.webapp.admin import webapp_admin
+
+        pages["Admin"] = [
+            st.Page(webapp_admin, title="运行状态", url_path="admin"),
+        ]
+
     if enabled_features.user_info and enabled_features.name_dict:
         from contrail.webapp.user_info import webapp_user_info
 
@@ -177,6 +191,10 @@ def main():
     user_agent = parse(ua_string) if ua_string else None
     st.session_state.is_session_pc = user_agent.is_pc if user_agent else True
 
+    # 视口宽度，用于确定历史图表的点数
+    viewport_width = st_javascript("""window.innerWidth;""", key="viewport_width_js")
+    st.session_state.viewport_width = viewport_width if isinstance(viewport_width, (int, float)) else None
+
     with st.sidebar:
         custom_navigate(home_p, device_p, feature_p)
 